@@ -1,29 +1,164 @@
 import os
+import sys
 import json
+import time
+import uuid
+import fcntl
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, g
+import click
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, send_file, jsonify, g, session, stream_with_context
 import jwt
+from markupsafe import Markup
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.http import is_resource_modified
+from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 from config import Config
-from models import db, Version, User, Role, Permission
+from models import db, Version, VersionChange, VersionChangeHead, User, Role, UploadSession, VERSION_NEWEST_FIRST
+import bundle
+import changefeed
+import db_routing
+import delta
+import health
+import metrics
+import migrations
+import precompress
+import quota
+import retention
+import tiering
+import versioning
+import search
+import storage
+import storage_layout
+import sql_profiler
 
-app = Flask(__name__)
-app.config.from_object(Config)
+class DLLManagerApp(Flask):
+    """首次进入应用上下文（请求、CLI命令、脚本中的 app.app_context()）时自动以默认配置完成初始化"""
+    
+    def app_context(self):
+        if not _app_initialized:
+            create_app()
+        return super().app_context()
+
+# 路由在导入时注册到app上；配置、扩展和存储目录在 create_app() 中初始化
+app = DLLManagerApp(__name__)
+_app_initialized = False
+_app_init_lock = threading.Lock()
+
+def create_app(config_object=Config, **overrides):
+    """应用工厂：加载配置、初始化扩展、创建存储目录（不访问数据库，表结构由 flask --app app migrate 管理）
+    
+    未显式调用时，首次进入应用上下文会以默认配置自动调用；
+    需要自定义配置（如测试、压测）时必须在首次使用app之前调用。
+    gunicorn 入口: app:create_app()
+    """
+    global _app_initialized
+    with _app_init_lock:
+        if _app_initialized:
+            if overrides or config_object is not Config:
+                raise RuntimeError('应用已初始化，自定义配置必须在首次使用app之前传入 create_app()')
+            return app
+        
+        app.config.from_object(config_object)
+        app.config.update(overrides)
+        
+        # JWT配置
+        app.config['JWT_SECRET_KEY'] = app.config.get('SECRET_KEY')
+        app.config['JWT_EXPIRATION_DELTA'] = timedelta(hours=24)
+        
+        # 初始化数据库（配置了只读副本时启用读写分离）
+        db.init_app(app)
+        db_routing.init_app(app)
+        
+        # 初始化Prometheus指标
+        metrics.init_app(app)
+        
+        # SQL分析（SQL_PROFILING开启时生效）
+        sql_profiler.init_app(app)
+        
+        # 存储后端（本地文件系统或S3兼容对象存储）
+        storage.init_app(app)
+        
+        # 下载配额（按用户/角色限制同时下载数、速率和每日下载量）
+        quota.init_app(app)
+        
+        # 就绪检查（后台线程定期探测，/readyz 只读取缓存结果）
+        health.init_app(app, db, lambda: len(_pending_background))
+        
+        ensure_storage_dirs()
+        _app_initialized = True
+    return app
+
+def get_storage():
+    """当前配置的存储后端"""
+    return app.extensions['storage']
+
+def get_download_quota():
+    """下载限流器"""
+    return app.extensions['download_quota']
+
+def quota_exceeded_response(error):
+    """超出下载配额：429 + Retry-After"""
+    metrics.QUOTA_REJECTIONS.labels(reason=error.reason).inc()
+    app.logger.info(f"Download quota exceeded ({error.reason}): {str(error)}")
+    response = jsonify({'error': str(error), 'reason': error.reason, 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def ensure_storage_dirs():
+    """创建上传目录（确保权限正确）"""
+    for folder in [app.config['UPLOAD_FOLDER_TESTING'], 
+                   app.config['UPLOAD_FOLDER_CURRENT'],
+                   app.config['UPLOAD_FOLDER_HISTORY'],
+                   app.config['PATCH_FOLDER']]:
+        os.makedirs(folder, exist_ok=True)
+        os.chmod(folder, 0o755)  # 确保web服务器可写
+
+# 后台任务线程池（差分补丁等耗时操作不阻塞请求）
+background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='background')
+_pending_background = set()  # 未完成的后台任务（就绪检查报告队列深度）
 
-# 初始化数据库
-db.init_app(app)
+def _background_task_done(future):
+    """后台任务完成回调：更新队列深度并记录异常"""
+    metrics.BACKGROUND_QUEUE_DEPTH.dec()
+    _pending_background.discard(future)
+    if future.exception():
+        app.logger.error(f"Background task error: {str(future.exception())}")
 
-# 创建上传目录（确保权限正确）
-for folder in [app.config['UPLOAD_FOLDER_TESTING'], 
-               app.config['UPLOAD_FOLDER_CURRENT'],
-               app.config['UPLOAD_FOLDER_HISTORY']]:
-    os.makedirs(folder, exist_ok=True)
-    os.chmod(folder, 0o755)  # 确保web服务器可写
+def submit_background(fn, *args):
+    """提交后台任务（任务函数只处理文件，不访问数据库）"""
+    metrics.BACKGROUND_QUEUE_DEPTH.inc()
+    future = background_executor.submit(run_blocking, fn, *args)
+    _pending_background.add(future)
+    future.add_done_callback(_background_task_done)
+    return future
 
-# JWT配置
-app.config['JWT_SECRET_KEY'] = app.config.get('SECRET_KEY')
-app.config['JWT_EXPIRATION_DELTA'] = timedelta(hours=24)
+def gevent_enabled():
+    """是否运行在gevent worker中（标准库已被monkey patch，线程池的线程实际是协程）"""
+    # gevent worker在导入app之前已完成patch；未使用gevent时不导入它
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+def run_blocking(fn, *args):
+    """执行CPU密集的调用（差分、压缩、哈希）：gevent模式下放到原生线程池，避免阻塞事件循环"""
+    if gevent_enabled():
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+def release_db_connection():
+    """在接收大文件等长时间网络I/O之前归还数据库连接，避免慢客户端占满连接池
+    
+    已加载的对象变为游离状态，已加载的属性仍可读取；之后调用 get_current_user() 会重新加载当前用户。
+    """
+    db.session.remove()
+    g.pop('_current_user', None)
 
 # 生成JWT token
 def generate_token(user_id):
@@ -47,15 +182,20 @@ def verify_token(token):
 
 # 获取当前用户
 def get_current_user():
-    """获取当前用户"""
+    """获取当前用户（同一请求内缓存，模板中多次调用不重复查询）"""
+    if '_current_user' in g:
+        return g._current_user
+    
+    user = None
     token = request.cookies.get('token') or request.headers.get('Authorization')
     if token:
         if 'Bearer ' in token:
             token = token.replace('Bearer ', '')
         user_id = verify_token(token)
         if user_id:
-            return User.query.get(user_id)
-    return None
+            user = User.query.get(user_id)
+    g._current_user = user
+    return user
 
 # 权限验证装饰器
 def require_permission(permission_name):
@@ -98,12 +238,12 @@ def inject_functions():
         'get_current_user': get_current_user
     }
 
-# 记录操作日志
-def log_operation(user, action, resource_type=None, resource_id=None, resource_name=None, status='success', message=None):
-    """记录操作日志"""
+# 构建操作日志
+def build_log(user, action, resource_type=None, resource_id=None, resource_name=None, status='success', message=None):
+    """构建操作日志对象（未提交，便于与业务数据在同一事务中写入）"""
     from models import Log
     
-    log = Log(
+    return Log(
         user_id=user.id if user else None,
         username=user.username if user else 'anonymous',
         action=action,
@@ -115,11 +255,18 @@ def log_operation(user, action, resource_type=None, resource_id=None, resource_n
         status=status,
         message=message
     )
+
+# 记录操作日志
+def log_operation(user, action, resource_type=None, resource_id=None, resource_name=None, status='success', message=None):
+    """记录操作日志"""
+    log = build_log(user, action, resource_type, resource_id, resource_name, status, message)
     
     try:
         db.session.add(log)
         db.session.commit()
+        metrics.AUDIT_LOG_WRITES.labels(status='success').inc()
     except Exception as e:
+        metrics.AUDIT_LOG_WRITES.labels(status='error').inc()
         app.logger.error(f"Log error: {str(e)}")
         # 日志记录失败不应影响主流程，所以这里只是记录错误，不抛出异常
 
@@ -312,105 +459,203 @@ def user_profile():
     
     return render_template('profile.html', user=user)
 
+# 首页版本表格片段缓存：只保留最新状态对应的一份HTML
+_index_fragment_cache = {}
+
+def get_version_table_state():
+    """获取版本表状态（最新ID、最新上传时间、总数），用作片段缓存键和HTTP校验器"""
+    latest_id, latest_uploaded_at, total = db.session.query(
+        func.max(Version.id), func.max(Version.uploaded_at), func.count(Version.id)
+    ).one()
+    return latest_id or 0, latest_uploaded_at, total
+
+def render_version_rows(state):
+    """渲染最新20个版本的表格行，版本表未变化时直接复用缓存"""
+    html = _index_fragment_cache.get(state)
+    metrics.cache_hit('index_fragment', html is not None)
+    if html is None:
+        versions = Version.query.order_by(Version.uploaded_at.desc()).limit(20).all()
+        html = render_template('_version_rows.html', versions=versions)
+        _index_fragment_cache.clear()
+        _index_fragment_cache[state] = html
+    return Markup(html)
+
 @app.route('/')
+@db_routing.read_replica
 def index():
-    """显示最新20个版本"""
-    versions = Version.query.order_by(Version.uploaded_at.desc()).limit(20).all()
-    return render_template('index.html', versions=versions)
+    """显示最新20个版本（支持ETag/Last-Modified条件请求）"""
+    state = get_version_table_state()
+    latest_id, latest_uploaded_at, total = state
+    
+    # 页面导航随登录用户变化，因此ETag包含用户ID
+    user = get_current_user()
+    etag = f"{latest_id}-{total}-{latest_uploaded_at.timestamp() if latest_uploaded_at else 0}-{user.id if user else 0}"
+    
+    # 有待显示的flash消息时必须完整渲染
+    if not session.get('_flashes') and not is_resource_modified(
+            request.environ, etag=etag, last_modified=latest_uploaded_at):
+        response = app.response_class(status=304)
+    else:
+        response = app.make_response(render_template('index.html', version_rows=render_version_rows(state)))
+    
+    response.set_etag(etag)
+    if latest_uploaded_at:
+        response.last_modified = latest_uploaded_at
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# 支持的文件类型
+SUPPORTED_FILE_TYPES = ['dll', 'exe', 'apk', 'so', 'jar']
+
+# 上传必填字段
+UPLOAD_REQUIRED_FIELDS = ['software_name', 'version', 'update_notes',
+                          'test_description', 'test_result', 'test_completed_at',
+                          'test_id', 'developer_dri']
+
+def check_file_header(file, expected_ext):
+    """检查文件头是否与扩展名匹配（扩展名+文件头双重校验）"""
+    # 保存当前文件位置
+    current_pos = file.tell()
+    try:
+        # 读取文件头
+        header = file.read(12)
+        # 重置文件位置
+        file.seek(current_pos)
+        
+        if expected_ext in ['dll', 'exe']:
+            # DLL和EXE文件头：MZ
+            return header.startswith(b'MZ')
+        elif expected_ext == 'apk':
+            # APK文件头：PK（ZIP格式）
+            return header.startswith(b'PK')
+        elif expected_ext == 'so':
+            # SO文件头：ELF
+            return header.startswith(b'\x7fELF')
+        elif expected_ext == 'jar':
+            # JAR文件头：PK（ZIP格式）
+            return header.startswith(b'PK')
+        return True
+    except:
+        # 重置文件位置
+        file.seek(current_pos)
+        return False
+
+def validate_upload_fields(fields):
+    """校验上传元数据（必填字段、时间和用时格式），返回错误信息或None"""
+    for field in UPLOAD_REQUIRED_FIELDS:
+        if not str(fields.get(field) or '').strip():
+            return f'"{field}" 为必填项！'
+    try:
+        datetime.fromisoformat(str(fields['test_completed_at']).strip())
+    except ValueError:
+        return '"test_completed_at" 必须是ISO格式的时间（如 2024-01-01T12:00）！'
+    try:
+        if int(fields.get('test_duration') or 0) < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return '"test_duration" 必须是非负整数（秒）！'
+    return None
+
+def validate_upload_file(file):
+    """校验上传文件，返回(文件类型, 错误信息)"""
+    if not file or not file.filename:
+        return None, '未选择文件！'
+    
+    # 获取文件类型
+    file_ext = file.filename.lower().split('.')[-1]
+    if file_ext not in SUPPORTED_FILE_TYPES:
+        supported_extensions = ', '.join([f'.{ext}' for ext in SUPPORTED_FILE_TYPES])
+        return file_ext, f'仅支持 {supported_extensions} 文件上传！'
+    
+    # 验证文件头
+    if not check_file_header(file, file_ext):
+        return file_ext, '文件类型与扩展名不匹配！'
+    
+    # ClamAV病毒扫描（占位符）
+    # 实际部署时，需要安装ClamAV并配置clamd服务
+    # if not scan_file_for_viruses(file):
+    #     return file_ext, '文件检测到病毒，上传失败！'
+    
+    return file_ext, None
+
+def normalize_version(version):
+    """标准化版本号（去掉v前缀）"""
+    return str(version).strip().replace('v', '')
+
+def get_version_file_path(software_name, version, file_ext):
+    """返回版本文件的标准存储路径（按文件名哈希分桶；只计算路径，写入前由调用方创建目录）"""
+    return storage_layout.current_path(app.config['UPLOAD_FOLDER_CURRENT'], software_name, version, file_ext)
+
+def rename_existing_file(file_path):
+    """旧文件重命名：如果目标文件已存在，加时间戳后缀保留旧文件"""
+    storage_backend = get_storage()
+    if storage_backend.exists(file_path):
+        base, file_ext = os.path.splitext(file_path)
+        old_file_path = f"{base}_{datetime.now().strftime('%Y%m%d%H%M%S')}{file_ext}"
+        storage_backend.move(file_path, old_file_path)
+        app.logger.info(f"旧文件重命名: {os.path.basename(file_path)} -> {os.path.basename(old_file_path)}")
+        return old_file_path
+    return None
+
+def build_version(fields, software_name, version, file_path, file_size, file_ext, uploaded_by):
+    """根据上传元数据创建Version对象（未提交）"""
+    return Version(
+        software_name=software_name,
+        version=version,
+        file_path=file_path,
+        file_size=file_size,
+        file_type=file_ext,
+        update_notes=str(fields['update_notes']).strip(),
+        test_description=str(fields['test_description']).strip(),
+        test_result=str(fields['test_result']).strip(),
+        test_duration=int(fields.get('test_duration', 0) or 0),
+        test_completed_at=datetime.fromisoformat(str(fields['test_completed_at']).strip()),
+        test_id=str(fields['test_id']).strip(),
+        developer_dri=str(fields['developer_dri']).strip(),
+        uploaded_by=uploaded_by
+    )
 
 @app.route('/upload', methods=['GET', 'POST'])
 @require_login()
 def upload():
     """处理文件上传"""
     if request.method == 'POST':
+        # 登录校验已完成，接收文件期间不占用数据库连接
+        release_db_connection()
+        file_path = None
+        renamed = None
+        published = False
+        committed = False
         try:
             # 验证必填字段
-            required_fields = ['software_name', 'version', 'update_notes', 
-                              'test_description', 'test_result', 'test_completed_at',
-                              'test_id', 'developer_dri']
-            
-            for field in required_fields:
-                if not request.form.get(field, '').strip():
-                    flash(f'❌ "{field}" 为必填项！', 'error')
-                    return redirect(request.url)
+            error = validate_upload_fields(request.form)
+            if error:
+                flash(f'❌ {error}', 'error')
+                return redirect(request.url)
             
             # 验证文件
             file = request.files['file']
-            if not file or not file.filename:
-                flash('❌ 未选择文件！', 'error')
-                return redirect(request.url)
-            
-            # 获取文件类型
-            file_ext = file.filename.lower().split('.')[-1]
-            # 支持的文件类型
-            supported_types = ['dll', 'exe', 'apk', 'so', 'jar']
-            if file_ext not in supported_types:
-                supported_extensions = ', '.join([f'.{ext}' for ext in supported_types])
-                flash(f'❌ 仅支持 {supported_extensions} 文件上传！', 'error')
-                return redirect(request.url)
-            
-            # 文件头校验（扩展名+文件头双重校验）
-            def check_file_header(file, expected_ext):
-                """检查文件头是否与扩展名匹配"""
-                # 保存当前文件位置
-                current_pos = file.tell()
-                try:
-                    # 读取文件头
-                    header = file.read(12)
-                    # 重置文件位置
-                    file.seek(current_pos)
-                    
-                    if expected_ext in ['dll', 'exe']:
-                        # DLL和EXE文件头：MZ
-                        return header.startswith(b'MZ')
-                    elif expected_ext == 'apk':
-                        # APK文件头：PK（ZIP格式）
-                        return header.startswith(b'PK')
-                    elif expected_ext == 'so':
-                        # SO文件头：ELF
-                        return header.startswith(b'\x7fELF')
-                    elif expected_ext == 'jar':
-                        # JAR文件头：PK（ZIP格式）
-                        return header.startswith(b'PK')
-                    return True
-                except:
-                    # 重置文件位置
-                    file.seek(current_pos)
-                    return False
-            
-            # 验证文件头
-            if not check_file_header(file, file_ext):
-                flash(f'❌ 文件类型与扩展名不匹配！', 'error')
+            file_ext, error = validate_upload_file(file)
+            if error:
+                flash(f'❌ {error}', 'error')
                 return redirect(request.url)
             
-            # ClamAV病毒扫描（占位符）
-            # 实际部署时，需要安装ClamAV并配置clamd服务
-            # if not scan_file_for_viruses(file):
-            #     flash('❌ 文件检测到病毒，上传失败！', 'error')
-            #     return redirect(request.url)
-            
             # 保存文件（标准化命名）
             software_name = secure_filename(request.form['software_name'].strip())
-            version = request.form['version'].strip().replace('v', '')
-            
-            # 1. 自动建文件夹：为每个软件创建单独的文件夹
-            software_folder = os.path.join(app.config['UPLOAD_FOLDER_CURRENT'], software_name)
-            os.makedirs(software_folder, exist_ok=True)
+            version = normalize_version(request.form['version'])
             
-            # 2. 旧文件重命名：检查是否存在同名文件
-            filename = f"{software_name}_v{version}.{file_ext}"
-            file_path = os.path.join(software_folder, filename)
-            
-            # 如果文件已存在，重命名旧文件
-            if os.path.exists(file_path):
-                old_filename = f"{software_name}_v{version}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_ext}"
-                old_file_path = os.path.join(software_folder, old_filename)
-                os.rename(file_path, old_file_path)
-                app.logger.info(f"旧文件重命名: {filename} -> {old_filename}")
+            # 1. 自动建文件夹 2. 旧文件重命名
+            target_path = get_version_file_path(software_name, version, file_ext)
+            renamed = rename_existing_file(target_path)
             
             # 保存文件
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            file_path = target_path
             file.save(file_path)
             file_size = os.path.getsize(file_path)
+            get_storage().publish(file_path)
+            published = True
             
             # 3. 版本自动解析：这里可以集成文件版本解析逻辑
             # 目前使用用户输入的版本号，后续可以扩展为自动解析
@@ -421,94 +666,942 @@ def upload():
             uploaded_by = current_user.username if current_user else 'admin'
             
             # 创建数据库记录
-            new_version = Version(
-                software_name=software_name,
-                version=version,
-                file_path=file_path,
-                file_size=file_size,
-                file_type=file_ext,
-                update_notes=request.form['update_notes'].strip(),
-                test_description=request.form['test_description'].strip(),
-                test_result=request.form['test_result'].strip(),
-                test_duration=int(request.form.get('test_duration', 0) or 0),
-                test_completed_at=datetime.fromisoformat(request.form['test_completed_at']),
-                test_id=request.form['test_id'].strip(),
-                developer_dri=request.form['developer_dri'].strip(),
-                uploaded_by=uploaded_by
-            )
+            new_version = build_version(request.form, software_name, version, file_path,
+                                        file_size, file_ext, uploaded_by)
             
             db.session.add(new_version)
             db.session.commit()
+            committed = True
+            get_storage().evict_local(file_path)
             
             # 记录上传日志
             log_operation(current_user, 'upload', 'version', new_version.id, f'{software_name} v{version}', 'success', f'用户 {current_user.username} 上传文件 {software_name} v{version}.{file_ext} 成功')
             
+            # 通知最新版本缓存和订阅者，后台预生成差分补丁和压缩变体
+            notify_catalog_changed()
+            schedule_background_tasks(new_version)
+            
             flash(f'✅ {software_name} v{version} 上传成功！', 'success')
             return redirect(url_for('index'))
             
         except Exception as e:
+            db.session.rollback()
+            if not committed:
+                # 版本记录未提交：撤销已发布和已保存的文件，恢复被重命名的旧文件
+                if published:
+                    try:
+                        get_storage().unpublish(file_path)
+                    except Exception as undo_error:
+                        app.logger.error(f"Upload unpublish error: {str(undo_error)}")
+                if file_path and os.path.exists(file_path):
+                    os.remove(file_path)
+                if renamed:
+                    get_storage().move(renamed, file_path)
             app.logger.error(f"Upload error: {str(e)}")
             flash(f'❌ 上传失败: {str(e)}', 'error')
             return redirect(request.url)
     
     return render_template('upload.html')
 
+def _save_staged_file(file, staging_path):
+    """保存单个文件到暂存路径，返回文件大小（在线程池中执行）"""
+    file.save(staging_path)
+    return os.path.getsize(staging_path)
+
+@app.route('/api/upload/batch', methods=['POST'])
+def api_upload_batch():
+    """API：批量上传一个发布的多个文件（全部成功或全部失败）
+    
+    表单字段:
+        manifest: JSON，共享的上传元数据；可选 files: {文件名: {覆盖字段}}
+        files: 多个文件
+    """
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'error': '请先登录'}), 401
+    release_db_connection()
+    
+    try:
+        manifest = json.loads(request.form.get('manifest') or '{}')
+    except ValueError as e:
+        return jsonify({'error': f'manifest 不是合法的JSON: {str(e)}'}), 400
+    if not isinstance(manifest, dict):
+        return jsonify({'error': 'manifest 必须是JSON对象'}), 400
+    
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'error': '未选择文件！'}), 400
+    
+    overrides = manifest.pop('files', None) or {}
+    if not isinstance(overrides, dict):
+        return jsonify({'error': 'manifest.files 必须是JSON对象'}), 400
+    
+    # 1. 校验：每个文件合并共享元数据与覆盖字段，并行校验文件头
+    with ThreadPoolExecutor(max_workers=app.config['BATCH_UPLOAD_WORKERS']) as executor:
+        checks = list(executor.map(validate_upload_file, files))
+    
+    errors = []
+    items = []
+    target_paths = set()
+    for file, (file_ext, error) in zip(files, checks):
+        override = overrides.get(file.filename) or {}
+        if not isinstance(override, dict):
+            errors.append({'file': file.filename, 'error': 'manifest.files 中的覆盖字段必须是JSON对象'})
+            continue
+        fields = dict(manifest, **override)
+        fields.setdefault('software_name', os.path.splitext(file.filename)[0])
+        error = error or validate_upload_fields(fields)
+        if error:
+            errors.append({'file': file.filename, 'error': error})
+            continue
+        
+        software_name = secure_filename(str(fields['software_name']).strip())
+        version = normalize_version(fields['version'])
+        file_path = get_version_file_path(software_name, version, file_ext)
+        if file_path in target_paths:
+            errors.append({'file': file.filename, 'error': f'批次内重复: {software_name} v{version}.{file_ext}'})
+            continue
+        target_paths.add(file_path)
+        items.append((file, fields, software_name, version, file_ext, file_path))
+    
+    if errors:
+        return jsonify({'error': '批量上传校验失败', 'details': errors}), 400
+    
+    batch_id = uuid.uuid4().hex
+    staged = []
+    promoted = []
+    try:
+        # 2. 并行写入暂存文件（与目标同目录，保证后续rename是原子操作）
+        staging_paths = [f"{item[5]}.{batch_id}.part" for item in items]
+        staged.extend(staging_paths)
+        for staging_path in staging_paths:
+            os.makedirs(os.path.dirname(staging_path), exist_ok=True)
+        with ThreadPoolExecutor(max_workers=app.config['BATCH_UPLOAD_WORKERS']) as executor:
+            sizes = list(executor.map(_save_staged_file, [item[0] for item in items], staging_paths))
+        
+        # 3. 把暂存文件移动到正式路径并交给存储后端（在写数据库之前完成，不延长变更ID序列的锁），失败时可整体回滚
+        storage_backend = get_storage()
+        for staging_path, item in zip(staging_paths, items):
+            file_path = item[5]
+            renamed = rename_existing_file(file_path)
+            os.replace(staging_path, file_path)
+            promoted.append((file_path, renamed))
+            storage_backend.publish(file_path)
+        
+        # 4. 单事务写入所有版本和审计日志
+        new_versions = [
+            build_version(fields, software_name, version, file_path, file_size, file_ext, current_user.username)
+            for (file, fields, software_name, version, file_ext, file_path), file_size in zip(items, sizes)
+        ]
+        db.session.add_all(new_versions)
+        db.session.flush()
+        db.session.add_all([
+            build_log(current_user, 'upload', 'version', v.id, f'{v.software_name} v{v.version}', 'success',
+                      f'用户 {current_user.username} 批量上传文件 {v.software_name} v{v.version}.{v.file_type} 成功 (批次 {batch_id})')
+            for v in new_versions
+        ])
+        db.session.commit()
+        for v in new_versions:
+            storage_backend.evict_local(v.file_path)
+    except Exception as e:
+        db.session.rollback()
+        # 撤销文件移动并清理暂存文件
+        for file_path, renamed in reversed(promoted):
+            try:
+                get_storage().unpublish(file_path)
+            except Exception as undo_error:
+                app.logger.error(f"Batch upload unpublish error: {str(undo_error)}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            if renamed:
+                get_storage().move(renamed, file_path)
+        for staging_path in staged:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+        app.logger.error(f"Batch upload error: {str(e)}")
+        return jsonify({'error': f'批量上传失败: {str(e)}'}), 500
+    
+    metrics.AUDIT_LOG_WRITES.labels(status='success').inc(len(new_versions))
+    notify_catalog_changed()
+    for v in new_versions:
+        schedule_background_tasks(v)
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'versions': [{
+            'id': v.id,
+            'software': v.software_name,
+            'version': v.version,
+            'file_type': v.file_type,
+            'file_size': v.file_size
+        } for v in new_versions]
+    }), 201
+
+# 断点续传：分块写入时每次从请求流读取的字节数
+UPLOAD_COPY_BUFFER = 1024 * 1024
+
+def cleanup_expired_upload_sessions():
+    """回收过期的断点续传会话及其暂存文件，返回回收数量"""
+    expired = UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow()).all()
+    for upload_session in expired:
+        if os.path.exists(upload_session.staging_path):
+            os.remove(upload_session.staging_path)
+        db.session.delete(upload_session)
+    if expired:
+        db.session.commit()
+        app.logger.info(f"回收过期上传会话: {len(expired)} 个")
+    return len(expired)
+
+def get_upload_session_or_404(upload_id, user):
+    """获取当前用户自己的、未过期的上传会话"""
+    upload_session = UploadSession.query.filter_by(id=upload_id, user_id=user.id).first()
+    if not upload_session or upload_session.expires_at < datetime.utcnow():
+        return None
+    return upload_session
+
+def get_received_offset(upload_session):
+    """已接收字节数以暂存文件实际大小为准（多worker共享）"""
+    try:
+        return os.path.getsize(upload_session.staging_path)
+    except OSError:
+        return 0
+
+@app.route('/api/uploads', methods=['POST'])
+def api_upload_session_create():
+    """API：创建断点续传上传会话
+    
+    JSON参数: filename, total_size, metadata（与/upload相同的上传字段，也可在完成时提供）
+    """
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'error': '请先登录'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('filename') or '').strip()
+    total_size = data.get('total_size')
+    if not filename or not isinstance(total_size, int) or total_size <= 0:
+        return jsonify({'error': 'filename 和 total_size 为必填项'}), 400
+    if total_size > app.config['RESUMABLE_UPLOAD_MAX_SIZE']:
+        return jsonify({'error': f'文件超过大小上限 {app.config["RESUMABLE_UPLOAD_MAX_SIZE"]} bytes'}), 413
+    
+    file_ext = filename.lower().split('.')[-1]
+    if file_ext not in SUPPORTED_FILE_TYPES:
+        supported_extensions = ', '.join([f'.{ext}' for ext in SUPPORTED_FILE_TYPES])
+        return jsonify({'error': f'仅支持 {supported_extensions} 文件上传！'}), 400
+    if not isinstance(data.get('metadata') or {}, dict):
+        return jsonify({'error': 'metadata 必须是JSON对象'}), 400
+    
+    # 顺便回收过期会话
+    cleanup_expired_upload_sessions()
+    
+    upload_id = uuid.uuid4().hex
+    staging_path = os.path.join(app.config['UPLOAD_FOLDER_TESTING'], f'{upload_id}.part')
+    open(staging_path, 'wb').close()
+    
+    upload_session = UploadSession(
+        id=upload_id,
+        user_id=current_user.id,
+        filename=filename,
+        total_size=total_size,
+        staging_path=staging_path,
+        upload_metadata=json.dumps(data.get('metadata') or {}, ensure_ascii=False),
+        expires_at=datetime.utcnow() + timedelta(hours=app.config['UPLOAD_SESSION_TTL_HOURS'])
+    )
+    db.session.add(upload_session)
+    db.session.commit()
+    
+    return jsonify({
+        'upload_id': upload_id,
+        'offset': 0,
+        'total_size': total_size,
+        'expires_at': upload_session.expires_at.isoformat()
+    }), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['HEAD', 'GET'])
+def api_upload_session_status(upload_id):
+    """API：查询上传会话已接收的偏移量（响应头 Upload-Offset）"""
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'error': '请先登录'}), 401
+    
+    upload_session = get_upload_session_or_404(upload_id, current_user)
+    if not upload_session:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+    
+    offset = get_received_offset(upload_session)
+    response = jsonify({
+        'upload_id': upload_id,
+        'offset': offset,
+        'total_size': upload_session.total_size,
+        'expires_at': upload_session.expires_at.isoformat()
+    })
+    response.headers['Upload-Offset'] = str(offset)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def api_upload_session_chunk(upload_id):
+    """API：在指定偏移量追加一个分块（Upload-Offset 请求头必须等于已接收字节数）"""
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'error': '请先登录'}), 401
+    
+    upload_session = get_upload_session_or_404(upload_id, current_user)
+    if not upload_session:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+    
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': '缺少 Upload-Offset'}), 400
+    staging_path, total_size = upload_session.staging_path, upload_session.total_size
+    release_db_connection()
+    
+    with open(staging_path, 'ab') as staging:
+        # 文件锁防止同一会话的并发分块交错写入（不阻塞等待：gevent下阻塞的flock会卡住整个worker）
+        try:
+            fcntl.flock(staging, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return jsonify({'error': '该会话正在接收其他分块，请稍后查询偏移量后重试'}), 409
+        try:
+            received = staging.seek(0, os.SEEK_END)
+            if offset != received:
+                response = jsonify({'error': '偏移量不匹配', 'offset': received})
+                response.headers['Upload-Offset'] = str(received)
+                return response, 409
+            
+            remaining = total_size - received
+            while True:
+                chunk = request.stream.read(UPLOAD_COPY_BUFFER)
+                if not chunk:
+                    break
+                if len(chunk) > remaining:
+                    staging.truncate(received)
+                    return jsonify({'error': '分块超出文件总大小', 'offset': received}), 413
+                staging.write(chunk)
+                remaining -= len(chunk)
+            staging.flush()
+            offset = staging.tell()
+        finally:
+            fcntl.flock(staging, fcntl.LOCK_UN)
+    
+    # 每次收到分块都顺延过期时间
+    UploadSession.query.filter_by(id=upload_id)\
+                       .update({UploadSession.expires_at: datetime.utcnow() + timedelta(hours=app.config['UPLOAD_SESSION_TTL_HOURS'])})
+    db.session.commit()
+    
+    response = jsonify({'upload_id': upload_id, 'offset': offset, 'total_size': total_size})
+    response.headers['Upload-Offset'] = str(offset)
+    return response
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def api_upload_session_complete(upload_id):
+    """API：完成上传，执行与/upload相同的校验并创建版本记录
+    
+    JSON参数（可选）: metadata，与创建会话时提供的元数据合并
+    """
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'error': '请先登录'}), 401
+    
+    upload_session = get_upload_session_or_404(upload_id, current_user)
+    if not upload_session:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+    
+    offset = get_received_offset(upload_session)
+    if offset != upload_session.total_size:
+        return jsonify({'error': '文件尚未上传完整', 'offset': offset,
+                        'total_size': upload_session.total_size}), 409
+    
+    data = request.get_json(silent=True)
+    metadata = (data.get('metadata') if isinstance(data, dict) else None) or {}
+    if not isinstance(metadata, dict):
+        return jsonify({'error': 'metadata 必须是JSON对象'}), 400
+    fields = json.loads(upload_session.upload_metadata or '{}')
+    fields.update(metadata)
+    error = validate_upload_fields(fields)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    file_path = None
+    renamed = None
+    published = False
+    committed = False
+    try:
+        with open(upload_session.staging_path, 'rb') as staging:
+            file_ext, error = validate_upload_file(FileStorage(stream=staging, filename=upload_session.filename))
+        if error:
+            return jsonify({'error': error}), 400
+        
+        software_name = secure_filename(str(fields['software_name']).strip())
+        version = normalize_version(fields['version'])
+        target_path = get_version_file_path(software_name, version, file_ext)
+        renamed = rename_existing_file(target_path)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.move(upload_session.staging_path, target_path)
+        file_path = target_path
+        file_size = os.path.getsize(file_path)
+        get_storage().publish(file_path)
+        published = True
+        
+        new_version = build_version(fields, software_name, version, file_path,
+                                    file_size, file_ext, current_user.username)
+        db.session.add(new_version)
+        db.session.delete(upload_session)
+        db.session.commit()
+        committed = True
+        get_storage().evict_local(file_path)
+    except Exception as e:
+        db.session.rollback()
+        if not committed:
+            # 文件放回暂存区，客户端可以重试完成；被重命名的旧版本文件恢复到原路径
+            if published:
+                try:
+                    get_storage().unpublish(file_path)
+                except Exception as undo_error:
+                    app.logger.error(f"Resumable upload unpublish error: {str(undo_error)}")
+            if file_path and os.path.exists(file_path):
+                shutil.move(file_path, upload_session.staging_path)
+            if renamed:
+                get_storage().move(renamed, target_path)
+        app.logger.error(f"Resumable upload error: {str(e)}")
+        return jsonify({'error': f'上传失败: {str(e)}'}), 500
+    
+    # 记录上传日志
+    log_operation(current_user, 'upload', 'version', new_version.id, f'{software_name} v{version}', 'success', f'用户 {current_user.username} 断点续传上传文件 {software_name} v{version}.{file_ext} 成功')
+    notify_catalog_changed()
+    schedule_background_tasks(new_version)
+    
+    return jsonify({
+        'id': new_version.id,
+        'software': new_version.software_name,
+        'version': new_version.version,
+        'file_type': new_version.file_type,
+        'file_size': new_version.file_size
+    }), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def api_upload_session_abort(upload_id):
+    """API：放弃上传会话并删除暂存文件"""
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'error': '请先登录'}), 401
+    
+    upload_session = get_upload_session_or_404(upload_id, current_user)
+    if not upload_session:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+    
+    if os.path.exists(upload_session.staging_path):
+        os.remove(upload_session.staging_path)
+    db.session.delete(upload_session)
+    db.session.commit()
+    return '', 204
+
+@app.cli.command('cleanup-uploads')
+def cleanup_uploads_command():
+    """回收过期的断点续传会话（可由cron定期执行: flask --app app cleanup-uploads）"""
+    print(f"✅ 已回收 {cleanup_expired_upload_sessions()} 个过期上传会话")
+
 def archive_old_versions(software_name):
     """归档旧版本：保留最新版在current，其余移到history"""
-    # 获取该软件的所有版本（按时间排序）
+    # 获取该软件的所有版本（按语义化版本号从新到旧，旧分支的补丁版本不会成为最新版）
     versions = Version.query.filter_by(software_name=software_name)\
-                           .order_by(Version.uploaded_at.desc()).all()
+                           .order_by(*VERSION_NEWEST_FIRST).all()
     
     if len(versions) > 1:
+        storage_backend = get_storage()
         # 除最新版外，其余都归档
         for version in versions[1:]:
             old_path = version.file_path
-            if app.config['UPLOAD_FOLDER_CURRENT'] in old_path:
-                # 移动到历史目录
-                filename = os.path.basename(old_path)
-                new_path = os.path.join(app.config['UPLOAD_FOLDER_HISTORY'], filename)
+            # 同名重复上传的旧记录可能与最新版指向同一文件，不能移走
+            if app.config['UPLOAD_FOLDER_CURRENT'] in old_path and old_path != versions[0].file_path:
+                # 移动到历史目录（文件名带版本ID，不会与其它软件或重复上传冲突）
+                new_path = storage_layout.history_path(app.config['UPLOAD_FOLDER_HISTORY'], version.id,
+                                                       version.get_filename())
                 
-                if os.path.exists(old_path):
-                    os.rename(old_path, new_path)
+                if storage_backend.exists(old_path):
+                    storage_backend.move(old_path, new_path)
                     version.file_path = new_path
-                    db.session.commit()
+        
+        # 所有路径变更一次提交
+        db.session.commit()
+
+def get_version_sha256(version):
+    """获取版本文件的SHA-256，首次计算后保存到数据库"""
+    if not version.sha256:
+        version.sha256 = run_blocking(storage.sha256, get_storage(), version.file_path)
+        db.session.commit()
+    return version.sha256
+
+def get_previous_version(version):
+    """获取同一软件、同一文件类型的上一个版本（按语义化版本号，同一版本号按上传时间）"""
+    return Version.query.filter(Version.software_name == version.software_name,
+                                Version.file_type == version.file_type,
+                                Version.id != version.id,
+                                or_(Version.version_key < version.version_key,
+                                    (Version.version_key == version.version_key)
+                                    & (Version.uploaded_at <= version.uploaded_at)))\
+                        .order_by(*VERSION_NEWEST_FIRST).first()
+
+def can_generate_delta(base, version):
+    """判断两个版本之间能否生成差分补丁"""
+    if not delta.is_available() or base.id == version.id:
+        return False
+    if base.software_name != version.software_name or base.file_type != version.file_type:
+        return False
+    max_size = app.config['DELTA_MAX_FILE_SIZE']
+    return (base.file_size <= max_size and version.file_size <= max_size
+            and get_storage().exists(base.file_path) and get_storage().exists(version.file_path))
+
+def generate_delta_patch(storage_backend, base_path, target_path, patch_path, tmp_dir):
+    """生成补丁，冷存储或对象存储中的版本先临时解压/下载到tmp_dir（在原生线程中执行，不访问app和数据库）"""
+    if os.path.exists(patch_path):
+        return
+    with storage_backend.materialize(base_path, tmp_dir) as base_file, \
+            storage_backend.materialize(target_path, tmp_dir) as target_file:
+        delta.generate_patch(base_file, target_file, patch_path)
+
+# 排队或生成中的补丁路径：同一补丁不重复排队，排队总数受 DELTA_MAX_PENDING 限制
+_pending_patches = set()
+
+def queue_delta_patch(base, version, patch_path):
+    """在后台生成补丁（已在排队或队列已满时跳过）"""
+    if patch_path in _pending_patches or len(_pending_patches) >= app.config['DELTA_MAX_PENDING']:
+        return
+    _pending_patches.add(patch_path)
+    future = submit_background(generate_delta_patch, get_storage(), base.file_path, version.file_path, patch_path,
+                               app.config['UPLOAD_FOLDER_TESTING'])
+    future.add_done_callback(lambda _: _pending_patches.discard(patch_path))
+
+def schedule_delta_generation(version):
+    """新版本上传后，在后台预先生成相对上一个版本的补丁"""
+    try:
+        base = get_previous_version(version)
+        if base and can_generate_delta(base, version):
+            patch_path = delta.get_patch_path(app.config['PATCH_FOLDER'], version.software_name, base.id, version.id)
+            queue_delta_patch(base, version, patch_path)
+    except Exception as e:
+        # 补丁只是优化，失败不影响上传
+        app.logger.error(f"Schedule delta error: {str(e)}")
+
+def schedule_variant_generation(version):
+    """在后台为版本文件生成gzip/zstd预压缩变体"""
+    # 对象存储的文件通过预签名URL直接下载，不使用预压缩变体
+    if not get_storage().is_local:
+        return
+    try:
+        submit_background(precompress.generate_variants, version.file_path,
+                          app.config['PRECOMPRESS_GZIP_LEVEL'], app.config['PRECOMPRESS_ZSTD_LEVEL'])
+    except Exception as e:
+        app.logger.error(f"Schedule precompress error: {str(e)}")
+
+def schedule_background_tasks(version):
+    """新版本上传后的后台任务：差分补丁 + 预压缩变体"""
+    schedule_delta_generation(version)
+    schedule_variant_generation(version)
+
+def get_delta_patch(base, version):
+    """获取已生成的 base -> version 补丁路径，补丁不比完整文件小时返回None
+    
+    请求中不生成补丁（bsdiff内存占用约为文件大小的十几倍）：补丁尚未生成时在后台排队，本次返回None（发送完整文件）。
+    """
+    if not can_generate_delta(base, version):
+        return None
+    patch_path = delta.get_patch_path(app.config['PATCH_FOLDER'], version.software_name, base.id, version.id)
+    generated = os.path.exists(patch_path)
+    metrics.cache_hit('delta_patch', generated)
+    if not generated:
+        queue_delta_patch(base, version, patch_path)
+        return None
+    if os.path.getsize(patch_path) >= version.file_size:
+        return None
+    return patch_path
+
+# 根据文件类型设置mimetype
+DOWNLOAD_MIMETYPES = {
+    'dll': 'application/octet-stream',
+    'exe': 'application/x-msdownload',
+    'apk': 'application/vnd.android.package-archive'
+}
+
+def send_patch_file(version, base, patch_path):
+    """发送差分补丁"""
+    response = send_file(
+        patch_path,
+        as_attachment=True,
+        download_name=f"{version.software_name}_v{base.version}_to_v{version.version}.{version.file_type}.bsdiff",
+        mimetype='application/octet-stream'
+    )
+    response.headers['X-Delta-Algorithm'] = delta.DELTA_ALGORITHM
+    response.headers['X-Delta-From'] = str(base.id)
+    response.headers['X-Target-Size'] = str(version.file_size)
+    response.headers['X-Target-SHA256'] = get_version_sha256(version)
+    return response
+
+def send_version_file(version):
+    """发送本地存储的版本文件（按Accept-Encoding选择预压缩变体，冷存储版本边解压边发送）"""
+    mimetype = DOWNLOAD_MIMETYPES.get(version.file_type, 'application/octet-stream')
+    
+    # 按Accept-Encoding选择最小的预压缩变体（变体在上传后一次性生成，不占用请求CPU）
+    accepted = {encoding: request.accept_encodings[encoding] for encoding in precompress.VARIANT_SUFFIXES}
+    encoding, file_path = precompress.choose_variant(version.file_path, accepted)
+    
+    if not encoding and tiering.is_cold(version.file_path):
+        # 冷存储版本且客户端不接受zstd：边解压边发送
+        response = send_file(
+            tiering.open_content(version.file_path),
+            as_attachment=True,
+            download_name=version.get_filename(),
+            mimetype=mimetype
+        )
+        response.content_length = version.file_size
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    response = send_file(
+        file_path,
+        as_attachment=True,
+        download_name=version.get_filename(),
+        mimetype=mimetype
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/download/<int:version_id>')
 @require_login()
 def download(version_id):
-    """下载文件"""
+    """下载文件（?from=<旧版本ID> 时优先返回差分补丁）"""
     version = Version.query.get_or_404(version_id)
+    if not get_storage().exists(version.file_path):
+        app.logger.error(f"Download file missing: {version.file_path}")
+        return jsonify({'error': '文件不存在'}), 404
     
-    # 更新下载计数
-    version.downloaded_count += 1
-    db.session.commit()
+    # 下载配额：超限时返回429，取得的租约在发送过程中限速，响应关闭时释放
+    current_user = get_current_user()
+    try:
+        lease = get_download_quota().acquire(current_user)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded_response(e)
+    
+    response = None
+    download_url = None
+    try:
+        # 差分下载：客户端已持有旧版本时只传输补丁
+        base = None
+        patch_path = None
+        from_id = request.args.get('from', type=int)
+        if from_id:
+            base = Version.query.get(from_id)
+            if base:
+                try:
+                    patch_path = get_delta_patch(base, version)
+                except Exception as e:
+                    app.logger.error(f"Delta error: {str(e)}")
+        
+        if patch_path:
+            response = send_patch_file(version, base, patch_path)
+        else:
+            # 对象存储：重定向到预签名URL，文件内容不经过应用服务器
+            download_url = get_storage().download_url(version.file_path, version.get_filename())
+            response = redirect(download_url) if download_url else send_version_file(version)
+        
+        # 文件确认可以发送后再更新下载计数和记录审计日志
+        version.downloaded_count += 1
+        db.session.commit()
+        
+        user_name = current_user.username if current_user else 'admin'
+        app.logger.info(f"Download: {version.software_name} v{version.version} ({version.file_type}) by {user_name}")
+        if patch_path:
+            log_operation(current_user, 'download', 'version', version.id, f'{version.software_name} v{version.version}', 'success', f'用户 {user_name} 差分下载文件 {version.software_name} v{base.version} -> v{version.version}.{version.file_type} 成功')
+        else:
+            log_operation(current_user, 'download', 'version', version.id, f'{version.software_name} v{version.version}', 'success', f'用户 {user_name} 下载文件 {version.software_name} v{version.version}.{version.file_type} 成功')
+    except Exception:
+        # 出错时释放租约，避免失败的下载占用同时下载数
+        if response is not None:
+            response.close()
+        lease.release()
+        raise
+    
+    if download_url:
+        # 文件不经过应用服务器，无法限速：按文件大小计入配额
+        lease.charge(version.file_size)
+        lease.release()
+        return response
+    return quota.throttle(response, lease)
+
+def resolve_bundle_versions(args):
+    """解析打包下载参数：ids=1,2,3 或 software=名称&from=起始版本&to=结束版本（按语义化版本闭区间）"""
+    if args.get('ids'):
+        try:
+            ids = [int(i) for i in args['ids'].split(',') if i.strip()]
+        except ValueError:
+            return None, 'ids 必须是逗号分隔的版本ID'
+        versions = Version.query.filter(Version.id.in_(ids)).all()
+        found = {v.id for v in versions}
+        missing = [i for i in ids if i not in found]
+        if missing:
+            return None, f'版本不存在: {", ".join(map(str, missing))}'
+        # 保持请求中的顺序
+        order = {version_id: index for index, version_id in enumerate(ids)}
+        return sorted(versions, key=lambda v: order[v.id]), None
+    
+    software_name = args.get('software', '').strip()
+    if not software_name:
+        return None, '需要提供 ids 或 software 参数'
+    
+    # 按语义化版本范围筛选（闭区间，与上传先后无关），from/to 不要求是已存在的版本
+    query = Version.query.filter_by(software_name=software_name)
+    if args.get('from'):
+        query = query.filter(Version.version_key >= versioning.sort_key(args['from']))
+    if args.get('to'):
+        query = query.filter(Version.version_key <= versioning.sort_key(args['to']))
+    return query.order_by(Version.version_key.asc(), Version.uploaded_at.asc()).all(), None
+
+@app.route('/download/bundle')
+@require_login()
+def download_bundle():
+    """打包下载多个版本（流式生成ZIP，计数和审计日志批量写入）"""
+    versions, error = resolve_bundle_versions(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    if not versions:
+        return jsonify({'error': '没有匹配的版本'}), 404
+    if len(versions) > app.config['BUNDLE_MAX_FILES']:
+        return jsonify({'error': f'单次最多打包 {app.config["BUNDLE_MAX_FILES"]} 个文件'}), 400
+    
+    storage_backend = get_storage()
+    missing = [v.id for v in versions if not storage_backend.exists(v.file_path)]
+    if missing:
+        return jsonify({'error': f'文件不存在: {", ".join(map(str, missing))}'}), 404
     
-    # 获取当前用户
     current_user = get_current_user()
+    try:
+        lease = get_download_quota().acquire(current_user)
+    except quota.QuotaExceeded as e:
+        return quota_exceeded_response(e)
+    
+    try:
+        # 压缩包内文件名去重
+        entries = []
+        used_names = set()
+        for v in versions:
+            arcname = v.get_filename()
+            if arcname in used_names:
+                arcname = f"{v.software_name}_v{v.version}_{v.id}.{v.file_type}"
+            used_names.add(arcname)
+            entries.append((arcname, v.file_path, v.file_size, v.uploaded_at))
+        
+        bundle_name = request.args.get('software') or 'bundle'
+        response = Response(bundle.stream_zip(entries, opener=storage_backend.open), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(bundle_name) or "bundle"}.zip"'
+    except Exception:
+        lease.release()
+        raise
+    
+    # 批量更新下载计数 + 审计日志（一次提交）
     user_name = current_user.username if current_user else 'admin'
+    try:
+        Version.query.filter(Version.id.in_([v.id for v in versions]))\
+                     .update({Version.downloaded_count: Version.downloaded_count + 1}, synchronize_session=False)
+        db.session.add_all([
+            build_log(current_user, 'download', 'version', v.id, f'{v.software_name} v{v.version}', 'success',
+                      f'用户 {user_name} 打包下载文件 {v.software_name} v{v.version}.{v.file_type} 成功')
+            for v in versions
+        ])
+        db.session.commit()
+        metrics.AUDIT_LOG_WRITES.labels(status='success').inc(len(versions))
+    except Exception as e:
+        db.session.rollback()
+        metrics.AUDIT_LOG_WRITES.labels(status='error').inc(len(versions))
+        app.logger.error(f"Bundle log error: {str(e)}")
     
-    # 记录审计日志
-    app.logger.info(f"Download: {version.software_name} v{version.version} ({version.file_type}) by {user_name}")
+    app.logger.info(f"Bundle download: {len(versions)} files by {user_name}")
+    return quota.throttle(response, lease)
+
+@app.cli.command('precompress')
+def precompress_command():
+    """为已有版本文件补齐预压缩变体（flask --app app precompress）"""
+    if not get_storage().is_local:
+        print("ℹ️ 对象存储后端不使用预压缩变体")
+        return
+    for version in Version.query.order_by(Version.id).all():
+        # 冷存储版本只保留zstd副本，不再生成其它变体
+        if os.path.exists(version.file_path):
+            encodings = precompress.generate_variants(version.file_path,
+                                                      app.config['PRECOMPRESS_GZIP_LEVEL'],
+                                                      app.config['PRECOMPRESS_ZSTD_LEVEL'])
+            print(f"✅ {version.software_name} v{version.version}: {', '.join(encodings) or '无收益，跳过'}")
+
+def freeze_history_versions(min_age_days, level, log=print):
+    """把归档超过min_age_days天的历史版本转为冷存储，返回(冷化数量, 节省字节数)
+
+    每个版本先生成并校验zstd副本、提交数据库，再删除原文件；
+    压缩收益不足的版本记录实际大小，之后不再重复评估。
+    """
+    cutoff = datetime.utcnow() - timedelta(days=min_age_days)
+    candidates = Version.query.filter(Version.file_path.startswith(app.config['UPLOAD_FOLDER_HISTORY']),
+                                      Version.storage_tier == tiering.HOT,
+                                      Version.stored_size.is_(None),
+                                      Version.uploaded_at <= cutoff)\
+                              .order_by(Version.id).all()
+    frozen, saved = 0, 0
+    for version in candidates:
+        if not os.path.exists(version.file_path):
+            continue
+        try:
+            stored_size = tiering.compress_cold(version.file_path, level)
+        except Exception as e:
+            log(f"❌ {version.software_name} v{version.version}: {str(e)}")
+            continue
+        if stored_size is None:
+            version.stored_size = version.file_size
+            db.session.commit()
+            log(f"⏭️ {version.software_name} v{version.version}: 压缩无收益，保持原文件")
+            continue
+        version.storage_tier = tiering.COLD
+        version.stored_size = stored_size
+        db.session.commit()
+        tiering.drop_hot(version.file_path)
+        frozen += 1
+        saved += version.file_size - stored_size
+        log(f"🧊 {version.software_name} v{version.version}: 压缩率 {version.get_compression_ratio():.1%}")
+    return frozen, saved
+
+@app.cli.command('archive-history')
+@click.option('--min-age-days', type=int, default=None, help='只冷化上传超过此天数的历史版本（默认 COLD_TIER_MIN_AGE_DAYS）')
+def archive_history_command(min_age_days):
+    """归档旧版本并把历史版本转为冷存储（可由cron定期执行: flask --app app archive-history）"""
+    for (software_name,) in db.session.query(Version.software_name).distinct().all():
+        archive_old_versions(software_name)
+    if not get_storage().is_local:
+        print("ℹ️ 对象存储后端不做本地冷化，可使用存储桶生命周期规则把 history/ 转为低频或归档存储类型")
+        return
+    if not tiering.is_available():
+        print("❌ 未安装 zstandard，无法生成冷存储")
+        return
+    if min_age_days is None:
+        min_age_days = app.config['COLD_TIER_MIN_AGE_DAYS']
+    frozen, saved = freeze_history_versions(min_age_days, app.config['COLD_TIER_ZSTD_LEVEL'])
+    print(f"✅ 已冷化 {frozen} 个历史版本，节省 {saved / (1024 * 1024):.2f} MB")
+
+@app.cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='只输出将要删除的版本和文件，不做修改')
+@click.option('--policy', 'policy_path', default=None, help='保留策略文件（默认 RETENTION_POLICY_FILE）')
+def gc_command(dry_run, policy_path):
+    """按保留策略删除旧版本并清理无主文件（可由cron定期执行: flask --app app gc）"""
+    policy = retention.load_policy(policy_path or app.config['RETENTION_POLICY_FILE'])
+    to_delete = []
+    for software_name, group in sorted(retention.plan(db, policy).items()):
+        if not group['deleted']:
+            continue
+        size = sum(row.stored_size or row.file_size for row in group['deleted'])
+        print(f"{'🔍' if dry_run else '🗑️'} {software_name}: 保留 {len(group['kept'])} 个，"
+              f"删除 {len(group['deleted'])} 个（{size / (1024 * 1024):.2f} MB）")
+        if dry_run:
+            for row in group['deleted']:
+                print(f"    - #{row.id} v{row.version}  {row.test_result}  上传于 {row.uploaded_at:%Y-%m-%d}")
+        to_delete.extend(group['deleted'])
     
-    # 记录下载日志
-    log_operation(current_user, 'download', 'version', version.id, f'{version.software_name} v{version.version}', 'success', f'用户 {user_name} 下载文件 {version.software_name} v{version.version}.{version.file_type} 成功')
+    # 对象存储中没有本地版本文件，只清理本地补丁缓存
+    folders = [app.config['UPLOAD_FOLDER_CURRENT'], app.config['UPLOAD_FOLDER_HISTORY']] if get_storage().is_local else []
+    grace_hours = app.config['RETENTION_ORPHAN_GRACE_HOURS']
+    if dry_run:
+        orphans = retention.find_orphan_files(db, folders, app.config['PATCH_FOLDER'], grace_hours,
+                                              deleted_ids=[row.id for row in to_delete])
+        for path in orphans:
+            print(f"🔍 无主文件: {path}")
+        print(f"🔍 共 {len(to_delete)} 个版本、{len(orphans)} 个无主文件待删除（未做修改）")
+        return
     
-    # 根据文件类型设置mimetype
-    mimetype_map = {
-        'dll': 'application/octet-stream',
-        'exe': 'application/x-msdownload',
-        'apk': 'application/vnd.android.package-archive'
-    }
-    mimetype = mimetype_map.get(version.file_type, 'application/octet-stream')
+    freed = retention.delete_versions(db, to_delete, get_storage().delete, app.config['RETENTION_BATCH_SIZE'])
+    if to_delete:
+        notify_catalog_changed()
+    # 版本删除后其补丁也成为无主文件，一并清理
+    orphans = retention.find_orphan_files(db, folders, app.config['PATCH_FOLDER'], grace_hours)
+    freed += retention.remove_files(orphans)
+    print(f"✅ 已删除 {len(to_delete)} 个版本、{len(orphans)} 个无主文件，释放 {freed / (1024 * 1024):.2f} MB")
+
+@app.cli.command('storage-push')
+def storage_push_command():
+    """把本地已有的版本文件上传到对象存储并删除本地副本（切换 STORAGE_BACKEND=s3 后执行，可重复执行）"""
+    storage_backend = get_storage()
+    if storage_backend.is_local:
+        print("❌ 当前存储后端是本地文件系统，请先配置 STORAGE_BACKEND=s3")
+        return
+    local = storage.LocalStorage()
+    pushed = 0
+    for (file_path,) in db.session.query(Version.file_path).distinct().all():
+        if not local.exists(file_path):
+            continue
+        # 冷存储的文件先解压，对象存储中保存原始内容
+        with local.materialize(file_path, app.config['UPLOAD_FOLDER_TESTING']) as source:
+            storage_backend.publish(file_path, source)
+        local.delete(file_path)
+        pushed += 1
+    print(f"✅ 已上传 {pushed} 个文件到对象存储")
+
+def get_layout_path(version):
+    """版本文件在分桶布局下应在的路径，不在current/history中的文件返回None"""
+    if version.file_path.startswith(app.config['UPLOAD_FOLDER_HISTORY']):
+        return storage_layout.history_path(app.config['UPLOAD_FOLDER_HISTORY'], version.id, version.get_filename())
+    if version.file_path.startswith(app.config['UPLOAD_FOLDER_CURRENT']):
+        return storage_layout.current_path(app.config['UPLOAD_FOLDER_CURRENT'], version.software_name,
+                                           version.version, version.file_type)
+    return None
+
+@app.cli.command('relayout-storage')
+@click.option('--batch-size', type=int, default=500, help='每批迁移的版本数')
+@click.option('--dry-run', is_flag=True, help='只统计需要迁移的版本，不做修改')
+def relayout_storage_command(batch_size, dry_run):
+    """把版本文件迁移到分桶目录布局并分批更新 file_path（flask --app app relayout-storage）
     
-    return send_file(
-        version.file_path,
-        as_attachment=True,
-        download_name=version.get_filename(),
-        mimetype=mimetype
-    )
+    先移动文件再提交该批路径，中断后可重复执行：原路径已不存在而目标路径存在的版本只更新记录。
+    迁移期间正在移动的那一批版本可能短暂下载失败，建议在低峰执行。
+    """
+    storage_backend = get_storage()
+    relocated, missing, last_id = 0, 0, 0
+    while True:
+        batch = Version.query.filter(Version.id > last_id).order_by(Version.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        updates = []
+        for version in batch:
+            target = get_layout_path(version)
+            if target is None or target == version.file_path:
+                continue
+            if not dry_run:
+                if storage_backend.exists(version.file_path):
+                    storage_backend.move(version.file_path, target)
+                elif not storage_backend.exists(target):
+                    missing += 1
+                    continue
+            updates.append({'id': version.id, 'file_path': target})
+        if updates and not dry_run:
+            db.session.execute(update(Version), updates)
+            db.session.commit()
+        relocated += len(updates)
+        db.session.expunge_all()
+    
+    if dry_run:
+        print(f"🔍 共 {relocated} 个版本需要迁移（未做修改）")
+        return
+    # 清理旧布局遗留的空目录（如 current/<软件名>/）
+    for folder in [app.config['UPLOAD_FOLDER_CURRENT'], app.config['UPLOAD_FOLDER_HISTORY']] if storage_backend.is_local else []:
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isdir(path) and not storage_layout.is_shard_dir(name):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass
+    print(f"✅ 已迁移 {relocated} 个版本" + (f"，{missing} 个版本文件不存在，已跳过" if missing else ""))
 
 @app.route('/api/versions')
+@db_routing.read_replica
 def api_versions():
     """API：获取所有版本数据"""
     versions = Version.query.order_by(Version.uploaded_at.desc()).all()
@@ -521,37 +1614,261 @@ def api_versions():
         'developer_dri': v.developer_dri,
         'file_size_mb': v.get_file_size_mb(),
         'uploaded_at': v.uploaded_at.strftime('%Y-%m-%d %H:%M'),
-        'downloaded_count': v.downloaded_count
+        'downloaded_count': v.downloaded_count,
+        'storage_tier': v.storage_tier,
+        'compression_ratio': v.get_compression_ratio()
     } for v in versions])
 
-@app.route('/health')
-def health_check():
-    """健康检查端点（用于监控）"""
-    try:
-        # 检查数据库连接
-        db.session.execute('SELECT 1')
-        db_status = "ok"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+@app.route('/api/changes')
+@db_routing.read_replica
+def api_changes():
+    """API：版本目录变更流（?since=<游标>&limit=，见 changefeed.py），镜像用 next_cursor 增量同步"""
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', app.config['CHANGEFEED_PAGE_SIZE'], type=int), 1),
+                app.config['CHANGEFEED_PAGE_SIZE'])
+    changes, next_cursor, has_more = changefeed.read_changes(db.session, since, limit)
+    return jsonify({
+        'changes': [changefeed.serialize(change) for change in changes],
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
+
+# 目录变更计数：版本目录的每次变更都从 version_change_head 分配变更ID（见 changefeed.py），
+# 最后分配的ID由所有节点共享（无状态节点 + 对象存储时也成立）；各进程缓存读到的值 CATALOG_STAMP_TTL 秒
+_catalog_stamp = {'value': 0, 'checked_at': None}
+
+def notify_catalog_changed():
+    """本进程修改了版本目录：立即使本进程的最新版本缓存失效（其它进程和节点在 CATALOG_STAMP_TTL 秒内感知）"""
+    _catalog_stamp['checked_at'] = None
+    _latest_version_cache.clear()
+
+def get_catalog_stamp():
+    """返回目录变更计数（最后分配的变更ID），读取失败时沿用上次的值"""
+    now = time.monotonic()
+    checked_at = _catalog_stamp['checked_at']
+    if checked_at is None or now - checked_at >= app.config['CATALOG_STAMP_TTL']:
+        try:
+            # 单独的连接：不占用请求会话（SSE空闲连接不持有数据库连接）
+            with db.engine.connect() as conn:
+                _catalog_stamp['value'] = conn.execute(
+                    select(VersionChangeHead.seq).where(VersionChangeHead.id == 1)).scalar() or 0
+        except Exception as e:
+            app.logger.error(f"Catalog stamp error: {str(e)}")
+        _catalog_stamp['checked_at'] = now
+    return _catalog_stamp['value']
+
+# 每个软件的最新版本缓存：{(软件名, 文件类型): 数据}，目录变更计数变化时整体失效
+_latest_version_cache = {}
+_latest_version_cache_stamp = [0]
+
+def serialize_version(v):
+    """版本的API表示（最新版本接口和推送通知共用）"""
+    return {
+        'id': v.id,
+        'software': v.software_name,
+        'version': v.version,
+        'file_type': v.file_type,
+        'file_size': v.file_size,
+        'sha256': v.sha256,
+        'test_result': v.test_result,
+        'uploaded_at': v.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'download_url': url_for('download', version_id=v.id)
+    }
+
+def get_latest_version_data(software_name, file_type=None):
+    """获取软件最新版本（带进程内缓存）"""
+    stamp = get_catalog_stamp()
+    if stamp != _latest_version_cache_stamp[0]:
+        _latest_version_cache.clear()
+        _latest_version_cache_stamp[0] = stamp
     
-    # 检查存储目录
-    storage_status = "ok"
-    for folder in [app.config['UPLOAD_FOLDER_TESTING'], 
-                  app.config['UPLOAD_FOLDER_CURRENT'],
-                  app.config['UPLOAD_FOLDER_HISTORY']]:
-        if not os.path.exists(folder) or not os.access(folder, os.W_OK):
-            storage_status = f"error: {folder} not writable"
+    key = (software_name, file_type)
+    metrics.cache_hit('latest_version', key in _latest_version_cache)
+    if key not in _latest_version_cache:
+        query = Version.query.filter_by(software_name=software_name)
+        if file_type:
+            query = query.filter_by(file_type=file_type)
+        latest = query.order_by(*VERSION_NEWEST_FIRST).first()
+        _latest_version_cache[key] = serialize_version(latest) if latest else None
+    return _latest_version_cache[key]
+
+@app.route('/api/software/<software_name>/latest')
+def api_latest_version(software_name):
+    """API：获取软件最新版本（可选 ?file_type=dll）"""
+    data = get_latest_version_data(software_name, request.args.get('file_type'))
+    if not data:
+        return jsonify({'error': '没有该软件的版本'}), 404
+    
+    response = jsonify(data)
+    response.set_etag(f"{data['id']}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/software/<software_name>/versions')
+@db_routing.read_replica
+def api_software_versions(software_name):
+    """API：按语义化版本号范围查询软件的版本，从新到旧（?min=1.2&max=2.0 表示 >=1.2 且 <2.0，可选 file_type、limit）"""
+    query = Version.query.filter(Version.software_name == software_name)
+    if request.args.get('min'):
+        query = query.filter(Version.version_key >= versioning.sort_key(request.args['min']))
+    if request.args.get('max'):
+        query = query.filter(Version.version_key < versioning.upper_bound_key(request.args['max']))
+    if request.args.get('file_type'):
+        query = query.filter(Version.file_type == request.args['file_type'])
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    
+    versions = query.order_by(*VERSION_NEWEST_FIRST).limit(limit).all()
+    return jsonify({'software': software_name, 'versions': [serialize_version(v) for v in versions]})
+
+def get_catalog_latest_data(file_type=None):
+    """获取每个软件的最新版本（窗口函数在数据库中排名，与单个软件的最新版本共用缓存）"""
+    stamp = get_catalog_stamp()
+    if stamp != _latest_version_cache_stamp[0]:
+        _latest_version_cache.clear()
+        _latest_version_cache_stamp[0] = stamp
+    
+    key = (None, file_type)
+    metrics.cache_hit('latest_version', key in _latest_version_cache)
+    if key not in _latest_version_cache:
+        ranked = select(Version.id, func.row_number().over(partition_by=Version.software_name,
+                                                           order_by=VERSION_NEWEST_FIRST).label('rank'))
+        if file_type:
+            ranked = ranked.where(Version.file_type == file_type)
+        ranked = ranked.subquery()
+        versions = Version.query.join(ranked, Version.id == ranked.c.id).filter(ranked.c.rank == 1)\
+                                .order_by(Version.software_name).all()
+        _latest_version_cache[key] = [serialize_version(v) for v in versions]
+    return _latest_version_cache[key]
+
+@app.route('/api/software')
+@db_routing.read_replica
+def api_catalog_latest():
+    """API：每个软件的最新版本（可选 ?file_type=dll）"""
+    return jsonify({'software': get_catalog_latest_data(request.args.get('file_type'))})
+
+# SSE每次查询的新版本数
+SSE_PAGE_SIZE = 100
+
+@app.route('/api/versions/stream')
+def api_versions_stream():
+    """API：Server-Sent Events推送新上传的版本
+    
+    事件ID是目录变更流的游标（见 changefeed.py，按提交顺序连续），从 Last-Event-ID 请求头或 ?since=<游标>
+    之后开始推送新增版本，重连时不会漏掉并发提交的版本；可用 ?software= 过滤。
+    连接在 SSE_MAX_DURATION 秒后关闭，由客户端自动重连。
+    空闲时每秒只检查一次目录变更计数（每个进程每 CATALOG_STAMP_TTL 秒最多查询一次）；同步worker下每个连接占用一个worker，
+    大量订阅者应使用gevent worker部署（见 gunicorn.conf.py）。
+    """
+    software_name = request.args.get('software')
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('since', type=int)
+    if last_id is None:
+        last_id = db.session.query(func.max(VersionChange.id)).scalar() or 0
+    # 不在空闲连接上占用数据库连接
+    db.session.remove()
+    
+    poll_interval = app.config['SSE_POLL_INTERVAL']
+    keepalive = app.config['SSE_KEEPALIVE']
+    
+    def generate():
+        nonlocal last_id
+        deadline = time.monotonic() + app.config['SSE_MAX_DURATION']
+        stamp = None
+        last_sent = time.monotonic()
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            current = get_catalog_stamp()
+            if current != stamp:
+                stamp = current
+                # 一次变更可能带来超过一页的新版本（批量上传、重连时的积压），取到不满一页为止
+                while True:
+                    query = VersionChange.query.filter(VersionChange.id > last_id,
+                                                       VersionChange.action == changefeed.CREATE)
+                    if software_name:
+                        query = query.filter_by(software_name=software_name)
+                    changes = query.order_by(VersionChange.id).limit(SSE_PAGE_SIZE).all()
+                    versions = {v.id: v for v in Version.query.filter(
+                        Version.id.in_([c.version_id for c in changes]))} if changes else {}
+                    # 已删除的版本不推送，但游标照常前进
+                    events = [(c.id, serialize_version(versions[c.version_id]) if c.version_id in versions else None)
+                              for c in changes]
+                    db.session.remove()
+                    for change_id, data in events:
+                        last_id = change_id
+                        if data is None:
+                            continue
+                        yield f"id: {change_id}\nevent: version\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                        last_sent = time.monotonic()
+                    if len(events) < SSE_PAGE_SIZE:
+                        break
+            if time.monotonic() - last_sent >= keepalive:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(poll_interval)
     
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/search')
+@db_routing.read_replica
+def api_search():
+    """API：全文检索版本（软件名称、版本号、更新说明、测试描述、测试ID、开发负责人），按相关度分页"""
+    keyword = request.args.get('q', '').strip()
+    if not keyword:
+        return jsonify({'error': '缺少检索词 q'}), 400
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    versions, total = search.search_versions(db, keyword, page, per_page, request.args.get('software'))
+    
+    return jsonify({
+        'q': keyword,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'results': [{
+            'id': v.id,
+            'software': v.software_name,
+            'version': v.version,
+            'test_result': v.test_result,
+            'test_id': v.test_id,
+            'developer_dri': v.developer_dri,
+            'update_notes': v.update_notes,
+            'uploaded_at': v.uploaded_at.strftime('%Y-%m-%d %H:%M')
+        } for v in versions]
+    })
+
+@app.route('/livez')
+def liveness_check():
+    """存活检查：不访问数据库和磁盘"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readiness_check():
+    """就绪检查：返回后台探测的缓存结果，未就绪时返回503"""
+    report = app.extensions['readiness'].current()
+    return jsonify(health.serialize(report)), 200 if report['ready'] else 503
+
+@app.route('/health')
+def health_check():
+    """健康检查端点（用于监控，结果来自就绪检查的缓存）"""
+    report = app.extensions['readiness'].current()
+    checks = report['checks']
     return jsonify({
-        'status': 'healthy' if db_status == 'ok' and storage_status == 'ok' else 'unhealthy',
+        'status': 'healthy' if report['ready'] else 'unhealthy',
         'timestamp': datetime.utcnow().isoformat(),
-        'database': db_status,
-        'storage': storage_status,
-        'version': '1.0.0'
+        'database': checks['database']['status'],
+        'storage': checks['storage']['status'],
+        'version': '1.0.0',
+        'checks': checks
     })
 
 # 数据分析路由
 @app.route('/analytics')
+@db_routing.read_replica
 @require_login()
 def analytics():
     """数据分析页面"""
@@ -585,6 +1902,9 @@ def analytics():
     
     # 4. 下载量统计（前10个版本）
     top_downloads = Version.query.order_by(Version.downloaded_count.desc()).limit(10).all()
+    # 图表用的可序列化数据（模型对象不能直接tojson）
+    top_downloads_chart = [{'software_name': v.software_name, 'version': v.version,
+                            'downloaded_count': v.downloaded_count} for v in top_downloads]
     
     # 5. 文件大小分布
     file_sizes = []
@@ -600,10 +1920,12 @@ def analytics():
                            test_results=test_results,
                            file_types=file_types,
                            top_downloads=top_downloads,
+                           top_downloads_chart=top_downloads_chart,
                            file_sizes=file_sizes)
 
 # API：获取数据分析数据
 @app.route('/api/analytics')
+@db_routing.read_replica
 @require_login()
 def api_analytics():
     """API：获取数据分析数据"""
@@ -647,21 +1969,126 @@ def api_analytics():
         'top_downloads': top_downloads
     })
 
+# 用户列表可排序字段（均有索引）
+USER_SORT_FIELDS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'department': User.department,
+    'created_at': User.created_at,
+}
+USERS_PER_PAGE = 50
+USERS_PER_PAGE_MAX = 200
+
+def query_users(args):
+    """按请求参数构建用户分页查询（前缀搜索 + 排序 + 分页）"""
+    query = User.query.options(joinedload(User.role))
+    
+    # 前缀搜索：LIKE 'q%' 可以利用 username/email/department 上的索引
+    keyword = args.get('q', '').strip()
+    if keyword:
+        escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'{escaped}%'
+        query = query.filter(or_(
+            User.username.like(pattern, escape='\\'),
+            User.email.like(pattern, escape='\\'),
+            User.department.like(pattern, escape='\\')
+        ))
+    
+    # 排序：只允许白名单字段，id作为稳定的次级排序
+    sort = args.get('sort', 'id')
+    column = USER_SORT_FIELDS.get(sort, User.id)
+    descending = args.get('order', 'asc') == 'desc'
+    query = query.order_by(column.desc() if descending else column.asc(),
+                           User.id.desc() if descending else User.id.asc())
+    
+    page = args.get('page', 1, type=int)
+    per_page = min(max(args.get('per_page', USERS_PER_PAGE, type=int), 1), USERS_PER_PAGE_MAX)
+    return query.paginate(page=page, per_page=per_page, error_out=False)
+
 # 用户管理路由
 @app.route('/admin/users')
 @require_login()
 def user_management():
-    """用户管理页面"""
+    """用户管理页面（服务端分页）"""
     # 获取当前用户
     current_user = get_current_user()
     if not current_user or not current_user.has_permission('manage_users'):
         flash('❌ 权限不足！', 'error')
         return redirect(url_for('index'))
     
-    # 获取所有用户
-    users = User.query.all()
+    # 分页获取用户（角色通过joinedload一次性加载，避免N+1）
+    pagination = query_users(request.args)
+    
+    return render_template('user_management.html',
+                           users=pagination.items,
+                           pagination=pagination,
+                           q=request.args.get('q', '').strip(),
+                           sort=request.args.get('sort', 'id'),
+                           order=request.args.get('order', 'asc'))
+
+# API：分页获取用户数据
+@app.route('/api/admin/users')
+@require_login()
+def api_users():
+    """API：分页获取用户数据（供用户管理页懒加载）"""
+    current_user = get_current_user()
+    if not current_user or not current_user.has_permission('manage_users'):
+        return jsonify({'error': '权限不足'}), 403
+    
+    pagination = query_users(request.args)
+    return jsonify({
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'pages': pagination.pages,
+        'total': pagination.total,
+        'has_next': pagination.has_next,
+        'users': [{
+            'id': u.id,
+            'username': u.username,
+            'full_name': u.full_name,
+            'email': u.email,
+            'department': u.department,
+            'role': u.role.name if u.role else None,
+            'is_active': u.is_active,
+            'created_at': u.created_at.strftime('%Y-%m-%d %H:%M') if u.created_at else None
+        } for u in pagination.items]
+    })
+
+def serialize_quota(user, usage):
+    """用户的下载配额规则和当日用量"""
+    usage = usage or {'active_downloads': 0, 'day_bytes': 0, 'throttled_seconds': 0, 'rejected': 0}
+    return {
+        'user_id': user.id,
+        'username': user.username,
+        'role': user.role.name if user.role else None,
+        'limits': get_download_quota().rules_for(user),
+        **usage
+    }
+
+# API：当前用户的下载配额
+@app.route('/api/quota')
+@require_login()
+def api_quota():
+    """API：当前用户的下载配额和当日用量"""
+    current_user = get_current_user()
+    usage = get_download_quota().usage([current_user.id]).get(current_user.id)
+    return jsonify(serialize_quota(current_user, usage))
+
+# API：所有用户的下载配额用量
+@app.route('/api/admin/quota')
+@require_login()
+def api_admin_quota():
+    """API：有下载记录的用户的配额和当日用量（按当日下载量降序）"""
+    current_user = get_current_user()
+    if not current_user or not current_user.has_permission('manage_users'):
+        return jsonify({'error': '权限不足'}), 403
     
-    return render_template('user_management.html', users=users)
+    usage = get_download_quota().usage()
+    users = User.query.options(joinedload(User.role)).filter(User.id.in_(list(usage))).all() if usage else []
+    items = [serialize_quota(u, usage[u.id]) for u in users]
+    items.sort(key=lambda item: item['day_bytes'], reverse=True)
+    return jsonify({'users': items})
 
 # 角色管理路由
 @app.route('/admin/roles')
@@ -674,63 +2101,32 @@ def role_management():
         flash('❌ 权限不足！', 'error')
         return redirect(url_for('index'))
     
-    # 获取所有角色
-    roles = Role.query.all()
+    # 获取所有角色（权限一次性selectin加载，避免每行一次查询）
+    roles = Role.query.options(selectinload(Role.permissions)).all()
     
     return render_template('role_management.html', roles=roles)
 
 def init_db():
-    """初始化数据库（首次运行时调用）"""
+    """初始化/升级数据库：执行未执行的迁移（已是最新时只有一次查询）"""
     with app.app_context():
-        db.create_all()
+        applied = migrations.upgrade()
         print("✅ 数据库初始化成功！")
         print(f"   - 数据库存储: {app.config['SQLALCHEMY_DATABASE_URI']}")
-        print("   - 表已创建: versions, users, roles, permissions, logs")
-        
-        # 创建默认角色和权限
-        try:
-            # 创建默认权限
-            default_permissions = [
-                Permission(name='upload', description='上传文件'),
-                Permission(name='download', description='下载文件'),
-                Permission(name='view_analytics', description='查看数据分析'),
-                Permission(name='manage_users', description='管理用户'),
-                Permission(name='manage_roles', description='管理角色'),
-            ]
-            for perm in default_permissions:
-                if not Permission.query.filter_by(name=perm.name).first():
-                    db.session.add(perm)
-            
-            # 创建默认角色
-            admin_role = Role.query.filter_by(name='admin').first()
-            if not admin_role:
-                admin_role = Role(name='admin', description='管理员')
-                db.session.add(admin_role)
-            
-            user_role = Role.query.filter_by(name='user').first()
-            if not user_role:
-                user_role = Role(name='user', description='普通用户')
-                db.session.add(user_role)
-            
-            db.session.commit()
-            
-            # 为角色分配权限
-            # 管理员角色分配所有权限
-            for perm in default_permissions:
-                if perm not in admin_role.permissions:
-                    admin_role.permissions.append(perm)
-            
-            # 普通用户分配基本权限
-            basic_permissions = ['upload', 'download', 'view_analytics']
-            for perm in default_permissions:
-                if perm.name in basic_permissions and perm not in user_role.permissions:
-                    user_role.permissions.append(perm)
-            
-            db.session.commit()
-            print("✅ 默认角色和权限创建成功！")
-        except Exception as e:
-            app.logger.error(f"初始化默认角色和权限失败: {str(e)}")
-            db.session.rollback()
+        print(f"   - 本次执行迁移: {', '.join(applied) if applied else '无（已是最新）'}")
+
+@app.cli.command('migrate')
+@click.option('--status', 'show_status', is_flag=True, help='只查看迁移状态，不执行')
+def migrate_command(show_status):
+    """执行数据库迁移（部署时运行一次: flask --app app migrate）"""
+    if show_status:
+        applied = migrations.applied_versions()
+        for version, description, _ in migrations.MIGRATIONS:
+            applied_at = applied.get(version)
+            state = f'✅ {applied_at:%Y-%m-%d %H:%M:%S}' if applied_at else '⏳ 未执行'
+            print(f'{version}  {state}  {description}')
+        return
+    applied = migrations.upgrade()
+    print(f"✅ 已执行 {len(applied)} 个迁移" if applied else "✅ 数据库已是最新")
 
 # 添加上下文处理器，让get_current_user在模板中可用
 @app.context_processor
@@ -738,7 +2134,7 @@ def inject_user():
     return dict(get_current_user=get_current_user)
 
 if __name__ == '__main__':
-    # 首次运行时初始化数据库
+    # 开发启动时执行未执行的迁移（生产部署时运行 flask --app app migrate）
     init_db()
     
     port = 5001
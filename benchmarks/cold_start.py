@@ -0,0 +1,120 @@
+"""测量worker冷启动耗时：导入app、create_app()、首个请求，以及gunicorn从启动到可服务的时间
+
+用法:
+    python benchmarks/cold_start.py                      # 各测10次，输出中位数/最小/最大值（JSON）
+    python benchmarks/cold_start.py --runs 20 --gunicorn --output cold_start.json
+
+每次测量都在新的Python进程中进行，使用临时SQLite数据库和独立存储目录；
+迁移在测量前执行一次，不计入启动时间（生产环境由部署步骤执行）。
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import requests
+
+from load_test import REPO_DIR, free_port, git_commit
+
+# 在子进程中执行，分阶段计时
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+module.create_app()
+t2 = time.perf_counter()
+response = module.app.test_client().get('/login')
+t3 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'create_app_ms': (t2 - t1) * 1000,
+                  'first_request_ms': (t3 - t2) * 1000, 'status': response.status_code}))
+"""
+
+
+def summarize(samples):
+    return {'median': round(statistics.median(samples), 1), 'min': round(min(samples), 1),
+            'max': round(max(samples), 1)}
+
+
+def measure_process(env):
+    """一次进程内冷启动：各阶段耗时 + 进程总耗时（含解释器启动）"""
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=REPO_DIR, env=env, text=True,
+                                     stderr=subprocess.DEVNULL)
+    result = json.loads(output.strip().splitlines()[-1])
+    if result.pop('status') != 200:
+        raise RuntimeError('首个请求失败')
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def measure_gunicorn(env):
+    """gunicorn（1个worker）从启动到首个请求成功的耗时"""
+    port = free_port()
+    env = dict(env, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS='1')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=REPO_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < 60:
+            try:
+                if requests.get(f'http://127.0.0.1:{port}/login', timeout=1).status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError('gunicorn 启动超时')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='测量worker冷启动耗时')
+    parser.add_argument('--runs', type=int, default=10, help='测量次数')
+    parser.add_argument('--gunicorn', action='store_true', help='同时测量gunicorn启动到可服务的时间')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到stdout）')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='dll_cold_start_')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'cold_start.db')}",
+               STORAGE_ROOT=os.path.join(workdir, 'storage'),
+               PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'))
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'migrate'], cwd=REPO_DIR, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+
+        samples = [measure_process(env) for _ in range(args.runs)]
+        results = {key: summarize([s[key] for s in samples]) for key in samples[0]}
+        if args.gunicorn:
+            results['gunicorn_ready_ms'] = summarize([measure_gunicorn(env) for _ in range(args.runs)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {'commit': git_commit(), 'timestamp': datetime.utcnow().isoformat(), 'runs': args.runs},
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""生成大规模合成数据集（用于性能测试）：产品、版本、用户、审计日志及对应的测试文件
+
+用法（务必指向独立的数据库和存储目录，不要在生产环境运行）:
+    DATABASE_URL=sqlite:////data/bench/dll.db STORAGE_ROOT=/data/bench/storage \\
+        python benchmarks/generate_dataset.py --seed 42
+
+    # 小规模试跑：只写数据库，不生成文件
+    ... python benchmarks/generate_dataset.py --versions 10000 --logs 100000 --no-files
+
+    # 重新生成（先删除之前生成的合成数据和文件）
+    ... python benchmarks/generate_dataset.py --reset
+
+相同的 --seed 和规模参数生成完全相同的数据（包括文件内容）。
+合成数据以 syn_ 前缀命名（软件名、用户名），与真实数据区分；所有合成用户的密码相同（--password）。
+角色和权限按 rbac_spec.json 同步，用户按权重分配到各角色。
+数据库使用批量插入（版本的批量插入和删除不触发映射事件，同一事务中通过 changefeed.record_inserted()/record_deleted()
+写入目录变更），测试文件由多进程并行生成（dll/exe为MZ头，so为ELF头，apk/jar为真实的ZIP包）。
+生成后可用 load_test.py --base-url 对该实例压测。
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from sqlalchemy import bindparam, delete, func, insert, select, update  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import changefeed  # noqa: E402
+import storage_layout  # noqa: E402
+import sync_rbac  # noqa: E402
+from app import app, db, init_db, notify_catalog_changed  # noqa: E402
+from models import Log, Role, User, Version  # noqa: E402
+
+PREFIX = 'syn_'
+
+# 文件类型分布（与生产环境大致相当：以dll为主）
+FILE_TYPE_WEIGHTS = {'dll': 60, 'so': 15, 'apk': 10, 'exe': 10, 'jar': 5}
+
+# 角色分配权重（按角色名匹配，未列出的角色权重为1）
+ROLE_WEIGHTS = {'role_visitor': 45, 'role_ops': 20, 'role_tester': 25, 'role_admin': 4, 'role_super_admin': 1,
+                'user': 20, 'admin': 2}
+
+# 审计日志动作分布（上传日志按版本单独生成）
+LOG_ACTION_WEIGHTS = {'download': 70, 'login': 18, 'logout': 8, 'update_profile': 1}
+LOGIN_FAILURE_RATE = 0.05
+
+TEST_RESULT_WEIGHTS = {'通过': 85, '失败': 10, '阻塞': 5}
+DEPARTMENTS = ['研发一部', '研发二部', '测试部', '运维部', '产品部', '平台部', '安全部', '客户端组']
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_4) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'python-requests/2.31.0',
+    'curl/8.5.0',
+]
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def next_version(rng, version):
+    """按补丁/次版本/主版本递增生成下一个版本号"""
+    major, minor, patch = version
+    roll = rng.random()
+    if roll < 0.05:
+        return major + 1, 0, 0
+    if roll < 0.30:
+        return major, minor + 1, 0
+    return major, minor, patch + 1
+
+
+def plan_products(rng, count, total_versions):
+    """生成产品列表，版本数呈长尾分布（少数产品版本很多）"""
+    weights = [1 / (i + 1) ** 0.8 for i in range(count)]
+    scale = total_versions / sum(weights)
+    counts = [max(1, int(w * scale)) for w in weights]
+    # 取整误差补到头部产品上，使总数精确
+    counts[0] += total_versions - sum(counts)
+    products = []
+    for i, version_count in enumerate(counts):
+        products.append({
+            'name': f'{PREFIX}product_{i:04d}',
+            'file_type': weighted_choice(rng, FILE_TYPE_WEIGHTS),
+            'version_count': version_count,
+        })
+    return products
+
+
+def plan_users(rng, count, start_id, role_ids, password_hash, now):
+    """生成用户行（所有用户共用一个密码哈希，避免逐个计算PBKDF2）"""
+    roles = list(role_ids)
+    weights = [ROLE_WEIGHTS.get(name, 1) for name in roles]
+    users = []
+    for i in range(count):
+        created_at = now - timedelta(days=rng.uniform(30, 1000))
+        users.append({
+            'id': start_id + i,
+            'username': f'{PREFIX}user_{i:05d}',
+            'email': f'{PREFIX}user_{i:05d}@example.com',
+            'full_name': f'合成用户{i:05d}',
+            'department': rng.choice(DEPARTMENTS),
+            'password_hash': password_hash,
+            'is_active': rng.random() > 0.03,
+            'failed_login_attempts': 0,
+            'role_id': role_ids[rng.choices(roles, weights=weights)[0]],
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+    return users
+
+
+def plan_versions(rng, products, start_id, uploaders, storage, start, end, file_size_kb):
+    """生成版本行：每个产品的最新版放在current，其余放在history（与归档逻辑一致）"""
+    versions = []
+    span = (end - start).total_seconds()
+    version_id = start_id
+    for product in products:
+        n = product['version_count']
+        # 上传时间在时间范围内递增
+        offsets = sorted(rng.uniform(0, span) for _ in range(n))
+        current = (1, 0, 0)
+        for index, offset in enumerate(offsets):
+            uploaded_at = start + timedelta(seconds=offset)
+            version = '.'.join(map(str, current))
+            file_type = product['file_type']
+            if index == n - 1:
+                file_path = storage_layout.current_path(storage['current'], product['name'], version, file_type)
+            else:
+                file_path = storage_layout.history_path(storage['history'], version_id,
+                                                        f"{product['name']}_v{version}.{file_type}")
+            duration = rng.randint(60, 4 * 3600)
+            versions.append({
+                'id': version_id,
+                'software_name': product['name'],
+                'version': version,
+                'file_path': file_path,
+                'file_type': file_type,
+                # 文件大小呈对数正态分布，中位数约为 --file-size-kb
+                'file_size': max(1024, min(int(rng.lognormvariate(0, 0.8) * file_size_kb * 1024), 64 * 1024 * 1024)),
+                'update_notes': f"{product['name']} {version} 更新说明：修复问题 #{rng.randint(1000, 99999)}，优化性能",
+                'test_description': f'回归测试 {rng.randint(20, 500)} 个用例',
+                'test_result': weighted_choice(rng, TEST_RESULT_WEIGHTS),
+                'test_duration': duration,
+                'test_completed_at': uploaded_at - timedelta(seconds=rng.randint(60, 86400)),
+                'test_id': f'T{version_id:08d}',
+                'developer_dri': f'dev_{rng.randint(1, 200):03d}',
+                'uploaded_by': rng.choice(uploaders),
+                'uploaded_at': uploaded_at,
+                'downloaded_count': 0,
+            })
+            version_id += 1
+            current = next_version(rng, current)
+    return versions
+
+
+def file_content(file_type, size, seed):
+    """生成带正确文件头的确定性文件内容"""
+    rng = random.Random(seed)
+    if file_type in ('apk', 'jar'):
+        # 真实的ZIP包（未压缩存储，文件大小接近目标大小）
+        if file_type == 'apk':
+            entries = [('AndroidManifest.xml', b'<manifest package="com.example.synthetic"/>'),
+                       ('classes.dex', rng.randbytes(max(0, size - 400)))]
+        else:
+            entries = [('META-INF/MANIFEST.MF', b'Manifest-Version: 1.0\r\n\r\n'),
+                       ('com/example/Synthetic.class', rng.randbytes(max(0, size - 400)))]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            for name, data in entries:
+                # 固定条目时间，保证内容可重复
+                archive.writestr(zipfile.ZipInfo(name, date_time=(2026, 1, 1, 0, 0, 0)), data)
+        return buffer.getvalue()
+    if file_type == 'so':
+        # ELF64 小端
+        header = b'\x7fELF\x02\x01\x01' + b'\x00' * 9
+    else:
+        # DOS头：MZ + e_lfanew 指向PE签名
+        header = b'MZ' + b'\x00' * 58 + (64).to_bytes(4, 'little') + b'PE\x00\x00'
+    return header + rng.randbytes(max(0, size - len(header)))
+
+
+def write_files(tasks):
+    """写入一批测试文件（在子进程中执行），返回每个文件的(实际大小, SHA-256)"""
+    results = []
+    for file_path, file_type, size, seed in tasks:
+        content = file_content(file_type, size, seed)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+        results.append((len(content), hashlib.sha256(content).hexdigest()))
+    return results
+
+
+def generate_files(versions, seed, workers, batch_size=200):
+    """并行生成版本文件，并把实际大小和哈希回填到版本行"""
+    tasks = [(v['file_path'], v['file_type'], v['file_size'], f"{seed}:{v['id']}") for v in versions]
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map按提交顺序返回结果，与versions一一对应
+        for batch_results in executor.map(write_files, batches):
+            for size, sha256 in batch_results:
+                versions[done]['file_size'] = size
+                versions[done]['sha256'] = sha256
+                done += 1
+            progress('文件', done, len(versions))
+
+
+def generate_logs(rng, count, users, versions, start, end, batch_size):
+    """按时间顺序分批生成审计日志，同时统计每个版本的下载次数"""
+    # 版本下载热度呈长尾分布，新版本更热门
+    version_names = {v['id']: f"{v['software_name']} v{v['version']}" for v in versions}
+    hot_ids = [v['id'] for v in sorted(versions, key=lambda v: v['uploaded_at'], reverse=True)]
+    cumulative_weights = []
+    total = 0
+    for rank in range(len(hot_ids)):
+        total += 1 / (rank + 1) ** 0.9
+        cumulative_weights.append(total)
+
+    active_users = [u for u in users if u['is_active']]
+    download_counts = Counter()
+    span = (end - start).total_seconds()
+    ips = [f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}' for _ in range(2000)]
+
+    batch = []
+    for i in range(count):
+        created_at = start + timedelta(seconds=span * i / count + rng.uniform(0, span / count))
+        user = rng.choice(active_users)
+        action = weighted_choice(rng, LOG_ACTION_WEIGHTS)
+        row = {
+            'user_id': user['id'], 'username': user['username'], 'action': action,
+            'resource_type': None, 'resource_id': None, 'resource_name': None,
+            'ip_address': rng.choice(ips), 'user_agent': rng.choice(USER_AGENTS),
+            'status': 'success', 'message': None, 'created_at': created_at,
+        }
+        if action == 'download':
+            version_id = rng.choices(hot_ids, cum_weights=cumulative_weights)[0]
+            download_counts[version_id] += 1
+            row.update(resource_type='version', resource_id=version_id, resource_name=version_names[version_id])
+        elif action == 'login' and rng.random() < LOGIN_FAILURE_RATE:
+            row.update(status='failed', message='密码错误')
+        elif action == 'update_profile':
+            row.update(resource_type='user', resource_id=user['id'], resource_name=user['username'])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch, download_counts
+            batch = []
+    if batch:
+        yield batch, download_counts
+
+
+def upload_logs(versions, user_ids):
+    """每个版本对应一条上传日志"""
+    return [{
+        'user_id': user_ids.get(v['uploaded_by']), 'username': v['uploaded_by'], 'action': 'upload',
+        'resource_type': 'version', 'resource_id': v['id'], 'resource_name': f"{v['software_name']} v{v['version']}",
+        'ip_address': '10.0.0.1', 'user_agent': USER_AGENTS[3], 'status': 'success', 'message': None,
+        'created_at': v['uploaded_at'],
+    } for v in versions]
+
+
+def bulk_insert(model, rows, batch_size, label):
+    """分批插入并逐批提交（版本同时写入目录变更）"""
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        db.session.execute(insert(model), batch)
+        if model is Version:
+            changefeed.record_inserted(db.session, [row['id'] for row in batch])
+        db.session.commit()
+        progress(label, min(i + batch_size, len(rows)), len(rows))
+
+
+def progress(label, done, total):
+    print(f'\r  {label}: {done}/{total}', end='\n' if done >= total else '', flush=True)
+
+
+def next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def reset_synthetic_data():
+    """删除之前生成的合成数据（按 syn_ 前缀识别）及其文件"""
+    synthetic_versions = select(Version.id).where(Version.software_name.like(f'{PREFIX}%'))
+    rows = db.session.execute(select(Version.id, Version.software_name, Version.version, Version.file_path)
+                              .where(Version.software_name.like(f'{PREFIX}%'))).all()
+    paths = [row.file_path for row in rows]
+    db.session.execute(delete(Log).where(Log.username.like(f'{PREFIX}%')))
+    db.session.execute(delete(Log).where(Log.resource_type == 'version', Log.resource_id.in_(synthetic_versions)))
+    db.session.execute(delete(Version).where(Version.software_name.like(f'{PREFIX}%')))
+    changefeed.record_deleted(db.session, rows)
+    db.session.execute(delete(User).where(User.username.like(f'{PREFIX}%')))
+    db.session.commit()
+
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    print(f'🗑️ 已删除 {len(paths)} 个合成版本及相关用户和日志')
+
+
+def sync_roles():
+    """按 rbac_spec.json 同步角色和权限，返回 角色名 -> ID"""
+    permissions, roles = sync_rbac.load_spec(sync_rbac.DEFAULT_SPEC)
+    diff = sync_rbac.compute_diff(permissions, roles)
+    sync_rbac.apply_diff(diff, permissions, roles)
+    db.session.commit()
+    return dict(db.session.execute(select(Role.name, Role.id)).all())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成大规模合成数据集（性能测试用）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（相同种子生成相同数据）')
+    parser.add_argument('--products', type=int, default=300, help='产品（软件）数量')
+    parser.add_argument('--versions', type=int, default=100000, help='版本总数')
+    parser.add_argument('--users', type=int, default=1000, help='用户数')
+    parser.add_argument('--logs', type=int, default=2000000, help='审计日志条数（不含每个版本的上传日志）')
+    parser.add_argument('--days', type=int, default=730, help='数据覆盖的天数')
+    parser.add_argument('--file-size-kb', type=int, default=32, help='测试文件大小中位数（KB）')
+    parser.add_argument('--no-files', action='store_true', help='只写数据库，不生成测试文件')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='生成文件的进程数')
+    parser.add_argument('--batch-size', type=int, default=10000, help='每批插入的行数')
+    parser.add_argument('--password', default='synthetic-password', help='所有合成用户的密码')
+    parser.add_argument('--reset', action='store_true', help='先删除之前生成的合成数据')
+    args = parser.parse_args(argv)
+
+    if args.versions < args.products:
+        parser.error('--versions 不能少于 --products')
+
+    init_db()
+    started = time.monotonic()
+    rng = random.Random(args.seed)
+    # 时间范围固定在种子决定的日期上，保证可重复
+    end = datetime(2026, 1, 1) + timedelta(days=args.seed % 365)
+    start = end - timedelta(days=args.days)
+
+    with app.app_context():
+        storage = {'current': app.config['UPLOAD_FOLDER_CURRENT'], 'history': app.config['UPLOAD_FOLDER_HISTORY']}
+        print(f"📦 数据库: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        print(f"📁 存储目录: {app.config['STORAGE_ROOT']}")
+
+        if args.reset:
+            reset_synthetic_data()
+        elif db.session.scalar(select(func.count()).where(Version.software_name.like(f'{PREFIX}%'))):
+            print('❌ 数据库中已有合成数据，使用 --reset 重新生成')
+            return 1
+
+        role_ids = sync_roles()
+
+        print(f'👤 生成 {args.users} 个用户')
+        password_hash = generate_password_hash(args.password, method='pbkdf2:sha256')
+        users = plan_users(rng, args.users, next_id(User), role_ids, password_hash, end)
+        bulk_insert(User, users, args.batch_size, '用户')
+
+        print(f'🧩 生成 {args.products} 个产品、{args.versions} 个版本')
+        products = plan_products(rng, args.products, args.versions)
+        uploaders = [u['username'] for u in rng.sample(users, max(1, len(users) // 10))]
+        versions = plan_versions(rng, products, next_id(Version), uploaders, storage, start, end, args.file_size_kb)
+        if not args.no_files:
+            generate_files(versions, args.seed, args.workers)
+        bulk_insert(Version, versions, args.batch_size, '版本')
+
+        print(f'📝 生成 {args.logs + len(versions)} 条审计日志')
+        user_ids = {u['username']: u['id'] for u in users}
+        bulk_insert(Log, upload_logs(versions, user_ids), args.batch_size, '上传日志')
+        download_counts = Counter()
+        inserted = 0
+        for batch, download_counts in generate_logs(rng, args.logs, users, versions, start, end, args.batch_size):
+            db.session.execute(insert(Log), batch)
+            db.session.commit()
+            inserted += len(batch)
+            progress('操作日志', inserted, args.logs)
+
+        # 下载次数与下载日志保持一致
+        if download_counts:
+            db.session.execute(
+                update(Version.__table__).where(Version.__table__.c.id == bindparam('v_id'))
+                .values(downloaded_count=bindparam('count')),
+                [{'v_id': version_id, 'count': count} for version_id, count in download_counts.items()])
+            db.session.commit()
+
+        notify_catalog_changed()
+
+    print(f'✅ 完成，用时 {time.monotonic() - started:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""核心端点压测：输出每个场景的 p50/p95/p99 延迟和吞吐量（JSON），结果可跨提交对比
+
+用法:
+    # 启动一个独立的本地实例（临时SQLite + 独立存储目录）并压测
+    python benchmarks/load_test.py --spawn --output results.json
+
+    # 压测已运行的实例（SQLite或本地MySQL均可），需要一个可登录的账号
+    python benchmarks/load_test.py --base-url http://127.0.0.1:5001 --username bench --password bench-password
+
+    # 与之前的结果对比
+    python benchmarks/load_test.py --spawn --compare results-old.json
+
+场景: login, index, api_versions, analytics, download_1mb, download_50mb, download_200mb, upload
+下载场景的测试文件通过断点续传接口上传一次，后续运行直接复用。
+上传会触发后台任务（差分补丁、预压缩），开始测量前通过 /metrics 等待后台队列清空，避免干扰结果。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MB = 1024 * 1024
+CHUNK_SIZE = 8 * MB
+
+# 场景: (请求数, 并发数)，--scale 按比例缩放请求数
+SCENARIOS = {
+    'login': (50, 5),
+    'index': (500, 10),
+    'api_versions': (200, 10),
+    'analytics': (100, 5),
+    'download_1mb': (50, 5),
+    'download_50mb': (10, 2),
+    'download_200mb': (3, 1),
+    'upload': (20, 5),
+}
+
+DOWNLOAD_FIXTURES = {
+    'download_1mb': 1 * MB,
+    'download_50mb': 50 * MB,
+    'download_200mb': 200 * MB,
+}
+
+UPLOAD_METADATA = {
+    'update_notes': 'load test',
+    'test_description': 'load test',
+    'test_result': '通过',
+    'test_completed_at': '2026-01-01T00:00:00',
+    'test_id': 'BENCH',
+    'developer_dri': 'bench',
+}
+
+
+def fixture_bytes(size, seed):
+    """确定性的测试文件内容：MZ文件头 + 伪随机数据"""
+    rng = random.Random(seed)
+    return b'MZ' + rng.randbytes(size - 2)
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Client:
+    """线程内复用连接的HTTP客户端"""
+
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            session = requests.Session()
+            if self.token:
+                session.cookies.set('token', self.token)
+            self._local.session = session
+        return self._local.session
+
+    def url(self, path):
+        return self.base_url + path
+
+
+def login(client, username, password):
+    """登录并返回token"""
+    response = requests.post(client.url('/login'), data={'username': username, 'password': password},
+                             allow_redirects=False, timeout=30)
+    token = response.cookies.get('token')
+    if not token:
+        raise RuntimeError(f'登录失败（HTTP {response.status_code}），请检查账号密码')
+    return token
+
+
+def ensure_download_fixture(client, name, size):
+    """上传（或复用）下载场景的测试文件，返回版本ID"""
+    software_name = f'bench_{name}'
+    response = client.session.get(client.url(f'/api/software/{software_name}/latest'), timeout=30)
+    if response.status_code == 200 and response.json().get('file_size') == size:
+        return response.json()['id']
+
+    data = fixture_bytes(size, seed=size)
+    metadata = dict(UPLOAD_METADATA, software_name=software_name, version='1.0')
+    response = client.session.post(client.url('/api/uploads'), timeout=30,
+                                   json={'filename': f'{software_name}.dll', 'total_size': size, 'metadata': metadata})
+    response.raise_for_status()
+    upload_id = response.json()['upload_id']
+    for offset in range(0, size, CHUNK_SIZE):
+        response = client.session.put(client.url(f'/api/uploads/{upload_id}'), data=data[offset:offset + CHUNK_SIZE],
+                                      headers={'Upload-Offset': str(offset)}, timeout=300)
+        response.raise_for_status()
+    response = client.session.post(client.url(f'/api/uploads/{upload_id}/complete'), timeout=300)
+    response.raise_for_status()
+    return response.json()['id']
+
+
+def wait_for_background_tasks(client, timeout=1800):
+    """等待上传触发的后台任务（差分补丁、预压缩）完成，避免干扰测量；/metrics不可用时跳过"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = client.session.get(client.url('/metrics'), timeout=10)
+        except requests.RequestException:
+            return
+        if response.status_code != 200:
+            return
+        depth = [float(line.split()[-1]) for line in response.text.splitlines()
+                 if line.startswith('dll_background_queue_depth')]
+        if not depth or sum(depth) <= 0:
+            return
+        time.sleep(1)
+    print('⚠️ 等待后台任务超时，结果可能受影响', file=sys.stderr)
+
+
+def make_request_fn(name, client, args, context):
+    """返回执行一次场景请求的函数，函数返回(是否成功, 传输字节数)"""
+    if name == 'login':
+        def fn(i):
+            response = requests.post(client.url('/login'), allow_redirects=False, timeout=60,
+                                     data={'username': args.username, 'password': args.password})
+            return response.status_code == 302 and 'token' in response.cookies, len(response.content)
+    elif name in ('index', 'api_versions', 'analytics'):
+        path = {'index': '/', 'api_versions': '/api/versions', 'analytics': '/analytics'}[name]
+
+        def fn(i):
+            response = client.session.get(client.url(path), timeout=60)
+            return response.status_code == 200, len(response.content)
+    elif name in DOWNLOAD_FIXTURES:
+        version_id = context[name]
+
+        def fn(i):
+            received = 0
+            # 不声明Accept-Encoding，测量原始文件传输
+            with client.session.get(client.url(f'/download/{version_id}'), stream=True, timeout=600,
+                                    headers={'Accept-Encoding': 'identity'}) as response:
+                for chunk in response.iter_content(MB):
+                    received += len(chunk)
+                return response.status_code == 200 and received == DOWNLOAD_FIXTURES[name], received
+    elif name == 'upload':
+        data = fixture_bytes(args.upload_size * MB, seed=args.seed)
+        run_id = context['run_id']
+
+        def fn(i):
+            form = dict(UPLOAD_METADATA, software_name='bench_upload', version=f'{run_id}.{i}')
+            response = client.session.post(client.url('/upload'), data=form, allow_redirects=False, timeout=600,
+                                           files={'file': ('bench_upload.dll', data)})
+            # 成功时重定向到首页，失败时重定向回上传页
+            return response.status_code == 302 and not response.headers.get('Location', '').endswith('/upload'), len(data)
+    else:
+        raise ValueError(f'未知场景: {name}')
+    return fn
+
+
+def run_scenario(name, fn, total, concurrency, warmup):
+    """执行场景并统计延迟分布和吞吐量"""
+    for i in range(min(warmup, total)):
+        fn(-1 - i)
+
+    latencies = []
+    errors = 0
+    transferred = 0
+    lock = threading.Lock()
+
+    def timed(i):
+        nonlocal errors, transferred
+        start = time.perf_counter()
+        try:
+            ok, size = fn(i)
+        except requests.RequestException:
+            ok, size = False, 0
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            transferred += size
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(total)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors,
+        'duration_s': round(duration, 3),
+        'rps': round(total / duration, 2) if duration else None,
+        'throughput_mb_s': round(transferred / MB / duration, 2) if duration else None,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def git_commit():
+    """当前提交，用于对比不同提交的结果"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_instance(args):
+    """启动独立的本地实例：临时SQLite数据库 + 独立存储目录 + 压测账号"""
+    workdir = tempfile.mkdtemp(prefix='dll_bench_')
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+               STORAGE_ROOT=os.path.join(workdir, 'storage'),
+               PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_WORKER_CLASS=args.worker_class)
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+    setup = (
+        "from app import app, db, init_db\n"
+        "from models import User, Role\n"
+        "init_db()\n"
+        "with app.app_context():\n"
+        f"    user = User.query.filter_by(username={args.username!r}).first()\n"
+        "    if not user:\n"
+        f"        user = User(username={args.username!r}, email='bench@example.com', full_name='bench')\n"
+        "        user.role = Role.query.filter_by(name='admin').first()\n"
+        "        db.session.add(user)\n"
+        f"    user.set_password({args.password!r})\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, '-c', setup], cwd=REPO_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                               cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            if requests.get(base_url + '/health', timeout=1).status_code < 500:
+                break
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    else:
+        process.terminate()
+        raise RuntimeError('本地实例启动失败')
+    return process, workdir, base_url
+
+
+def compare(current, previous):
+    """打印与上一次结果的延迟/吞吐量变化"""
+    print(f"\n对比 {previous['meta'].get('commit')} -> {current['meta'].get('commit')}", file=sys.stderr)
+    for name, result in current['scenarios'].items():
+        old = previous['scenarios'].get(name)
+        if not old:
+            continue
+        changes = []
+        for key in ('p50', 'p95', 'p99'):
+            before, after = old['latency_ms'][key], result['latency_ms'][key]
+            if before and after:
+                changes.append(f'{key} {before:.1f}->{after:.1f}ms ({(after - before) / before * 100:+.1f}%)')
+        if old.get('rps') and result.get('rps'):
+            changes.append(f"rps {old['rps']}->{result['rps']} ({(result['rps'] - old['rps']) / old['rps'] * 100:+.1f}%)")
+        print(f'  {name}: ' + ', '.join(changes), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='DLL版本管理系统核心端点压测')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5001', help='被测实例地址')
+    parser.add_argument('--spawn', action='store_true', help='启动独立的本地实例（gunicorn + 临时SQLite）')
+    parser.add_argument('--database-url', help='--spawn 时使用的数据库（默认临时SQLite，可指定本地MySQL）')
+    parser.add_argument('--workers', type=int, default=4, help='--spawn 时的gunicorn worker数')
+    parser.add_argument('--worker-class', default='sync', choices=['sync', 'gevent'], help='--spawn 时的gunicorn worker类型')
+    parser.add_argument('--username', default='bench')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔的场景列表')
+    parser.add_argument('--scale', type=float, default=1.0, help='请求数缩放比例')
+    parser.add_argument('--warmup', type=int, default=3, help='每个场景的预热请求数（不计入统计）')
+    parser.add_argument('--upload-size', type=int, default=1, help='上传场景的文件大小（MB）')
+    parser.add_argument('--seed', type=int, default=42, help='测试数据随机种子')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到stdout）')
+    parser.add_argument('--compare', help='与之前的结果JSON对比')
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'未知场景: {", ".join(sorted(unknown))}')
+
+    process = workdir = None
+    if args.spawn:
+        process, workdir, args.base_url = spawn_instance(args)
+
+    try:
+        client = Client(args.base_url)
+        client = Client(args.base_url, token=login(client, args.username, args.password))
+        context = {'run_id': datetime.now().strftime('%Y%m%d%H%M%S')}
+        for name in names:
+            if name in DOWNLOAD_FIXTURES:
+                context[name] = ensure_download_fixture(client, name, DOWNLOAD_FIXTURES[name])
+        wait_for_background_tasks(client)
+
+        results = {}
+        for name in names:
+            total, concurrency = SCENARIOS[name]
+            total = max(1, int(total * args.scale))
+            print(f'▶ {name}: {total} 请求, 并发 {concurrency}', file=sys.stderr)
+            results[name] = run_scenario(name, make_request_fn(name, client, args, context),
+                                         total, concurrency, args.warmup)
+            # 上传场景会触发后台任务，等其完成再进入下一个场景
+            wait_for_background_tasks(client)
+    finally:
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'base_url': args.base_url,
+            'spawned': args.spawn,
+            'workers': args.workers if args.spawn else None,
+            'worker_class': args.worker_class if args.spawn else None,
+            'scale': args.scale,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'scenarios': results,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""流式ZIP打包：边读文件边输出ZIP数据，不落临时文件、不在内存中缓冲整个压缩包"""
+import time
+import zipfile
+
+# 每次从源文件读取的字节数
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class _StreamSink:
+    """只写不可seek的输出对象，zipfile检测到不可seek时会使用数据描述符逐项写出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries, opener=None):
+    """生成ZIP数据块
+
+    entries: [(压缩包内文件名, 源文件路径, 文件大小, 修改时间datetime或None)]
+    opener: 按路径打开源文件的函数（默认以二进制方式open），需返回可读的文件对象
+    文件已是二进制发布物，使用STORED模式避免逐请求压缩的CPU开销；
+    预先告知文件大小，超过4GB的条目和超过65535个条目时自动使用ZIP64。
+    """
+    opener = opener or (lambda path: open(path, 'rb'))
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for arcname, path, file_size, modified_at in entries:
+            date_time = (modified_at.timetuple() if modified_at else time.localtime())[:6]
+            zinfo = zipfile.ZipInfo(arcname, date_time=date_time)
+            zinfo.compress_type = zipfile.ZIP_STORED
+            zinfo.file_size = file_size
+            with opener(path) as src, zf.open(zinfo, 'w') as dst:
+                while True:
+                    chunk = src.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            # 数据描述符在条目关闭时写出
+            data = sink.drain()
+            if data:
+                yield data
+    # 中央目录在close时写出
+    yield sink.drain()
@@ -0,0 +1,148 @@
+"""版本目录变更流：版本的新增、归档、元数据修改和删除按顺序记录在 version_changes 表，供下游镜像增量同步
+
+GET /api/changes?since=<游标> 返回游标之后的变更（游标即变更ID，单调递增），镜像保存 next_cursor 用于下次请求，
+同步耗时只与变更数有关，与目录大小无关。从 since=0 开始可以得到完整目录（迁移时为已有版本补写了新增记录）。
+
+变更与版本数据在同一事务中写入:
+    - ORM修改（上传、归档到history、计算SHA-256等）由 Version 的映射事件自动记录
+    - 绕过ORM事件的批量写入（insert(Version)/delete(Version) 等语句）不触发映射事件，必须在同一事务中显式调用
+      record_inserted()（批量插入，如合成数据集生成）或 record_deleted()（批量删除，如保留策略），否则镜像会漏掉这些版本
+下载计数、存储层、实际占用空间不属于目录数据，不产生变更；存储重新分桶只移动文件，也不产生变更。
+
+变更ID不用数据库自增ID（并发事务的自增ID可能乱序提交，ID 11 先于 ID 10 可见，镜像会跳过 ID 10），
+而是在事务中从单行表 version_change_head 分配：分配时更新该行，行锁持有到事务提交，
+后一个事务要等前一个提交或回滚后才能分配，因此可见的变更ID总是从1开始连续的，读取时不需要等待空缺。
+代价是写入变更的事务从第一条变更到提交之间互相串行，耗时的操作（文件发布到对象存储等）应在 flush 之前完成。
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select
+
+from models import Version, VersionChange, VersionChangeHead
+
+CREATE = 'create'
+UPDATE = 'update'
+ARCHIVE = 'archive'
+DELETE = 'delete'
+
+# 变更数据包含的版本字段
+SNAPSHOT_FIELDS = ('software_name', 'version', 'file_type', 'file_size', 'sha256', 'update_notes', 'test_description',
+                   'test_result', 'test_duration', 'test_completed_at', 'test_id', 'developer_dri', 'uploaded_by',
+                   'uploaded_at')
+
+
+def snapshot(version):
+    """版本数据（JSON字符串）"""
+    data = {'id': version.id}
+    for field in SNAPSHOT_FIELDS:
+        value = getattr(version, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _allocate_ids(connection, count):
+    """在当前事务中分配 count 个连续的变更ID（锁定序列行直到事务结束）"""
+    head = VersionChangeHead.__table__
+    result = connection.execute(head.update().where(head.c.id == 1).values(seq=head.c.seq + count))
+    if result.rowcount == 0:
+        # 序列行不存在（迁移0009之前由 create_all 建的空表）：从已有的最大变更ID开始
+        last = connection.execute(select(func.coalesce(func.max(VersionChange.id), 0))).scalar()
+        connection.execute(head.insert().values(id=1, seq=last + count))
+    last = connection.execute(select(head.c.seq).where(head.c.id == 1)).scalar()
+    return range(last - count + 1, last + 1)
+
+
+def _insert(connection, action, version, payload):
+    connection.execute(VersionChange.__table__.insert().values(
+        id=_allocate_ids(connection, 1)[0], version_id=version.id, action=action, software_name=version.software_name, version=version.version,
+        payload=payload))
+
+
+@event.listens_for(Version, 'after_insert')
+def _version_inserted(mapper, connection, target):
+    _insert(connection, CREATE, target, snapshot(target))
+
+
+@event.listens_for(Version, 'after_update')
+def _version_updated(mapper, connection, target):
+    state = inspect(target)
+    changed = [field for field in SNAPSHOT_FIELDS if state.attrs[field].history.has_changes()]
+    if state.attrs.file_path.history.has_changes():
+        # 文件路径只在归档到history时改变
+        _insert(connection, ARCHIVE, target, snapshot(target))
+    if changed:
+        _insert(connection, UPDATE, target, snapshot(target))
+
+
+@event.listens_for(Version, 'after_delete')
+def _version_deleted(mapper, connection, target):
+    _insert(connection, DELETE, target, None)
+
+
+def record_inserted(session, version_ids):
+    """记录批量插入的版本（按版本ID顺序），在插入之后调用，随当前事务提交"""
+    if version_ids:
+        versions = session.scalars(select(Version).where(Version.id.in_(version_ids)).order_by(Version.id)).all()
+        ids = _allocate_ids(session.connection(), len(versions))
+        session.execute(VersionChange.__table__.insert(), [
+            {'id': change_id, 'version_id': v.id, 'action': CREATE, 'software_name': v.software_name,
+             'version': v.version, 'payload': snapshot(v)}
+            for change_id, v in zip(ids, versions)
+        ])
+
+
+def record_deleted(session, rows):
+    """记录批量删除的版本（rows 需包含 id、software_name、version），随当前事务提交"""
+    if rows:
+        ids = _allocate_ids(session.connection(), len(rows))
+        session.execute(VersionChange.__table__.insert(), [
+            {'id': change_id, 'version_id': row.id, 'action': DELETE, 'software_name': row.software_name, 'version': row.version}
+            for change_id, row in zip(ids, rows)
+        ])
+
+
+def backfill(session, batch_size=1000):
+    """为没有变更记录的已有版本补写新增记录（按版本ID顺序），返回补写数
+
+    只在迁移中使用（此时没有并发写入，version_change_head 可能还不存在），变更ID直接接在已有最大ID之后。
+    """
+    recorded = select(VersionChange.version_id)
+    total = 0
+    last_id = 0
+    last_change_id = session.scalar(select(func.coalesce(func.max(VersionChange.id), 0)))
+    while True:
+        versions = session.scalars(select(Version).where(Version.id > last_id, Version.id.not_in(recorded))
+                                   .order_by(Version.id).limit(batch_size)).all()
+        if not versions:
+            return total
+        session.execute(VersionChange.__table__.insert(), [
+            {'id': last_change_id + offset, 'version_id': v.id, 'action': CREATE, 'software_name': v.software_name,
+             'version': v.version, 'payload': snapshot(v)}
+            for offset, v in enumerate(versions, 1)
+        ])
+        last_change_id += len(versions)
+        total += len(versions)
+        last_id = versions[-1].id
+
+
+def read_changes(session, since, limit):
+    """读取游标之后的变更，返回 (变更列表, 下一个游标, 是否还有更多)"""
+    rows = session.scalars(select(VersionChange).where(VersionChange.id > since)
+                           .order_by(VersionChange.id).limit(limit + 1)).all()
+    changes = rows[:limit]
+    next_cursor = changes[-1].id if changes else since
+    return changes, next_cursor, len(rows) > limit
+
+
+def serialize(change):
+    """变更的API表示"""
+    return {
+        'cursor': change.id,
+        'action': change.action,
+        'version_id': change.version_id,
+        'software': change.software_name,
+        'version': change.version,
+        'data': json.loads(change.payload) if change.payload else None,
+        'changed_at': change.created_at.isoformat(),
+    }
@@ -6,16 +6,99 @@ load_dotenv()
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 数据库连接池：gevent worker下同一进程的大量并发请求共享连接池，取不到连接时最多等待 pool_timeout 秒
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+    if SQLALCHEMY_DATABASE_URI and not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.getenv('DB_POOL_SIZE', 10)),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 20)),
+            pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 30)),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 3600))
+        )
+    # 只读副本（可选，逗号分隔）：注册为 replica_<序号> 绑定，由 db_routing 为只读路由选择
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f'replica_{index}': url for index, url in enumerate(DATABASE_REPLICA_URLS)}
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))  # 副本延迟超过此值时回退主库
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))  # 写请求后该客户端读主库的时间
     SECRET_KEY = os.getenv('SECRET_KEY', 'fallback-secret-key')
     
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    UPLOAD_FOLDER_TESTING = os.path.join(BASE_DIR, 'storage', 'testing')
-    UPLOAD_FOLDER_CURRENT = os.path.join(BASE_DIR, 'storage', 'current')
-    UPLOAD_FOLDER_HISTORY = os.path.join(BASE_DIR, 'storage', 'history')
-    
-    # 确保所有目录存在
-    for folder in [UPLOAD_FOLDER_TESTING, UPLOAD_FOLDER_CURRENT, UPLOAD_FOLDER_HISTORY]:
-        os.makedirs(folder, exist_ok=True)
+    STORAGE_ROOT = os.getenv('STORAGE_ROOT', os.path.join(BASE_DIR, 'storage'))  # 可指向独立目录（如压测实例）
+    UPLOAD_FOLDER_TESTING = os.path.join(STORAGE_ROOT, 'testing')
+    UPLOAD_FOLDER_CURRENT = os.path.join(STORAGE_ROOT, 'current')
+    UPLOAD_FOLDER_HISTORY = os.path.join(STORAGE_ROOT, 'history')
+    PATCH_FOLDER = os.path.join(STORAGE_ROOT, 'patches')  # 差分补丁缓存
+    # 目录由 create_app() 创建，导入配置没有副作用
     
     # 最大文件大小 (200MB)
     MAX_CONTENT_LENGTH = 200 * 1024 * 1024
+    
+    # 批量上传并行校验/写入的线程数
+    BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', 4))
+    
+    # 断点续传：单个文件大小上限 (2GB)，会话闲置过期时间（小时）
+    RESUMABLE_UPLOAD_MAX_SIZE = int(os.getenv('RESUMABLE_UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+    UPLOAD_SESSION_TTL_HOURS = int(os.getenv('UPLOAD_SESSION_TTL_HOURS', 24))
+    
+    # 差分下载：超过此大小的文件不生成bsdiff补丁（bsdiff内存占用约为文件大小的十几倍）
+    DELTA_MAX_FILE_SIZE = int(os.getenv('DELTA_MAX_FILE_SIZE', 64 * 1024 * 1024))
+    # 每个进程最多同时排队生成的补丁数（请求的补丁尚未生成时只排队，不在请求中生成）
+    DELTA_MAX_PENDING = int(os.getenv('DELTA_MAX_PENDING', 8))
+    
+    # 预压缩变体的压缩级别（后台一次性生成，可以用高压缩级别）
+    PRECOMPRESS_GZIP_LEVEL = int(os.getenv('PRECOMPRESS_GZIP_LEVEL', 9))
+    PRECOMPRESS_ZSTD_LEVEL = int(os.getenv('PRECOMPRESS_ZSTD_LEVEL', 19))
+    
+    # 冷存储：上传超过此天数的历史版本只保留zstd压缩副本（flask --app app archive-history）
+    COLD_TIER_MIN_AGE_DAYS = int(os.getenv('COLD_TIER_MIN_AGE_DAYS', 7))
+    COLD_TIER_ZSTD_LEVEL = int(os.getenv('COLD_TIER_ZSTD_LEVEL', 19))
+    
+    # 保留策略（flask --app app gc）：策略文件、每批删除的版本数、无主文件的最短存在时间（小时）
+    RETENTION_POLICY_FILE = os.getenv('RETENTION_POLICY_FILE', os.path.join(BASE_DIR, 'retention_policy.json'))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 500))
+    RETENTION_ORPHAN_GRACE_HOURS = int(os.getenv('RETENTION_ORPHAN_GRACE_HOURS', 24))
+    
+    # 存储后端：local（默认，文件保存在 STORAGE_ROOT）或 s3（S3兼容对象存储，见 storage.py）
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET')
+    S3_PREFIX = os.getenv('S3_PREFIX', '')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # MinIO等兼容服务的地址，AWS留空
+    S3_REGION = os.getenv('S3_REGION')
+    S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY')
+    # 超过阈值的文件分片上传/下载，分片并行传输的线程数
+    S3_MULTIPART_THRESHOLD_MB = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', 8))
+    S3_MULTIPART_CHUNK_MB = int(os.getenv('S3_MULTIPART_CHUNK_MB', 16))
+    S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', 8))
+    S3_PRESIGNED_URL_EXPIRES = int(os.getenv('S3_PRESIGNED_URL_EXPIRES', 300))  # 预签名下载URL有效期（秒）
+    
+    # 下载配额（见 quota.py）：策略文件、多worker共享的限流状态、下载租约有效期、限速时单次最长等待（秒）
+    QUOTA_POLICY_FILE = os.getenv('QUOTA_POLICY_FILE', os.path.join(BASE_DIR, 'quota_policy.json'))
+    QUOTA_STATE_FILE = os.getenv('QUOTA_STATE_FILE', os.path.join(STORAGE_ROOT, '.download_quota.db'))
+    QUOTA_LEASE_SECONDS = int(os.getenv('QUOTA_LEASE_SECONDS', 60))
+    QUOTA_MAX_WAIT_SECONDS = int(os.getenv('QUOTA_MAX_WAIT_SECONDS', 30))
+    
+    # 就绪检查（见 health.py）：后台探测间隔（秒）、磁盘剩余空间下限、连接池占用上限
+    HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 5))
+    HEALTH_MIN_FREE_DISK_MB = int(os.getenv('HEALTH_MIN_FREE_DISK_MB', 1024))
+    HEALTH_MAX_POOL_SATURATION = float(os.getenv('HEALTH_MAX_POOL_SATURATION', 0.9))
+    
+    # 目录变更流（/api/changes）：每页最多变更数
+    CHANGEFEED_PAGE_SIZE = int(os.getenv('CHANGEFEED_PAGE_SIZE', 1000))
+    
+    # 打包下载单次最多文件数
+    BUNDLE_MAX_FILES = int(os.getenv('BUNDLE_MAX_FILES', 500))
+    
+    # 版本目录变更计数在进程内的缓存时间（秒）：其它节点的上传最多延迟这么久使本进程的最新版本缓存失效
+    CATALOG_STAMP_TTL = float(os.getenv('CATALOG_STAMP_TTL', 1))
+    
+    # 新版本推送（SSE）：检查间隔、心跳间隔、单个连接最长持续时间（秒）
+    SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', 1))
+    SSE_KEEPALIVE = int(os.getenv('SSE_KEEPALIVE', 15))
+    SSE_MAX_DURATION = int(os.getenv('SSE_MAX_DURATION', 300))
+    
+    # 按请求的SQL分析（仅开发/排查时开启，响应中会包含SQL语句和参数）
+    SQL_PROFILING = os.getenv('SQL_PROFILING', '').lower() in ('1', 'true', 'yes')
+    SQL_SLOW_QUERY_MS = int(os.getenv('SQL_SLOW_QUERY_MS', 100))
+    SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', 5))
@@ -0,0 +1,161 @@
+"""读写分离：只读路由的查询发往只读副本，写入和写后读始终使用主库
+
+配置（见 config.py）:
+    DATABASE_REPLICA_URLS   逗号分隔的副本地址，未配置时所有查询使用主库
+    REPLICA_MAX_LAG_SECONDS 副本延迟超过此值时回退主库
+    REPLICA_STICKY_SECONDS  客户端发起写请求后，在此时间内的请求都使用主库（读到自己的写入）
+
+路由规则（RoutingSession.get_bind）:
+    - 只有 @read_replica 标记的视图中的 SELECT 才会发往副本（包括 text() 原生SQL，如全文检索）；
+      CLI、后台任务和其它视图都使用主库
+    - 同一请求中已经写入（flush、执行 UPDATE/DELETE 或原生写语句）之后，后续查询使用主库
+    - 客户端带有未过期的粘滞 cookie（写请求后下发）时使用主库
+副本延迟用复制心跳估算（不依赖具体数据库的复制状态接口）：每个进程每 REPLICA_LAG_CHECK_INTERVAL 秒
+先读副本上的心跳、再读主库上的心跳，然后向主库写入新的心跳。副本已复制到主库的最新心跳时视为没有延迟，
+否则延迟按副本心跳至今的时间计。检查失败（包括心跳表不存在）的副本暂停使用到下次检查。
+"""
+import itertools
+import re
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import DateTime, Integer, TextClause, column, select, table
+
+import metrics
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_COOKIE = 'db_primary_until'
+
+_replica_state = {}  # 绑定名 -> (检查时间, 是否可用)
+_state_lock = threading.Lock()
+_round_robin = itertools.count()
+
+
+def read_replica(view):
+    """标记只读视图：其中的查询可以发往副本"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# 原生SQL按首个关键字区分读写
+_TEXT_READ = re.compile(r'\s*SELECT\b', re.IGNORECASE)
+_TEXT_WRITE = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|ALTER|DROP)\b', re.IGNORECASE)
+
+# 复制心跳表（models.ReplicationHeartbeat；models 导入本模块，这里用轻量表定义，带类型使SQLite也返回datetime）
+_HEARTBEAT = table('replication_heartbeat', column('id', Integer), column('beat_at', DateTime))
+_READ_HEARTBEAT = select(_HEARTBEAT.c.beat_at).where(_HEARTBEAT.c.id == 1)
+
+
+def _beat(conn):
+    """向主库写入心跳"""
+    now = datetime.utcnow()
+    if not conn.execute(_HEARTBEAT.update().where(_HEARTBEAT.c.id == 1).values(beat_at=now)).rowcount:
+        conn.execute(_HEARTBEAT.insert().values(id=1, beat_at=now))
+    return now
+
+
+def _replica_lag(db, engine):
+    """估算副本延迟（秒）：副本没有复制到主库的最新心跳时，按副本心跳至今的时间计"""
+    with engine.connect() as conn:
+        replica_beat = conn.execute(_READ_HEARTBEAT).scalar()
+    with db.engines[None].begin() as conn:
+        primary_beat = conn.execute(_READ_HEARTBEAT).scalar()
+        now = _beat(conn)
+    if replica_beat is None:
+        return float('inf')
+    if primary_beat is None or replica_beat >= primary_beat:
+        return 0
+    return (now - replica_beat).total_seconds()
+
+
+def _replica_available(db, bind_key):
+    """副本是否可用（延迟在阈值内），结果按检查间隔缓存"""
+    config = current_app.config
+    now = time.monotonic()
+    checked_at, available = _replica_state.get(bind_key, (None, False))
+    if checked_at is not None and now - checked_at < config['REPLICA_LAG_CHECK_INTERVAL']:
+        return available
+    with _state_lock:
+        checked_at, available = _replica_state.get(bind_key, (None, False))
+        if checked_at is not None and now - checked_at < config['REPLICA_LAG_CHECK_INTERVAL']:
+            return available
+        try:
+            available = _replica_lag(db, db.engines[bind_key]) <= config['REPLICA_MAX_LAG_SECONDS']
+        except Exception as e:
+            current_app.logger.warning(f"Replica check error ({bind_key}): {str(e)}")
+            available = False
+        _replica_state[bind_key] = (now, available)
+    return available
+
+
+def choose_replica(db):
+    """轮询选择一个可用副本，没有可用副本时返回None"""
+    keys = [key for key in db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+    if not keys:
+        return None
+    start = next(_round_robin)
+    for offset in range(len(keys)):
+        key = keys[(start + offset) % len(keys)]
+        if _replica_available(db, key):
+            return db.engines[key]
+    return None
+
+
+def _is_read(clause):
+    if isinstance(clause, TextClause):
+        return bool(_TEXT_READ.match(clause.text))
+    return getattr(clause, 'is_select', False)
+
+
+def _is_write(clause):
+    if isinstance(clause, TextClause):
+        return bool(_TEXT_WRITE.match(clause.text))
+    return getattr(clause, 'is_dml', False)
+
+
+def _wants_replica():
+    """当前请求是否允许读副本"""
+    if not has_request_context() or not g.get('db_read_replica'):
+        return False
+    return request.cookies.get(STICKY_COOKIE, 0, type=float) < time.time()
+
+
+class RoutingSession(Session):
+    """按请求上下文在主库和只读副本之间选择连接"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('wrote'):
+            if self._flushing or _is_write(clause):
+                # 本次会话已写入，之后的查询读主库
+                self.info['wrote'] = True
+            elif _is_read(clause) and _wants_replica():
+                engine = choose_replica(self._db)
+                metrics.DB_ROUTED_QUERIES.labels(target='replica' if engine else 'primary').inc()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _after_request(response):
+    """写请求成功后下发粘滞cookie，之后一段时间内该客户端读主库"""
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        seconds = current_app.config['REPLICA_STICKY_SECONDS']
+        response.set_cookie(STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True,
+                            samesite='Lax')
+    return response
+
+
+def init_app(app):
+    """配置了副本时注册粘滞cookie钩子"""
+    app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5)
+    app.config.setdefault('REPLICA_LAG_CHECK_INTERVAL', 5)
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+    if any(key.startswith(REPLICA_BIND_PREFIX) for key in app.config.get('SQLALCHEMY_BINDS') or {}):
+        app.after_request(_after_request)
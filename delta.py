@@ -0,0 +1,36 @@
+"""二进制差分补丁：同一软件相邻版本之间的bsdiff补丁生成与缓存"""
+import os
+import threading
+
+try:
+    import bsdiff4
+except ImportError:  # 可选依赖，未安装时下载接口回退为完整文件
+    bsdiff4 = None
+
+DELTA_ALGORITHM = 'bsdiff4'
+
+
+def is_available():
+    """是否可以生成差分补丁"""
+    return bsdiff4 is not None
+
+
+def get_patch_path(patch_folder, software_name, from_id, to_id):
+    """返回补丁缓存路径：<PATCH_FOLDER>/<软件名>/<旧版本ID>_to_<新版本ID>.bsdiff"""
+    return os.path.join(patch_folder, software_name, f'{from_id}_to_{to_id}.bsdiff')
+
+
+def generate_patch(old_path, new_path, patch_path):
+    """生成补丁并缓存到磁盘，已存在时直接返回（先写临时文件再原子替换，多进程安全）"""
+    if os.path.exists(patch_path):
+        return patch_path
+
+    os.makedirs(os.path.dirname(patch_path), exist_ok=True)
+    tmp_path = f'{patch_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        bsdiff4.file_diff(old_path, new_path, tmp_path)
+        os.replace(tmp_path, patch_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return patch_path
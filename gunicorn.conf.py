@@ -0,0 +1,45 @@
+"""gunicorn配置（gunicorn -c gunicorn.conf.py，入口为 app:create_app()）
+
+部署前先执行一次 flask --app app migrate，worker启动时不访问数据库。
+
+多worker时Prometheus指标写入 PROMETHEUS_MULTIPROC_DIR，由 /metrics 汇总。
+
+高并发模式（大量慢速上传/下载、SSE订阅）:
+    GUNICORN_WORKER_CLASS=gevent gunicorn -c gunicorn.conf.py
+gevent worker中每个连接是一个协程，单个worker可同时处理 GUNICORN_WORKER_CONNECTIONS 个连接；
+上传在接收文件前归还数据库连接，差分/压缩/哈希放到原生线程池执行，不阻塞事件循环。
+数据库需使用纯Python驱动（mysql+pymysql），C扩展驱动（mysqlclient）的查询会阻塞整个worker；
+并发请求共享连接池（DB_POOL_SIZE + DB_MAX_OVERFLOW）。
+"""
+import os
+import shutil
+
+wsgi_app = 'app:create_app()'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+# sync（默认）或 gevent
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# sync worker在处理请求期间无法上报心跳，超时需覆盖慢客户端的大文件传输；gevent worker的心跳不受请求影响
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300 if worker_class == 'sync' else 30))
+
+# 必须在worker导入app（及prometheus_client）之前设置
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/dll_manager_metrics')
+
+
+def on_starting(server):
+    """启动时清空上次运行遗留的指标文件"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """worker退出时清理其实时Gauge数据"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,134 @@
+"""健康检查：/livez 只确认进程能处理请求；/readyz 返回后台探测线程缓存的检查结果
+
+负载均衡器高频探测时请求本身不访问数据库和磁盘。每个worker进程在首次请求就绪检查时启动探测线程，
+每 HEALTH_PROBE_INTERVAL 秒检查一次:
+    - 数据库: SELECT 1 及其耗时
+    - 连接池: 已借出连接数 / (pool_size + max_overflow)，超过 HEALTH_MAX_POOL_SATURATION 视为未就绪
+    - 存储: 上传目录可写，STORAGE_ROOT 所在磁盘剩余空间不低于 HEALTH_MIN_FREE_DISK_MB
+    - 后台任务: 队列中未完成的任务数（差分补丁、预压缩），只报告不影响就绪状态
+结果超过3个探测周期未更新（探测线程卡住）时视为未就绪。
+"""
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+# SQLAlchemy QueuePool 的默认 max_overflow
+DEFAULT_MAX_OVERFLOW = 10
+
+
+def _timed(fn):
+    """执行检查，返回 (结果, 耗时毫秒)"""
+    start = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+class ReadinessProber:
+    """后台定期执行就绪检查，请求只读取最近一次的结果"""
+
+    def __init__(self, app, db, queue_depth):
+        self.app = app
+        self.db = db
+        self.queue_depth = queue_depth
+        self.report = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动探测线程（每个进程一个；fork后的子进程重新启动）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.report = self.check()
+            threading.Thread(target=self._run, name='readiness-prober', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config['HEALTH_PROBE_INTERVAL'])
+            try:
+                self.report = self.check()
+            except Exception as e:
+                self.app.logger.error(f"Readiness probe error: {str(e)}")
+
+    def current(self):
+        """最近一次的检查结果（过期时标记为未就绪）"""
+        self.start()
+        report = dict(self.report)
+        age = time.time() - report['checked_at']
+        report['age_seconds'] = round(age, 1)
+        if age > 3 * self.app.config['HEALTH_PROBE_INTERVAL']:
+            report['ready'] = False
+            report['error'] = '探测结果已过期'
+        return report
+
+    def check(self):
+        """执行一次全部检查"""
+        with self.app.app_context():
+            checks = {
+                'database': self._check_database(),
+                'db_pool': self._check_pool(),
+                'storage': self._check_storage(),
+                'background_queue': {'status': 'ok', 'depth': self.queue_depth()},
+            }
+        return {
+            'ready': all(check['status'] == 'ok' for check in checks.values()),
+            'checked_at': time.time(),
+            'checks': checks,
+        }
+
+    def _check_database(self):
+        def ping():
+            with self.db.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        try:
+            _, latency = _timed(ping)
+            return {'status': 'ok', 'latency_ms': latency}
+        except Exception as e:
+            return {'status': f'error: {str(e)}'}
+
+    def _check_pool(self):
+        pool = self.db.engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return {'status': 'ok'}
+        options = self.app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        capacity = pool.size() + options.get('max_overflow', DEFAULT_MAX_OVERFLOW)
+        checked_out = pool.checkedout()
+        saturation = round(checked_out / capacity, 3) if capacity > 0 else 0
+        status = 'ok' if saturation <= self.app.config['HEALTH_MAX_POOL_SATURATION'] else 'error: 连接池接近耗尽'
+        return {'status': status, 'checked_out': checked_out, 'capacity': capacity, 'saturation': saturation}
+
+    def _check_storage(self):
+        config = self.app.config
+        folders = [config['UPLOAD_FOLDER_TESTING'], config['UPLOAD_FOLDER_CURRENT'], config['UPLOAD_FOLDER_HISTORY']]
+        try:
+            (not_writable, usage), latency = _timed(lambda: (
+                [folder for folder in folders if not os.access(folder, os.W_OK)],
+                shutil.disk_usage(config['STORAGE_ROOT'])))
+        except OSError as e:
+            return {'status': f'error: {str(e)}'}
+
+        status = 'ok'
+        if not_writable:
+            status = f'error: {", ".join(not_writable)} not writable'
+        elif usage.free < config['HEALTH_MIN_FREE_DISK_MB'] * 1024 * 1024:
+            status = 'error: 磁盘剩余空间不足'
+        return {'status': status, 'free_bytes': usage.free, 'total_bytes': usage.total, 'latency_ms': latency}
+
+
+def serialize(report):
+    """就绪检查结果的API表示"""
+    return dict(report, checked_at=datetime.utcfromtimestamp(report['checked_at']).isoformat())
+
+
+def init_app(app, db, queue_depth):
+    """创建就绪探测器，保存在 app.extensions['readiness']（探测线程在首次使用时启动）"""
+    prober = ReadinessProber(app, db, queue_depth)
+    app.extensions['readiness'] = prober
+    return prober
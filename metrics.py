@@ -0,0 +1,149 @@
+"""Prometheus指标：请求量与延迟、上传下载字节数、数据库查询、后台队列、审计日志、缓存命中
+
+多worker（gunicorn）部署时需要设置环境变量 PROMETHEUS_MULTIPROC_DIR，
+各worker把指标写入该目录，/metrics 汇总所有worker的数据（见 gunicorn.conf.py）。
+"""
+import os
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:  # 可选依赖，未安装时所有指标为空操作
+    prometheus_client = None
+
+
+class _NoopMetric:
+    """未安装prometheus_client时的占位指标"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+
+# 请求延迟分桶：覆盖普通页面到200MB文件上传
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+THROUGHPUT_BUCKETS = tuple(2 ** n * 1024 for n in range(4, 18, 2))  # 16KB/s ~ 128MB/s
+
+# 计入传输字节数的端点
+UPLOAD_ENDPOINTS = {'upload', 'api_upload_batch', 'api_upload_session_chunk'}
+DOWNLOAD_ENDPOINTS = {'download', 'download_bundle'}
+
+if prometheus_client is not None:
+    REQUEST_COUNT = Counter('dll_http_requests_total', 'HTTP请求数',
+                            ['endpoint', 'method', 'status'])
+    REQUEST_LATENCY = Histogram('dll_http_request_duration_seconds', 'HTTP请求处理时间',
+                                ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+    TRANSFER_BYTES = Counter('dll_transfer_bytes_total', '上传/下载字节数', ['direction'])
+    UPLOAD_THROUGHPUT = Histogram('dll_upload_throughput_bytes_per_second', '单个上传请求的吞吐量',
+                                  ['endpoint'], buckets=THROUGHPUT_BUCKETS)
+    DOWNLOAD_THROUGHPUT = Histogram('dll_download_throughput_bytes_per_second', '单个下载响应的吞吐量（发送完毕时计算）',
+                                    ['endpoint'], buckets=THROUGHPUT_BUCKETS)
+    DB_QUERY_DURATION = Histogram('dll_db_query_duration_seconds', '数据库查询耗时（_count即查询数）',
+                                  buckets=DB_LATENCY_BUCKETS)
+    BACKGROUND_QUEUE_DEPTH = Gauge('dll_background_queue_depth', '后台任务队列中未完成的任务数',
+                                   multiprocess_mode='livesum')
+    AUDIT_LOG_WRITES = Counter('dll_audit_log_writes_total', '审计日志写入数', ['status'])
+    CACHE_REQUESTS = Counter('dll_cache_requests_total', '缓存访问数', ['cache', 'result'])
+    DB_ROUTED_QUERIES = Counter('dll_db_routed_queries_total', '只读路由中的查询数（按实际使用的库）', ['target'])
+    QUOTA_REJECTIONS = Counter('dll_download_quota_rejections_total', '超出下载配额被拒绝的下载数', ['reason'])
+else:
+    REQUEST_COUNT = REQUEST_LATENCY = TRANSFER_BYTES = UPLOAD_THROUGHPUT = DOWNLOAD_THROUGHPUT = _NoopMetric()
+    DB_QUERY_DURATION = BACKGROUND_QUEUE_DEPTH = AUDIT_LOG_WRITES = CACHE_REQUESTS = _NoopMetric()
+    DB_ROUTED_QUERIES = QUOTA_REJECTIONS = _NoopMetric()
+
+
+def cache_hit(cache, hit):
+    """记录一次缓存访问"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if starts:
+        DB_QUERY_DURATION.observe(time.perf_counter() - starts.pop())
+
+
+def _observe_download(iterable, start, endpoint, count_bytes):
+    """下载响应体发送完毕时按实际发送的字节数记录吞吐量（包括限速等待，客户端中途断开的不计）；
+    流式响应（如打包下载）没有Content-Length，count_bytes 时边输出边计数"""
+    sent = 0
+    try:
+        for chunk in iterable:
+            sent += len(chunk)
+            if count_bytes:
+                TRANSFER_BYTES.labels(direction='download').inc(len(chunk))
+            yield chunk
+        elapsed = time.perf_counter() - start
+        if sent and elapsed > 0:
+            DOWNLOAD_THROUGHPUT.labels(endpoint=endpoint).observe(sent / elapsed)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    # 未匹配路由统一归为一类，避免标签基数膨胀
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    labels = {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)}
+    REQUEST_COUNT.labels(**labels).inc()
+    REQUEST_LATENCY.labels(**labels).observe(elapsed)
+
+    if request.endpoint in UPLOAD_ENDPOINTS and request.content_length and response.status_code < 400:
+        TRANSFER_BYTES.labels(direction='upload').inc(request.content_length)
+        if elapsed > 0:
+            UPLOAD_THROUGHPUT.labels(endpoint=endpoint).observe(request.content_length / elapsed)
+    elif request.endpoint in DOWNLOAD_ENDPOINTS and response.status_code < 300:
+        counted = response.content_length is not None
+        if counted:
+            TRANSFER_BYTES.labels(direction='download').inc(response.content_length)
+        if response.is_streamed:
+            response.response = _observe_download(response.response, start, endpoint, count_bytes=not counted)
+    return response
+
+
+def metrics_view():
+    """Prometheus抓取端点"""
+    if prometheus_client is None:
+        return Response('prometheus_client 未安装，指标不可用\n', status=503, mimetype='text/plain')
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # 汇总所有worker写入的指标文件
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """注册请求计时钩子和 /metrics 端点"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,199 @@
+"""版本化数据库迁移：每个迁移只执行一次，已执行的版本记录在 schema_migrations 表中
+
+用法:
+    flask --app app migrate            # 执行所有未执行的迁移（部署时运行一次）
+    flask --app app migrate --status   # 查看迁移状态
+
+应用启动时不再检查表结构。新增迁移时在文件末尾追加 @migration 函数，已发布的迁移不要修改。
+早期部署的数据库由 db.create_all() 建立、没有迁移记录，所有迁移会在其上执行一遍，
+因此增加列和索引前都先检查是否已存在。
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, inspect, select, text, update
+
+import changefeed
+import search
+import versioning
+from models import (Permission, ReplicationHeartbeat, Role, Version, VersionChange, VersionChangeHead, db,
+                    role_permissions)
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', String(20), primary_key=True),
+    Column('description', String(200)),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# (版本号, 说明, 函数)，按版本号顺序执行
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册一个迁移"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def _columns(table):
+    return {column['name'] for column in inspect(db.engine).get_columns(table)}
+
+
+def _indexes(table):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+
+def add_column_if_missing(table, column, ddl_type):
+    """增加列（已存在时跳过）"""
+    if column not in _columns(table):
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+
+
+def create_index_if_missing(table, column, name=None):
+    """创建索引（已存在时跳过）；单列索引的默认索引名与SQLAlchemy的 index=True 一致，多列索引需指定名称"""
+    name = name or f'ix_{table}_{column}'
+    if name not in _indexes(table):
+        db.session.execute(text(f'CREATE INDEX {name} ON {table} ({column})'))
+
+
+def applied_versions():
+    """已执行的迁移 {版本号: 执行时间}"""
+    _metadata.create_all(db.engine)
+    return dict(db.session.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+
+
+def pending_migrations():
+    """未执行的迁移"""
+    applied = applied_versions()
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def upgrade(log=print):
+    """按顺序执行未执行的迁移，每个迁移单独提交；返回本次执行的版本号列表"""
+    done = []
+    for version, description, fn in pending_migrations():
+        log(f'⏳ 执行迁移 {version}: {description}')
+        try:
+            fn()
+            db.session.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        done.append(version)
+    return done
+
+
+# ---------------------------------------------------------------------------
+# 迁移列表
+# ---------------------------------------------------------------------------
+
+@migration('0001', '基础表结构')
+def _create_tables():
+    # 新库按当前模型建全部表；旧库只补建缺失的表（如 upload_sessions）
+    db.create_all()
+
+
+@migration('0002', 'versions 增加 sha256 列')
+def _add_version_sha256():
+    add_column_if_missing('versions', 'sha256', 'VARCHAR(64)')
+
+
+@migration('0003', 'users 增加搜索/排序索引')
+def _add_user_indexes():
+    for column in ('email', 'department', 'created_at', 'role_id'):
+        create_index_if_missing('users', column)
+
+
+@migration('0004', '版本全文检索索引')
+def _create_search_index():
+    search.ensure_search_index(db)
+
+
+DEFAULT_PERMISSIONS = {
+    'upload': '上传文件',
+    'download': '下载文件',
+    'view_analytics': '查看数据分析',
+    'manage_users': '管理用户',
+    'manage_roles': '管理角色',
+}
+DEFAULT_ROLES = {
+    'admin': ('管理员', list(DEFAULT_PERMISSIONS)),
+    'user': ('普通用户', ['upload', 'download', 'view_analytics']),
+}
+
+
+@migration('0005', '默认角色和权限')
+def _seed_default_roles():
+    # 只补充缺失的权限、角色和授权，不修改已有数据
+    existing = set(db.session.scalars(select(Permission.name).where(Permission.name.in_(list(DEFAULT_PERMISSIONS)))))
+    db.session.add_all([Permission(name=name, description=description)
+                        for name, description in DEFAULT_PERMISSIONS.items() if name not in existing])
+    existing = set(db.session.scalars(select(Role.name).where(Role.name.in_(list(DEFAULT_ROLES)))))
+    db.session.add_all([Role(name=name, description=description)
+                        for name, (description, _) in DEFAULT_ROLES.items() if name not in existing])
+    db.session.flush()
+
+    role_ids = dict(db.session.execute(select(Role.name, Role.id).where(Role.name.in_(list(DEFAULT_ROLES)))).all())
+    perm_ids = dict(db.session.execute(
+        select(Permission.name, Permission.id).where(Permission.name.in_(list(DEFAULT_PERMISSIONS)))).all())
+    granted = set(db.session.execute(
+        select(role_permissions.c.role_id, role_permissions.c.permission_id)
+        .where(role_permissions.c.role_id.in_(list(role_ids.values())))).all())
+    grants = [{'role_id': role_ids[role], 'permission_id': perm_ids[perm]}
+              for role, (_, perms) in DEFAULT_ROLES.items() for perm in perms
+              if (role_ids[role], perm_ids[perm]) not in granted]
+    if grants:
+        db.session.execute(role_permissions.insert(), grants)
+
+
+@migration('0006', 'versions 增加存储层和实际占用空间列')
+def _add_version_storage_tier():
+    add_column_if_missing('versions', 'storage_tier', "VARCHAR(10) NOT NULL DEFAULT 'hot'")
+    add_column_if_missing('versions', 'stored_size', 'BIGINT')
+
+
+@migration('0007', 'versions 增加语义化版本排序键')
+def _add_version_key():
+    add_column_if_missing('versions', 'version_key', f'VARCHAR({versioning.KEY_LENGTH})')
+    rows = db.session.execute(select(Version.id, Version.version).where(Version.version_key.is_(None))).all()
+    for start in range(0, len(rows), 1000):
+        db.session.execute(update(Version), [{'id': row.id, 'version_key': versioning.sort_key(row.version)}
+                                             for row in rows[start:start + 1000]])
+    create_index_if_missing('versions', 'software_name, version_key', name='ix_versions_software_version_key')
+
+
+@migration('0008', '版本目录变更表')
+def _create_version_changes():
+    VersionChange.__table__.create(db.engine, checkfirst=True)
+    # 已有版本补写新增记录，镜像从 since=0 开始即可得到完整目录
+    changefeed.backfill(db.session)
+
+
+@migration('0009', '变更ID序列表（变更ID按提交顺序连续分配）')
+def _create_version_change_head():
+    VersionChangeHead.__table__.create(db.engine, checkfirst=True)
+    if db.session.get(VersionChangeHead, 1) is None:
+        last = db.session.scalar(select(func.coalesce(func.max(VersionChange.id), 0)))
+        db.session.add(VersionChangeHead(id=1, seq=last))
+
+
+@migration('0010', '重新计算语义化版本排序键（预发布标识结束符改为小于所有允许字符）')
+def _recompute_version_key():
+    rows = db.session.execute(select(Version.id, Version.version, Version.version_key)).all()
+    changed = [{'id': row.id, 'version_key': versioning.sort_key(row.version)} for row in rows
+               if row.version_key != versioning.sort_key(row.version)]
+    for start in range(0, len(changed), 1000):
+        db.session.execute(update(Version), changed[start:start + 1000])
+
+
+@migration('0011', '复制心跳表（估算只读副本延迟）')
+def _create_replication_heartbeat():
+    ReplicationHeartbeat.__table__.create(db.engine, checkfirst=True)
+    if db.session.get(ReplicationHeartbeat, 1) is None:
+        db.session.add(ReplicationHeartbeat(id=1, beat_at=datetime.utcnow()))
@@ -2,7 +2,11 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+import versioning
+from db_routing import RoutingSession
+
+# 会话按请求在主库和只读副本之间路由（见 db_routing.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # 权限模型
 class Permission(db.Model):
@@ -40,20 +44,20 @@ class User(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False, unique=True, index=True)
-    email = db.Column(db.String(120), nullable=False, unique=True)
+    email = db.Column(db.String(120), nullable=False, unique=True, index=True)
     phone = db.Column(db.String(20))  # 手机号
-    department = db.Column(db.String(100))  # 所属部门
+    department = db.Column(db.String(100), index=True)  # 所属部门（用户管理页前缀搜索）
     password_hash = db.Column(db.String(255), nullable=False)
     full_name = db.Column(db.String(100))
     is_active = db.Column(db.Boolean, default=True)
     failed_login_attempts = db.Column(db.Integer, default=0)  # 登录失败次数
     locked_until = db.Column(db.DateTime)  # 锁定时间
     last_login_at = db.Column(db.DateTime)  # 最后登录时间
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关联角色
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), index=True)
     role = db.relationship('Role', back_populates='users')
     
     def set_password(self, password):
@@ -94,15 +98,27 @@ class User(db.Model):
         self.last_login_at = datetime.utcnow()
 
 # 版本模型
+def _version_sort_key(context):
+    """插入时由版本号计算排序键（ORM和批量插入都适用）"""
+    return versioning.sort_key(context.get_current_parameters()['version'])
+
 class Version(db.Model):
     __tablename__ = 'versions'
+    __table_args__ = (
+        # 按软件取最新版本/版本范围（见 versioning.py）
+        db.Index('ix_versions_software_version_key', 'software_name', 'version_key'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     software_name = db.Column(db.String(100), nullable=False, index=True)
     version = db.Column(db.String(50), nullable=False)  # v1.0.0
+    version_key = db.Column(db.String(versioning.KEY_LENGTH), default=_version_sort_key)  # 语义化版本排序键
     file_path = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.BigInteger, nullable=False)  # 文件大小(bytes)
     file_type = db.Column(db.String(10), nullable=False)  # 文件类型：dll, exe, apk
+    sha256 = db.Column(db.String(64))  # 文件SHA-256（首次需要时计算）
+    storage_tier = db.Column(db.String(10), nullable=False, default='hot', server_default='hot')  # hot / cold（只保留zstd副本）
+    stored_size = db.Column(db.BigInteger)  # 实际占用空间(bytes)，为空表示尚未做冷存储评估
     
     # 核心业务字段
     update_notes = db.Column(db.Text, nullable=False)  # 更新说明（必填）
@@ -125,6 +141,15 @@ class Version(db.Model):
     def get_file_size_mb(self):
         """返回MB格式的文件大小"""
         return round(self.file_size / (1024 * 1024), 2)
+    
+    def get_compression_ratio(self):
+        """返回存储压缩率（实际占用/原始大小），未评估时返回None"""
+        if not self.stored_size or not self.file_size:
+            return None
+        return round(self.stored_size / self.file_size, 4)
+
+# 版本从新到旧：按语义化版本号，同一版本号的多次上传按上传时间
+VERSION_NEWEST_FIRST = (Version.version_key.desc(), Version.uploaded_at.desc(), Version.id.desc())
 
 # 日志模型
 class Log(db.Model):
@@ -142,3 +167,43 @@ class Log(db.Model):
     status = db.Column(db.String(20), nullable=False)  # 操作状态：success, failed, error
     message = db.Column(db.Text)  # 操作详情或错误信息
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # 操作时间
+
+# 版本目录变更模型（下游镜像增量同步，见 changefeed.py）
+class VersionChange(db.Model):
+    __tablename__ = 'version_changes'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 变更游标（由 version_change_head 分配，连续递增）
+    version_id = db.Column(db.Integer, nullable=False)  # 版本ID（版本删除后仍保留记录，不设外键）
+    action = db.Column(db.String(20), nullable=False)  # create / update / archive / delete
+    software_name = db.Column(db.String(100), nullable=False)
+    version = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # 变更后的版本数据（JSON）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# 变更ID序列（单行表）：变更ID在写入变更的事务中从这里分配，行锁持有到提交，
+# 因此变更ID按提交顺序连续递增，回滚的事务不留下空缺
+class VersionChangeHead(db.Model):
+    __tablename__ = 'version_change_head'
+    
+    id = db.Column(db.Integer, primary_key=True)  # 固定为1
+    seq = db.Column(db.Integer, nullable=False)  # 最后分配的变更ID
+
+# 复制心跳（单行表）：检查副本延迟时写入主库，比较副本上复制到的心跳时间估算延迟（见 db_routing.py）
+class ReplicationHeartbeat(db.Model):
+    __tablename__ = 'replication_heartbeat'
+    
+    id = db.Column(db.Integer, primary_key=True)  # 固定为1
+    beat_at = db.Column(db.DateTime, nullable=False)  # 最近一次心跳时间（UTC）
+
+# 断点续传上传会话模型
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # 会话ID（uuid4 hex）
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # 发起用户ID
+    filename = db.Column(db.String(255), nullable=False)  # 原始文件名
+    total_size = db.Column(db.BigInteger, nullable=False)  # 文件总大小(bytes)
+    staging_path = db.Column(db.String(255), nullable=False)  # 暂存文件路径（UPLOAD_FOLDER_TESTING下）
+    upload_metadata = db.Column(db.Text)  # 上传元数据（JSON）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # 过期时间（过期后被回收）
@@ -0,0 +1,109 @@
+"""预压缩变体：为每个存储的文件生成一次gzip/zstd副本，下载时按Accept-Encoding选用"""
+import gzip
+import os
+import shutil
+import threading
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时只生成gzip变体
+    zstandard = None
+
+# 编码 -> 变体文件后缀
+VARIANT_SUFFIXES = {
+    'zstd': '.zst',
+    'gzip': '.gz',
+}
+
+# 压缩后至少要节省这个比例才保留变体
+MIN_SAVING_RATIO = 0.05
+
+
+def available_encodings():
+    """当前环境可以生成的编码"""
+    return [encoding for encoding in VARIANT_SUFFIXES if encoding != 'zstd' or zstandard is not None]
+
+
+def get_variant_path(path, encoding):
+    """返回指定编码的变体路径"""
+    return path + VARIANT_SUFFIXES[encoding]
+
+
+def _compress(path, out_path, encoding, gzip_level, zstd_level):
+    """流式压缩单个文件"""
+    with open(path, 'rb') as src:
+        if encoding == 'gzip':
+            with gzip.GzipFile(out_path, 'wb', compresslevel=gzip_level, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            with open(out_path, 'wb') as dst:
+                zstandard.ZstdCompressor(level=zstd_level).copy_stream(src, dst)
+
+
+def generate_variants(path, gzip_level=9, zstd_level=19):
+    """为文件生成所有可用编码的变体（先写临时文件再原子替换），返回生成的编码列表"""
+    original_size = os.path.getsize(path)
+    generated = []
+    for encoding in available_encodings():
+        variant_path = get_variant_path(path, encoding)
+        if os.path.exists(variant_path):
+            generated.append(encoding)
+            continue
+
+        tmp_path = f'{variant_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            _compress(path, tmp_path, encoding, gzip_level, zstd_level)
+            # 压缩收益太小的变体不保留，下载时直接返回原文件
+            if os.path.getsize(tmp_path) <= original_size * (1 - MIN_SAVING_RATIO):
+                os.replace(tmp_path, variant_path)
+                generated.append(encoding)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return generated
+
+
+def choose_variant(path, accepted):
+    """从已有变体中选出客户端可接受的最小文件，返回(编码, 路径)，没有合适变体时返回(None, path)
+
+    accepted: 编码 -> 客户端quality值
+    原文件已不存在（如冷存储只保留zstd变体）时，只要客户端接受就返回变体。
+    """
+    best_encoding, best_path = None, path
+    try:
+        best_size = os.path.getsize(path)
+    except OSError:
+        best_size = float('inf')
+    for encoding in VARIANT_SUFFIXES:
+        if not accepted.get(encoding):
+            continue
+        variant_path = get_variant_path(path, encoding)
+        try:
+            size = os.path.getsize(variant_path)
+        except OSError:
+            continue
+        if size < best_size:
+            best_encoding, best_path, best_size = encoding, variant_path, size
+    return best_encoding, best_path
+
+
+def move_variants(path, new_path):
+    """源文件移动/重命名时同步移动变体"""
+    for encoding in VARIANT_SUFFIXES:
+        variant_path = get_variant_path(path, encoding)
+        if os.path.exists(variant_path):
+            shutil.move(variant_path, get_variant_path(new_path, encoding))
+
+
+def remove_variants(path):
+    """源文件删除时同步删除变体（包括冷存储的zstd副本），返回释放的字节数"""
+    freed = 0
+    for encoding in VARIANT_SUFFIXES:
+        variant_path = get_variant_path(path, encoding)
+        try:
+            size = os.path.getsize(variant_path)
+            os.remove(variant_path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
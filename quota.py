@@ -0,0 +1,312 @@
+"""下载配额：按用户/角色限制同时下载数、下载速率和每日下载量
+
+策略文件（JSON/YAML，默认 quota_policy.json）:
+    {
+        "default": {"max_concurrent": null, "bytes_per_second": null, "bytes_per_day": null, "burst_seconds": 2},
+        "roles": {"role_ops": {"max_concurrent": 2, "bytes_per_second": 20971520}},
+        "users": {"ci-farm": {"bytes_per_day": 107374182400}}
+    }
+规则按 默认 < 角色 < 用户 合并，null 表示不限制。
+
+限流状态保存在 QUOTA_STATE_FILE（SQLite），同一主机上的所有worker共享:
+    - 速率：令牌桶，容量为 burst_seconds 秒的流量。应用发送的文件每发送一片扣一次令牌，令牌不足时等待（限速）；
+      同一用户的多个下载共用一个桶，按片交替获得带宽。预签名URL下载无法限速，按文件大小一次性扣除（可以透支）
+    - 同时下载数：每个下载持有一个租约，发送过程中续期，worker异常退出后租约过期自动释放
+    - 每日下载量：按UTC日期累计实际发送的字节数（预签名URL按文件大小计）
+同时下载数已满、当日下载量已用完、或透支超过 max_wait_seconds 秒的流量时拒绝下载（429 + Retry-After）。
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+DEFAULT_RULES = {
+    'max_concurrent': None,
+    'bytes_per_second': None,
+    'bytes_per_day': None,
+    'burst_seconds': 2,
+}
+
+# 同时下载数已满时建议的重试间隔（秒）
+CONCURRENCY_RETRY_AFTER = 5
+
+# 未限速时每累计这么多字节记录一次用量（只用于每日统计和租约续期）
+UNTHROTTLED_SLICE = 8 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    user_id INTEGER PRIMARY KEY,
+    tokens REAL NOT NULL,
+    refilled_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    day_bytes INTEGER NOT NULL DEFAULT 0,
+    throttled_seconds REAL NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    lease_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_leases_user ON leases (user_id);
+"""
+
+
+class QuotaExceeded(Exception):
+    """超出下载配额；reason 为 concurrency / daily / rate，retry_after 为建议的重试间隔（秒）"""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def load_policy(path):
+    """读取并校验策略文件"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            policy = yaml.safe_load(f) or {}
+        else:
+            policy = json.load(f)
+
+    sections = [('default', policy.get('default') or {})]
+    sections += [(f'角色 {name}', rules) for name, rules in (policy.get('roles') or {}).items()]
+    sections += [(f'用户 {name}', rules) for name, rules in (policy.get('users') or {}).items()]
+    for name, rules in sections:
+        unknown = set(rules) - set(DEFAULT_RULES)
+        if unknown:
+            raise ValueError(f'{name} 中有未知规则: {", ".join(sorted(unknown))}')
+        for key, value in rules.items():
+            if key == 'burst_seconds':
+                if not isinstance(value, (int, float)) or value <= 0:
+                    raise ValueError(f'{name} 的 burst_seconds 必须是正数')
+            elif value is not None and (not isinstance(value, int) or value < 1):
+                raise ValueError(f'{name} 的 {key} 必须是正整数或null')
+    return policy
+
+
+def rules_for(policy, username, role_name=None):
+    """合并后的某个用户的规则"""
+    rules = dict(DEFAULT_RULES, **(policy.get('default') or {}))
+    rules.update((policy.get('roles') or {}).get(role_name) or {})
+    rules.update((policy.get('users') or {}).get(username) or {})
+    return rules
+
+
+def _seconds_until_tomorrow(now):
+    """距下一个UTC日期的秒数"""
+    today = datetime.utcfromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (today + timedelta(days=1) - datetime.utcfromtimestamp(now)).total_seconds()
+
+
+class DownloadLimiter:
+    """多worker共享的下载限流器"""
+
+    def __init__(self, path, policy, lease_seconds=60, max_wait_seconds=30):
+        self.path = path
+        self.policy = policy
+        self.lease_seconds = lease_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._local = threading.local()
+
+    def rules_for(self, user):
+        return rules_for(self.policy, user.username, user.role.name if user.role else None)
+
+    def _connect(self):
+        """每个线程（gevent模式下每个协程）一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """写事务（BEGIN IMMEDIATE：多个worker对同一用户的读-改-写串行执行）"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _load_usage(conn, user_id, rules, now):
+        """读取用户用量，补充令牌并处理日期切换"""
+        rate = rules['bytes_per_second']
+        capacity = rate * rules['burst_seconds'] if rate else 0
+        today = datetime.utcfromtimestamp(now).strftime('%Y-%m-%d')
+        row = conn.execute('SELECT * FROM usage WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return {'user_id': user_id, 'tokens': capacity, 'refilled_at': now, 'day': today,
+                    'day_bytes': 0, 'throttled_seconds': 0.0, 'rejected': 0}
+        usage = dict(row)
+        usage['tokens'] = min(capacity, usage['tokens'] + (now - usage['refilled_at']) * rate) if rate else 0
+        usage['refilled_at'] = now
+        if usage['day'] != today:
+            usage['day'] = today
+            usage['day_bytes'] = 0
+        return usage
+
+    @staticmethod
+    def _save_usage(conn, usage):
+        conn.execute(
+            'INSERT OR REPLACE INTO usage (user_id, tokens, refilled_at, day, day_bytes, throttled_seconds, rejected) '
+            'VALUES (:user_id, :tokens, :refilled_at, :day, :day_bytes, :throttled_seconds, :rejected)', usage)
+
+    def acquire(self, user):
+        """检查配额并取得下载租约，超限时抛出 QuotaExceeded"""
+        rules = self.rules_for(user)
+        now = time.time()
+        error = None
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE expires_at < ?', (now,))
+            usage = self._load_usage(conn, user.id, rules, now)
+            active = conn.execute('SELECT COUNT(*) FROM leases WHERE user_id = ?', (user.id,)).fetchone()[0]
+            rate = rules['bytes_per_second']
+            if rules['max_concurrent'] is not None and active >= rules['max_concurrent']:
+                error = QuotaExceeded(f'同时下载数已达上限（{rules["max_concurrent"]}）', 'concurrency',
+                                      CONCURRENCY_RETRY_AFTER)
+            elif rules['bytes_per_day'] is not None and usage['day_bytes'] >= rules['bytes_per_day']:
+                error = QuotaExceeded('今日下载量已用完', 'daily', _seconds_until_tomorrow(now))
+            elif rate and -usage['tokens'] > rate * self.max_wait_seconds:
+                error = QuotaExceeded('下载速率超出配额', 'rate', -usage['tokens'] / rate)
+
+            if error:
+                usage['rejected'] += 1
+            else:
+                lease_id = uuid.uuid4().hex
+                conn.execute('INSERT INTO leases (lease_id, user_id, expires_at) VALUES (?, ?, ?)',
+                             (lease_id, user.id, now + self.lease_seconds))
+            self._save_usage(conn, usage)
+        if error:
+            raise error
+        return Lease(self, lease_id, user.id, rules)
+
+    def _charge(self, lease, nbytes):
+        """扣除令牌并累计当日用量、续期租约，返回需要等待的秒数"""
+        now = time.time()
+        rate = lease.rules['bytes_per_second']
+        with self._transaction() as conn:
+            usage = self._load_usage(conn, lease.user_id, lease.rules, now)
+            usage['day_bytes'] += nbytes
+            wait = 0
+            if rate:
+                usage['tokens'] -= nbytes
+                wait = min(max(0, -usage['tokens'] / rate), self.max_wait_seconds)
+                usage['throttled_seconds'] += wait
+            self._save_usage(conn, usage)
+            conn.execute('UPDATE leases SET expires_at = ? WHERE lease_id = ?',
+                         (now + wait + self.lease_seconds, lease.lease_id))
+        return wait
+
+    def _release(self, lease):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE lease_id = ?', (lease.lease_id,))
+
+    def usage(self, user_ids=None):
+        """各用户的当前用量 {用户ID: {...}}（user_ids 为空时返回全部）"""
+        conn = self._connect()
+        now = time.time()
+        today = datetime.utcfromtimestamp(now).strftime('%Y-%m-%d')
+        active = dict(conn.execute('SELECT user_id, COUNT(*) FROM leases WHERE expires_at >= ? GROUP BY user_id',
+                                   (now,)).fetchall())
+        result = {}
+        for row in conn.execute('SELECT * FROM usage'):
+            if user_ids is not None and row['user_id'] not in user_ids:
+                continue
+            result[row['user_id']] = {
+                'active_downloads': active.get(row['user_id'], 0),
+                'day_bytes': row['day_bytes'] if row['day'] == today else 0,
+                'throttled_seconds': round(row['throttled_seconds'], 1),
+                'rejected': row['rejected'],
+            }
+        return result
+
+
+class Lease:
+    """一次下载的租约：发送过程中扣除配额，结束时释放"""
+
+    def __init__(self, limiter, lease_id, user_id, rules):
+        self.limiter = limiter
+        self.lease_id = lease_id
+        self.user_id = user_id
+        self.rules = rules
+        rate = rules['bytes_per_second']
+        # 限速时每片约1/4秒的流量，片越小越平滑，但每片都要写一次共享状态
+        self.slice_bytes = min(max(rate // 4, 64 * 1024), UNTHROTTLED_SLICE) if rate else UNTHROTTLED_SLICE
+        self.pending = 0
+        self.released = False
+
+    def consume(self, nbytes):
+        """累计已发送的字节，满一片时扣除配额，令牌不足时等待"""
+        self.pending += nbytes
+        if self.pending >= self.slice_bytes:
+            nbytes, self.pending = self.pending, 0
+            wait = self.limiter._charge(self, nbytes)
+            if wait:
+                time.sleep(wait)
+
+    def charge(self, nbytes):
+        """一次性扣除配额（不等待），用于不经过应用发送的下载"""
+        self.limiter._charge(self, nbytes)
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.pending:
+            self.limiter._charge(self, self.pending)
+            self.pending = 0
+        self.limiter._release(self)
+
+
+class ThrottledBody:
+    """按租约限速的响应体；响应关闭时（包括客户端断开）释放租约"""
+
+    def __init__(self, lease, body):
+        self.lease = lease
+        self.body = body
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.lease.consume(len(chunk))
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.lease.release()
+
+
+def throttle(response, lease):
+    """让响应体按租约限速"""
+    response.response = ThrottledBody(lease, response.response)
+    return response
+
+
+def init_app(app):
+    """读取策略文件并创建限流器，保存在 app.extensions['download_quota']（策略文件不存在时不限制，只统计用量）"""
+    path = app.config['QUOTA_POLICY_FILE']
+    try:
+        policy = load_policy(path)
+    except FileNotFoundError:
+        policy = {}
+    limiter = DownloadLimiter(app.config['QUOTA_STATE_FILE'], policy,
+                              lease_seconds=app.config['QUOTA_LEASE_SECONDS'],
+                              max_wait_seconds=app.config['QUOTA_MAX_WAIT_SECONDS'])
+    app.extensions['download_quota'] = limiter
+    return limiter
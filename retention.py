@@ -0,0 +1,177 @@
+"""保留策略与垃圾回收：按软件配置的规则删除旧版本（数据库记录 + 文件），并清理无主文件
+
+策略文件（JSON/YAML，默认 retention_policy.json）:
+    {
+        "default": {"keep_last": 10, "keep_downloaded_within_days": 90, "keep_passed": true},
+        "software": {"foo": {"keep_last": 3, "keep_passed": false}}
+    }
+满足任一规则的版本保留，每个软件的最新版本始终保留（新旧按语义化版本号排序）；软件规则覆盖默认规则中的同名项。
+keep_downloaded_within_days 为 null 时不按下载时间保留（下载时间取自审计日志）。
+
+删除的版本逐批删除数据库记录并写入审计日志，提交后再通过存储后端删除文件（含预压缩变体/冷存储副本），
+仍被其它版本记录引用的文件不删除。审计日志本身不清理。
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+import changefeed
+import precompress
+from models import VERSION_NEWEST_FIRST, Log, Version
+
+DEFAULT_RULES = {
+    'keep_last': 10,
+    'keep_downloaded_within_days': 90,
+    'keep_passed': True,
+}
+
+# test_result 为此值的版本视为测试通过
+PASSED = '通过'
+
+# 预压缩变体/冷存储副本的后缀，这些文件随源文件一起保留
+_DERIVED_SUFFIXES = tuple(precompress.VARIANT_SUFFIXES.values())
+
+
+def load_policy(path):
+    """读取并校验策略文件"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            policy = yaml.safe_load(f) or {}
+        else:
+            policy = json.load(f)
+
+    for name, rules in [('default', policy.get('default') or {})] + list((policy.get('software') or {}).items()):
+        unknown = set(rules) - set(DEFAULT_RULES)
+        if unknown:
+            raise ValueError(f'{name} 中有未知规则: {", ".join(sorted(unknown))}')
+        if 'keep_last' in rules and (not isinstance(rules['keep_last'], int) or rules['keep_last'] < 1):
+            raise ValueError(f'{name} 的 keep_last 必须是不小于1的整数')
+    return policy
+
+
+def rules_for(policy, software_name):
+    """合并后的某个软件的规则"""
+    rules = dict(DEFAULT_RULES, **(policy.get('default') or {}))
+    rules.update((policy.get('software') or {}).get(software_name) or {})
+    return rules
+
+
+def _last_downloads(db, since):
+    """since之后每个版本的最近下载时间 {版本ID: 时间}"""
+    return dict(db.session.execute(
+        select(Log.resource_id, func.max(Log.created_at))
+        .where(Log.action == 'download', Log.resource_type == 'version', Log.created_at >= since)
+        .group_by(Log.resource_id)).all())
+
+
+def plan(db, policy, now=None):
+    """计算要删除的版本，返回 {软件名: {'kept': [...], 'deleted': [...]}}，元素为版本行（只读取必要的列）"""
+    now = now or datetime.utcnow()
+    rows = db.session.execute(
+        select(Version.id, Version.software_name, Version.version, Version.file_path, Version.file_size,
+               Version.stored_size, Version.test_result, Version.uploaded_at)
+        .order_by(Version.software_name, *VERSION_NEWEST_FIRST)).all()
+
+    windows = [rules_for(policy, row.software_name)['keep_downloaded_within_days'] for row in rows]
+    windows = [days for days in windows if days is not None]
+    last_downloads = _last_downloads(db, now - timedelta(days=max(windows))) if windows else {}
+
+    result = defaultdict(lambda: {'kept': [], 'deleted': []})
+    for row in rows:
+        rules = rules_for(policy, row.software_name)
+        group = result[row.software_name]
+        position = len(group['kept']) + len(group['deleted'])
+        days = rules['keep_downloaded_within_days']
+        keep = (position < rules['keep_last']
+                or (rules['keep_passed'] and row.test_result == PASSED)
+                or (days is not None and row.id in last_downloads
+                    and last_downloads[row.id] >= now - timedelta(days=days)))
+        group['kept' if keep else 'deleted'].append(row)
+    return dict(result)
+
+
+def _walk_visible(folder):
+    """os.walk，跳过以'.'开头的文件和目录"""
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        yield root, dirs, [name for name in files if not name.startswith('.')]
+
+
+def find_orphan_files(db, folders, patch_folder, grace_hours, deleted_ids=()):
+    """查找没有版本记录引用的文件和补丁，返回路径列表（deleted_ids: 试运行时视为已删除的版本）
+
+    同名重复上传时旧文件会被加时间戳重命名，这些文件不再被任何记录引用；
+    修改时间在 grace_hours 内的版本文件可能正在上传或压缩，不视为无主文件。
+    以'.'开头的文件和目录（.gitkeep、状态文件等）不是版本文件，跳过。
+    """
+    cutoff = time.time() - grace_hours * 3600
+    referenced = set(db.session.scalars(select(Version.file_path)))
+    version_ids = set(db.session.scalars(select(Version.id))) - set(deleted_ids)
+
+    orphans = []
+    for folder in folders:
+        for root, _, files in _walk_visible(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                source = path
+                for suffix in _DERIVED_SUFFIXES:
+                    if source.endswith(suffix) and source[:-len(suffix)] in referenced:
+                        source = source[:-len(suffix)]
+                        break
+                if source not in referenced and os.path.getmtime(path) < cutoff:
+                    orphans.append(path)
+
+    # 补丁文件名为 <旧版本ID>_to_<新版本ID>.bsdiff，只在两个版本都存在后生成，任一版本被删除后即可清理
+    for root, _, files in _walk_visible(patch_folder):
+        for name in files:
+            from_id, _, to_id = name.split('.', 1)[0].partition('_to_')
+            if not (from_id.isdigit() and to_id.isdigit()
+                    and int(from_id) in version_ids and int(to_id) in version_ids):
+                orphans.append(os.path.join(root, name))
+    return orphans
+
+
+def delete_versions(db, rows, remove_file, batch_size=500, log=print):
+    """分批删除版本记录并写入审计日志和目录变更，每批提交后删除不再被引用的文件；返回释放的字节数
+
+    remove_file: 删除单个版本文件（含变体/冷存储副本）并返回释放字节数的函数，由存储后端提供
+    """
+    freed = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        ids = [row.id for row in batch]
+        Version.query.filter(Version.id.in_(ids)).delete(synchronize_session=False)
+        changefeed.record_deleted(db.session, batch)
+        db.session.add_all([
+            Log(username='system', action='delete', resource_type='version', resource_id=row.id,
+                resource_name=f'{row.software_name} v{row.version}', status='success',
+                message=f'保留策略删除 {row.software_name} v{row.version}（上传于 {row.uploaded_at:%Y-%m-%d}）')
+            for row in batch
+        ])
+        db.session.commit()
+
+        # 同一路径可能被多条记录引用（重复上传），仍被引用的文件保留
+        paths = {row.file_path for row in batch}
+        still_referenced = set(db.session.scalars(select(Version.file_path).where(Version.file_path.in_(paths))))
+        for path in paths - still_referenced:
+            freed += remove_file(path)
+        log(f'🗑️ 已删除 {start + len(batch)}/{len(rows)} 个版本')
+    return freed
+
+
+def remove_files(paths):
+    """删除文件，返回释放的字节数"""
+    freed = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
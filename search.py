@@ -0,0 +1,118 @@
+"""版本全文检索：MySQL使用FULLTEXT(ngram)索引，SQLite使用FTS5(trigram)虚拟表，其余数据库退化为LIKE
+
+检索字段：软件名称、版本号、更新说明、测试描述、测试ID、开发负责人
+"""
+from sqlalchemy import or_, text
+
+from models import Version
+
+SEARCH_COLUMNS = ['software_name', 'version', 'update_notes', 'test_description', 'test_id', 'developer_dri']
+
+# FTS5 bm25列权重（与SEARCH_COLUMNS顺序一致）：名称和负责人比长文本更重要
+BM25_WEIGHTS = [10.0, 5.0, 1.0, 1.0, 3.0, 3.0]
+
+# trigram分词要求检索词至少3个字符
+TRIGRAM_MIN_LENGTH = 3
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS versions_fts USING fts5(
+        {', '.join(SEARCH_COLUMNS)}, content='versions', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS versions_fts_ai AFTER INSERT ON versions BEGIN
+        INSERT INTO versions_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS versions_fts_ad AFTER DELETE ON versions BEGIN
+        INSERT INTO versions_fts(versions_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    # 只在检索字段变化时重建索引行（下载计数等更新不触发）
+    f"""CREATE TRIGGER IF NOT EXISTS versions_fts_au AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON versions BEGIN
+        INSERT INTO versions_fts(versions_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+        INSERT INTO versions_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END""",
+]
+
+
+def ensure_search_index(db):
+    """创建全文索引（幂等），SQLite首次创建时为已有数据重建索引"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        exists = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'versions_fts'")).first()
+        for ddl in _SQLITE_DDL:
+            db.session.execute(text(ddl))
+        if not exists:
+            db.session.execute(text("INSERT INTO versions_fts(versions_fts) VALUES ('rebuild')"))
+        db.session.commit()
+    elif dialect == 'mysql':
+        exists = db.session.execute(text(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'versions' AND index_name = 'ft_versions_search'")).first()
+        if not exists:
+            # ngram解析器支持中文分词
+            db.session.execute(text(
+                f"ALTER TABLE versions ADD FULLTEXT INDEX ft_versions_search ({', '.join(SEARCH_COLUMNS)}) WITH PARSER ngram"))
+            db.session.commit()
+
+
+def _fts5_query(keyword):
+    """把用户输入转为FTS5查询：每个词作为短语，多个词之间为AND"""
+    terms = keyword.split()
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_filter(keyword):
+    """LIKE退化方案：每个词至少命中一个检索字段"""
+    conditions = []
+    for term in keyword.split():
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append(or_(*[getattr(Version, c).like(f'%{escaped}%', escape='\\') for c in SEARCH_COLUMNS]))
+    return conditions
+
+
+def search_versions(db, keyword, page=1, per_page=20, software_name=None):
+    """按相关度分页检索版本，返回(版本列表, 总数)"""
+    keyword = keyword.strip()
+    offset = (page - 1) * per_page
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite' and min(len(term) for term in keyword.split()) >= TRIGRAM_MIN_LENGTH:
+        where = "versions_fts MATCH :q"
+        params = {'q': _fts5_query(keyword)}
+        if software_name:
+            where += " AND v.software_name = :software_name"
+            params['software_name'] = software_name
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        total = db.session.execute(text(
+            f"SELECT count(*) FROM versions_fts JOIN versions v ON v.id = versions_fts.rowid WHERE {where}"),
+            params).scalar()
+        rows = db.session.execute(text(
+            f"SELECT versions_fts.rowid FROM versions_fts JOIN versions v ON v.id = versions_fts.rowid "
+            f"WHERE {where} ORDER BY bm25(versions_fts, {weights}) LIMIT :limit OFFSET :offset"),
+            dict(params, limit=per_page, offset=offset)).all()
+        ids = [row[0] for row in rows]
+    elif dialect == 'mysql':
+        match = f"MATCH ({', '.join(SEARCH_COLUMNS)}) AGAINST (:q IN NATURAL LANGUAGE MODE)"
+        where = match
+        params = {'q': keyword}
+        if software_name:
+            where += " AND software_name = :software_name"
+            params['software_name'] = software_name
+        total = db.session.execute(text(f"SELECT count(*) FROM versions WHERE {where}"), params).scalar()
+        rows = db.session.execute(text(
+            f"SELECT id FROM versions WHERE {where} ORDER BY {match} DESC LIMIT :limit OFFSET :offset"),
+            dict(params, limit=per_page, offset=offset)).all()
+        ids = [row[0] for row in rows]
+    else:
+        # 其他数据库或过短的检索词：LIKE全表扫描，按上传时间排序
+        query = Version.query.filter(*_like_filter(keyword))
+        if software_name:
+            query = query.filter_by(software_name=software_name)
+        total = query.count()
+        return query.order_by(Version.uploaded_at.desc()).offset(offset).limit(per_page).all(), total
+
+    # 按相关度顺序取回完整记录（一次IN查询）
+    versions = {v.id: v for v in Version.query.filter(Version.id.in_(ids)).all()} if ids else {}
+    return [versions[i] for i in ids if i in versions], total
@@ -0,0 +1,81 @@
+"""按请求的SQL分析（开启 SQL_PROFILING 后生效，仅用于开发/排查）
+
+- 每个请求记录查询数和总耗时，写入响应头 X-SQL-Query-Count / X-SQL-Query-Time-Ms
+- 慢查询（>= SQL_SLOW_QUERY_MS）连同绑定参数写入日志
+- 同一语句在一个请求内执行 >= SQL_REPEAT_THRESHOLD 次时视为疑似N+1，写入日志和 X-SQL-Repeated 响应头
+- 请求参数带 ?_sql_profile=1 时，用JSON分析结果替换响应正文
+"""
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _profiling_active():
+    return has_request_context() and g.get('sql_profile') is not None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profiling_active():
+        conn.info.setdefault('profiler_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profiler_query_start')
+    if _profiling_active() and starts:
+        g.sql_profile.append((statement, parameters, time.perf_counter() - starts.pop()))
+
+
+def _before_request():
+    g.sql_profile = []
+
+
+def _after_request(response):
+    queries = g.pop('sql_profile', None)
+    if queries is None:
+        return response
+
+    config = current_app.config
+    total_ms = sum(duration for _, _, duration in queries) * 1000
+
+    slow = [(statement, parameters, duration) for statement, parameters, duration in queries
+            if duration * 1000 >= config['SQL_SLOW_QUERY_MS']]
+    for statement, parameters, duration in slow:
+        current_app.logger.warning(f"慢查询 {duration * 1000:.1f}ms [{request.endpoint}]: {statement} 参数: {parameters!r}")
+
+    repeated = [(statement, count) for statement, count in Counter(q[0] for q in queries).most_common()
+                if count >= config['SQL_REPEAT_THRESHOLD']]
+    for statement, count in repeated:
+        current_app.logger.warning(f"疑似N+1 [{request.endpoint}]: 同一语句执行 {count} 次: {statement}")
+
+    if request.args.get('_sql_profile'):
+        return jsonify({
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'query_count': len(queries),
+            'total_ms': round(total_ms, 2),
+            'queries': [{'statement': statement, 'parameters': repr(parameters), 'ms': round(duration * 1000, 3)}
+                        for statement, parameters, duration in queries],
+            'slow': [{'statement': statement, 'ms': round(duration * 1000, 3)} for statement, _, duration in slow],
+            'repeated': [{'statement': statement, 'count': count} for statement, count in repeated]
+        })
+
+    response.headers['X-SQL-Query-Count'] = str(len(queries))
+    response.headers['X-SQL-Query-Time-Ms'] = f'{total_ms:.2f}'
+    if repeated:
+        response.headers['X-SQL-Repeated'] = str(len(repeated))
+    return response
+
+
+def init_app(app):
+    """SQL_PROFILING 开启时注册请求钩子"""
+    app.config.setdefault('SQL_PROFILING', False)
+    app.config.setdefault('SQL_SLOW_QUERY_MS', 100)
+    app.config.setdefault('SQL_REPEAT_THRESHOLD', 5)
+    if app.config['SQL_PROFILING']:
+        app.before_request(_before_request)
+        app.after_request(_after_request)
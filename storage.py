@@ -0,0 +1,206 @@
+"""存储后端：版本文件的持久化位置（本地文件系统或S3兼容对象存储）
+
+版本记录的 file_path 是 STORAGE_ROOT 下的逻辑路径，两种后端使用同一目录布局：
+本地后端直接读写该路径；S3后端以相对 STORAGE_ROOT 的路径作为对象键（可加 S3_PREFIX 前缀）。
+上传流程不变：文件先写入本地路径，提交前 publish() 交给后端，提交后 evict_local() 删除本地副本，
+提交失败时 unpublish() 撤销。S3后端下载返回预签名URL，文件内容不经过应用服务器，应用节点不保存版本文件。
+
+配置:
+    STORAGE_BACKEND=local（默认）或 s3
+    S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL（MinIO等兼容服务）, S3_REGION,
+    S3_ACCESS_KEY_ID / S3_SECRET_ACCESS_KEY（为空时使用boto3默认凭证链）
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import precompress
+import tiering
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorage:
+    """本地文件系统（支持预压缩变体和冷存储）"""
+
+    name = 'local'
+    is_local = True
+
+    def publish(self, path, source=None):
+        """文件已在最终路径，无需处理"""
+
+    def unpublish(self, path):
+        pass
+
+    def evict_local(self, path):
+        pass
+
+    def exists(self, path):
+        return tiering.exists(path)
+
+    def open(self, path):
+        return tiering.open_content(path)
+
+    def move(self, path, new_path):
+        """移动文件及其变体/冷存储副本"""
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        if os.path.exists(path):
+            os.rename(path, new_path)
+        precompress.move_variants(path, new_path)
+
+    def delete(self, path):
+        """删除文件及其变体/冷存储副本，返回释放的字节数"""
+        freed = 0
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+        return freed + precompress.remove_variants(path)
+
+    def materialize(self, path, tmp_dir):
+        return tiering.materialize(path, tmp_dir)
+
+    def download_url(self, path, filename):
+        """本地文件由应用直接发送"""
+        return None
+
+
+class S3Storage:
+    """S3兼容对象存储：大文件多分片并行上传/下载，下载使用预签名URL"""
+
+    name = 's3'
+    is_local = False
+
+    def __init__(self, bucket, root, prefix='', endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 multipart_threshold=8 * 1024 * 1024, multipart_chunksize=16 * 1024 * 1024, max_concurrency=8,
+                 url_expires=300):
+        # 可选依赖，只有 STORAGE_BACKEND=s3 时需要；导入较慢（约100ms），不在模块加载时导入
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError('STORAGE_BACKEND=s3 需要安装 boto3')
+        if not bucket:
+            raise RuntimeError('STORAGE_BACKEND=s3 需要配置 S3_BUCKET')
+        self.bucket = bucket
+        self.root = root
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.url_expires = url_expires
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region or None,
+                                   aws_access_key_id=access_key or None, aws_secret_access_key=secret_key or None)
+        self.transfer_config = TransferConfig(multipart_threshold=multipart_threshold,
+                                              multipart_chunksize=multipart_chunksize,
+                                              max_concurrency=max_concurrency)
+
+    def key(self, path):
+        """逻辑路径 -> 对象键"""
+        return self.prefix + os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def publish(self, path, source=None):
+        """上传本地文件（超过 multipart_threshold 时分片并行上传），source 默认为 path 本身"""
+        self.client.upload_file(source or path, self.bucket, self.key(path), Config=self.transfer_config)
+
+    def unpublish(self, path):
+        """撤销 publish（提交失败时调用），保留本地文件"""
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(path))
+
+    def evict_local(self, path):
+        """提交成功后删除本地副本"""
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _head(self, path):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(path))
+        except self.client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, path):
+        return self._head(path) is not None
+
+    def open(self, path):
+        """返回流式读取的对象内容"""
+        return self.client.get_object(Bucket=self.bucket, Key=self.key(path))['Body']
+
+    def move(self, path, new_path):
+        """服务端复制（大对象自动分片复制）后删除原对象"""
+        self.client.copy({'Bucket': self.bucket, 'Key': self.key(path)}, self.bucket, self.key(new_path),
+                         Config=self.transfer_config)
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(path))
+
+    def delete(self, path):
+        """删除对象，返回释放的字节数"""
+        head = self._head(path)
+        if head is None:
+            return 0
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(path))
+        return head['ContentLength']
+
+    @contextmanager
+    def materialize(self, path, tmp_dir):
+        """分片并行下载到tmp_dir中的临时文件，退出时删除"""
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, f'{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.s3')
+        try:
+            self.client.download_file(self.bucket, self.key(path), tmp_path, Config=self.transfer_config)
+            yield tmp_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def download_url(self, path, filename):
+        """带下载文件名的预签名GET URL"""
+        return self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self.key(path),
+            'ResponseContentDisposition': content_disposition(filename),
+        }, ExpiresIn=self.url_expires)
+
+
+def content_disposition(filename):
+    """attachment 响应头，非ASCII文件名按RFC 5987编码"""
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"attachment; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def sha256(backend, path):
+    """流式计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with backend.open(path) as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def init_app(app):
+    """按 STORAGE_BACKEND 创建存储后端，保存在 app.extensions['storage']"""
+    name = app.config.get('STORAGE_BACKEND', 'local')
+    if name == 'local':
+        backend = LocalStorage()
+    elif name == 's3':
+        backend = S3Storage(
+            bucket=app.config['S3_BUCKET'],
+            root=app.config['STORAGE_ROOT'],
+            prefix=app.config['S3_PREFIX'],
+            endpoint_url=app.config['S3_ENDPOINT_URL'],
+            region=app.config['S3_REGION'],
+            access_key=app.config['S3_ACCESS_KEY_ID'],
+            secret_key=app.config['S3_SECRET_ACCESS_KEY'],
+            multipart_threshold=app.config['S3_MULTIPART_THRESHOLD_MB'] * 1024 * 1024,
+            multipart_chunksize=app.config['S3_MULTIPART_CHUNK_MB'] * 1024 * 1024,
+            max_concurrency=app.config['S3_MAX_CONCURRENCY'],
+            url_expires=app.config['S3_PRESIGNED_URL_EXPIRES'],
+        )
+    else:
+        raise ValueError(f'未知的存储后端: {name}')
+    app.extensions['storage'] = backend
+    return backend
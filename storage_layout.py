@@ -0,0 +1,34 @@
+"""存储目录布局：文件按名称哈希两级分桶存放 <根目录>/<ab>/<cd>/<文件名>
+
+路径只由文件名计算，读写都不需要列目录；每级256个子目录，百万级文件时每个目录只有十几个文件。
+当前版本以标准文件名存放（同名重复上传时旧文件加时间戳后缀，与新文件在同一目录），
+历史版本以 <版本ID>_<标准文件名> 存放，不同软件、同一版本的多次上传都不会冲突。
+"""
+import hashlib
+import os
+
+# 分桶层数和每层目录名的十六进制位数
+FANOUT_LEVELS = 2
+FANOUT_WIDTH = 2
+
+
+def shard_path(root, filename):
+    """返回文件在分桶布局下的路径"""
+    digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+    parts = [digest[i * FANOUT_WIDTH:(i + 1) * FANOUT_WIDTH] for i in range(FANOUT_LEVELS)]
+    return os.path.join(root, *parts, filename)
+
+
+def current_path(root, software_name, version, file_ext):
+    """当前版本的存储路径"""
+    return shard_path(root, f'{software_name}_v{version}.{file_ext}')
+
+
+def history_path(root, version_id, filename):
+    """历史版本的存储路径"""
+    return shard_path(root, f'{version_id}_{filename}')
+
+
+def is_shard_dir(name):
+    """目录名是否为分桶目录（用于区分旧布局遗留的目录）"""
+    return len(name) == FANOUT_WIDTH and all(c in '0123456789abcdef' for c in name)
@@ -0,0 +1,172 @@
+"""声明式RBAC同步：按规格文件（JSON/YAML）一次性同步角色、权限及其关联
+
+用法:
+    python sync_rbac.py                     # 使用默认规格 rbac_spec.json
+    python sync_rbac.py roles.yaml          # 使用YAML规格
+    python sync_rbac.py --dry-run           # 只报告差异，不写数据库
+
+规格中出现的角色，其权限集合以规格为准（多余的关联会被删除）；
+规格中未出现的角色和权限保持不变。
+"""
+import argparse
+import json
+import os
+import sys
+
+from sqlalchemy import and_, bindparam, select
+
+from app import app, db
+from models import Permission, Role, role_permissions
+
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rbac_spec.json')
+
+
+def load_spec(path):
+    """读取并校验规格文件"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    permissions = spec.get('permissions') or {}
+    roles = spec.get('roles') or {}
+
+    # 角色引用的权限必须在规格中声明
+    for role_name, role_spec in roles.items():
+        unknown = set(role_spec.get('permissions', [])) - set(permissions)
+        if unknown:
+            raise ValueError(f'角色 {role_name} 引用了未声明的权限: {", ".join(sorted(unknown))}')
+
+    return permissions, roles
+
+
+def compute_diff(permissions, roles):
+    """对比规格与数据库现状，全部基于集合运算"""
+    current_permissions = dict(db.session.execute(
+        select(Permission.name, Permission.description)).all())
+    current_roles = dict(db.session.execute(
+        select(Role.name, Role.description)).all())
+
+    # 只读取规格内角色的现有关联（一次查询）
+    current_pairs = set(db.session.execute(
+        select(Role.name, Permission.name)
+        .select_from(role_permissions)
+        .join(Role, Role.id == role_permissions.c.role_id)
+        .join(Permission, Permission.id == role_permissions.c.permission_id)
+        .where(Role.name.in_(list(roles)))
+    ).all())
+    desired_pairs = {(role_name, perm_name)
+                     for role_name, role_spec in roles.items()
+                     for perm_name in role_spec.get('permissions', [])}
+
+    return {
+        'create_permissions': sorted(set(permissions) - set(current_permissions)),
+        'update_permissions': sorted(name for name in set(permissions) & set(current_permissions)
+                                     if permissions[name] != current_permissions[name]),
+        'create_roles': sorted(set(roles) - set(current_roles)),
+        'update_roles': sorted(name for name in set(roles) & set(current_roles)
+                               if roles[name].get('description') != current_roles[name]),
+        'grant': sorted(desired_pairs - current_pairs),
+        'revoke': sorted(current_pairs - desired_pairs),
+    }
+
+
+def apply_diff(diff, permissions, roles):
+    """在同一事务中批量应用差异"""
+    if diff['create_permissions']:
+        db.session.execute(Permission.__table__.insert(), [
+            {'name': name, 'description': permissions[name]} for name in diff['create_permissions']
+        ])
+    if diff['update_permissions']:
+        db.session.execute(
+            Permission.__table__.update()
+            .where(Permission.__table__.c.name == bindparam('perm_name'))
+            .values(description=bindparam('perm_description')),
+            [{'perm_name': name, 'perm_description': permissions[name]}
+             for name in diff['update_permissions']])
+    if diff['create_roles']:
+        db.session.execute(Role.__table__.insert(), [
+            {'name': name, 'description': roles[name].get('description')} for name in diff['create_roles']
+        ])
+    if diff['update_roles']:
+        db.session.execute(
+            Role.__table__.update()
+            .where(Role.__table__.c.name == bindparam('role_name'))
+            .values(description=bindparam('role_description')),
+            [{'role_name': name, 'role_description': roles[name].get('description')}
+             for name in diff['update_roles']])
+
+    if diff['grant'] or diff['revoke']:
+        # 新建的行此时已在事务内可见，一次性取回名称到ID的映射
+        role_ids = dict(db.session.execute(
+            select(Role.name, Role.id).where(Role.name.in_(list(roles)))).all())
+        perm_ids = dict(db.session.execute(
+            select(Permission.name, Permission.id).where(Permission.name.in_(list(permissions)))).all())
+
+        if diff['grant']:
+            db.session.execute(role_permissions.insert(), [
+                {'role_id': role_ids[r], 'permission_id': perm_ids[p]} for r, p in diff['grant']
+            ])
+        if diff['revoke']:
+            db.session.execute(
+                role_permissions.delete().where(and_(
+                    role_permissions.c.role_id == bindparam('r_id'),
+                    role_permissions.c.permission_id == bindparam('p_id'))),
+                [{'r_id': role_ids[r], 'p_id': perm_ids[p]} for r, p in diff['revoke']])
+
+
+def print_report(diff, dry_run):
+    """打印变更报告"""
+    prefix = '[dry-run] ' if dry_run else ''
+    for name in diff['create_permissions']:
+        print(f'{prefix}➕ 创建权限: {name}')
+    for name in diff['update_permissions']:
+        print(f'{prefix}✏️  更新权限描述: {name}')
+    for name in diff['create_roles']:
+        print(f'{prefix}➕ 创建角色: {name}')
+    for name in diff['update_roles']:
+        print(f'{prefix}✏️  更新角色描述: {name}')
+    for role_name, perm_name in diff['grant']:
+        print(f'{prefix}✅ 授予 {role_name} -> {perm_name}')
+    for role_name, perm_name in diff['revoke']:
+        print(f'{prefix}❌ 撤销 {role_name} -> {perm_name}')
+
+    total = sum(len(v) for v in diff.values())
+    if total == 0:
+        print('✅ 数据库已与规格一致，无需变更')
+    else:
+        print(f'\n{prefix}共 {total} 项变更: '
+              f'权限 +{len(diff["create_permissions"])} ~{len(diff["update_permissions"])}, '
+              f'角色 +{len(diff["create_roles"])} ~{len(diff["update_roles"])}, '
+              f'授权 +{len(diff["grant"])} -{len(diff["revoke"])}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按规格文件同步角色与权限')
+    parser.add_argument('spec', nargs='?', default=DEFAULT_SPEC, help='规格文件路径（.json/.yaml）')
+    parser.add_argument('--dry-run', action='store_true', help='只报告差异，不写数据库')
+    args = parser.parse_args(argv)
+
+    permissions, roles = load_spec(args.spec)
+
+    with app.app_context():
+        diff = compute_diff(permissions, roles)
+        print_report(diff, args.dry_run)
+
+        if args.dry_run:
+            return 0
+
+        try:
+            apply_diff(diff, permissions, roles)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f'❌ 同步失败，已回滚: {str(e)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""测试夹具：每次测试运行使用独立的临时数据库和存储目录
+
+配置在导入 config 时从环境变量读取，必须在导入 app 之前设置；应用在整个测试会话中只初始化一次，
+每个测试结束后清空数据表和存储目录。
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix='dll-manager-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP_DIR, 'test.db')}"
+os.environ['STORAGE_ROOT'] = os.path.join(TMP_DIR, 'storage')
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+os.environ.pop('STORAGE_BACKEND', None)
+sys.path.insert(0, ROOT)
+
+import app as app_module  # noqa: E402
+import migrations  # noqa: E402
+from models import Log, Role, UploadSession, User, Version, VersionChange, VersionChangeHead, db  # noqa: E402
+
+QUOTA_POLICY_FILE = os.path.join(TMP_DIR, 'quota_policy.json')
+
+
+@pytest.fixture(scope='session')
+def app():
+    application = app_module.create_app(QUOTA_POLICY_FILE=QUOTA_POLICY_FILE, HEALTH_MIN_FREE_DISK_MB=0)
+    with application.app_context():
+        migrations.upgrade(log=lambda message: None)
+    yield application
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+def reset_state(application):
+    """清空数据表、存储目录、限流状态和进程内缓存"""
+    with application.app_context():
+        for model in (VersionChange, VersionChangeHead, Log, UploadSession, Version, User):
+            model.query.delete()
+        db.session.commit()
+        limiter = application.extensions['download_quota']
+        with limiter._transaction() as conn:
+            conn.execute('DELETE FROM usage')
+            conn.execute('DELETE FROM leases')
+    for folder in ('UPLOAD_FOLDER_TESTING', 'UPLOAD_FOLDER_CURRENT', 'UPLOAD_FOLDER_HISTORY', 'PATCH_FOLDER'):
+        shutil.rmtree(application.config[folder], ignore_errors=True)
+    app_module.ensure_storage_dirs()
+    app_module.notify_catalog_changed()
+
+
+@pytest.fixture(autouse=True)
+def clean_state(app):
+    yield
+    reset_state(app)
+
+
+@pytest.fixture
+def admin(app):
+    """管理员用户ID"""
+    with app.app_context():
+        role = Role.query.filter_by(name='admin').first()
+        user = User(username='admin', email='admin@example.com', full_name='Admin', department='QA', role_id=role.id)
+        user.set_password('password1')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(app, admin):
+    """以管理员身份登录的测试客户端"""
+    test_client = app.test_client()
+    with app.app_context():
+        test_client.set_cookie('token', app_module.generate_token(admin))
+    return test_client
+
+
+@pytest.fixture
+def make_version(app):
+    """创建版本文件和记录，返回版本ID"""
+    def factory(software_name='foo', version='1.0.0', data=None, file_type='dll', uploaded_at=None, folder=None):
+        data = data if data is not None else f'{software_name} {version}'.encode() * 100
+        with app.app_context():
+            path = os.path.join(folder or app.config['UPLOAD_FOLDER_CURRENT'],
+                                f'{software_name}_v{version}.{file_type}')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            v = Version(software_name=software_name, version=version, file_path=path, file_size=len(data),
+                        file_type=file_type, update_notes='notes', test_description='desc', test_result='通过',
+                        test_completed_at=datetime.utcnow(), test_id='T-1', developer_dri='dev',
+                        uploaded_by='admin', uploaded_at=uploaded_at or datetime.utcnow())
+            db.session.add(v)
+            db.session.commit()
+            return v.id
+    return factory
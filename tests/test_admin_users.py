@@ -0,0 +1,51 @@
+"""用户管理：分页、前缀搜索、排序"""
+import pytest
+
+import app as app_module
+from models import Role, User, db
+
+
+@pytest.fixture
+def users(app, admin):
+    """admin 之外的12个普通用户：user_00 ~ user_11，偶数在研发部、奇数在测试部"""
+    with app.app_context():
+        role = Role.query.filter_by(name='user').first()
+        for i in range(12):
+            user = User(username=f'user_{i:02d}', email=f'u{i:02d}@example.com', full_name=f'User {i}',
+                        department='研发部' if i % 2 == 0 else '测试部', role_id=role.id, password_hash='-')
+            db.session.add(user)
+        db.session.commit()
+
+
+def test_users_are_paginated(client, users):
+    response = client.get('/api/admin/users?per_page=5&page=2&sort=username')
+    assert response.status_code == 200
+    assert (response.json['total'], response.json['pages'], response.json['has_next']) == (13, 3, True)
+    assert [u['username'] for u in response.json['users']] == ['user_04', 'user_05', 'user_06', 'user_07', 'user_08']
+    assert response.json['users'][0]['role'] == 'user'
+
+    response = client.get('/api/admin/users?per_page=5&page=9')
+    assert response.json['users'] == []
+    assert client.get('/api/admin/users?per_page=10000').json['per_page'] == app_module.USERS_PER_PAGE_MAX
+
+
+def test_users_prefix_search_and_sort(client, users):
+    response = client.get('/api/admin/users?q=测试&sort=username&order=desc')
+    assert [u['username'] for u in response.json['users']] == ['user_11', 'user_09', 'user_07', 'user_05',
+                                                              'user_03', 'user_01']
+    assert [u['username'] for u in client.get('/api/admin/users?q=u03@').json['users']] == ['user_03']
+    # 前缀匹配，LIKE 通配符按字面匹配
+    assert client.get('/api/admin/users?q=example').json['total'] == 0
+    assert client.get('/api/admin/users', query_string={'q': 'user%'}).json['total'] == 0
+    # 未知排序字段按ID排序
+    response = client.get('/api/admin/users?sort=password_hash')
+    assert [u['id'] for u in response.json['users']] == sorted(u['id'] for u in response.json['users'])
+
+
+def test_users_require_manage_users(app, users):
+    with app.app_context():
+        user_id = User.query.filter_by(username='user_00').one().id
+        token = app_module.generate_token(user_id)
+    client = app.test_client()
+    client.set_cookie('token', token)
+    assert client.get('/api/admin/users').status_code == 403
@@ -0,0 +1,114 @@
+"""应用工厂与版本化迁移（旧库用独立的SQLite文件模拟）"""
+import os
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect, text
+
+import app as app_module
+import db_routing
+import migrations
+import versioning
+from config import Config
+from models import ReplicationHeartbeat, Role, Version, VersionChange, VersionChangeHead, db
+
+from conftest import TMP_DIR
+
+# 引入迁移之前由 db.create_all() 建立的表结构
+BASELINE_SCHEMA = [
+    '''CREATE TABLE permissions (
+        id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, description VARCHAR(200))''',
+    '''CREATE TABLE roles (
+        id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, description VARCHAR(200))''',
+    '''CREATE TABLE role_permissions (
+        role_id INTEGER NOT NULL REFERENCES roles (id), permission_id INTEGER NOT NULL REFERENCES permissions (id),
+        PRIMARY KEY (role_id, permission_id))''',
+    '''CREATE TABLE users (
+        id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE,
+        phone VARCHAR(20), department VARCHAR(100), password_hash VARCHAR(255) NOT NULL, full_name VARCHAR(100),
+        is_active BOOLEAN, failed_login_attempts INTEGER, locked_until DATETIME, last_login_at DATETIME,
+        created_at DATETIME, updated_at DATETIME, role_id INTEGER REFERENCES roles (id))''',
+    'CREATE UNIQUE INDEX ix_users_username ON users (username)',
+    '''CREATE TABLE versions (
+        id INTEGER PRIMARY KEY, software_name VARCHAR(100) NOT NULL, version VARCHAR(50) NOT NULL,
+        file_path VARCHAR(255) NOT NULL, file_size BIGINT NOT NULL, file_type VARCHAR(10) NOT NULL,
+        update_notes TEXT NOT NULL, test_description TEXT NOT NULL, test_result VARCHAR(20) NOT NULL,
+        test_duration INTEGER, test_completed_at DATETIME NOT NULL, test_id VARCHAR(50) NOT NULL,
+        developer_dri VARCHAR(100) NOT NULL, uploaded_by VARCHAR(80) NOT NULL, uploaded_at DATETIME,
+        downloaded_count INTEGER)''',
+    'CREATE INDEX ix_versions_software_name ON versions (software_name)',
+    'CREATE INDEX ix_versions_uploaded_at ON versions (uploaded_at)',
+    '''CREATE TABLE logs (
+        id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id), username VARCHAR(80) NOT NULL,
+        action VARCHAR(50) NOT NULL, resource_type VARCHAR(50), resource_id INTEGER, resource_name VARCHAR(255),
+        ip_address VARCHAR(45), user_agent VARCHAR(255), status VARCHAR(20) NOT NULL, message TEXT,
+        created_at DATETIME)''',
+    'CREATE INDEX ix_logs_created_at ON logs (created_at)',
+]
+
+
+@pytest.fixture
+def baseline_app():
+    """数据库为旧表结构、已有一个版本、没有迁移记录的独立应用"""
+    path = os.path.join(TMP_DIR, 'baseline.db')
+    baseline = Flask('baseline-test')
+    baseline.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    db.init_app(baseline)
+    db_routing.init_app(baseline)
+    with baseline.app_context():
+        with db.engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text(
+                "INSERT INTO versions (id, software_name, version, file_path, file_size, file_type, update_notes, "
+                "test_description, test_result, test_completed_at, test_id, developer_dri, uploaded_by, uploaded_at, "
+                "downloaded_count) VALUES (7, 'foo', '1.0.0-alpha', '/tmp/foo.dll', 10, 'dll', 'n', 'd', '通过', "
+                ":at, 'T-1', 'dev', 'admin', :at, 3)"), {'at': datetime(2024, 1, 1)})
+    yield baseline
+    os.remove(path)
+
+
+def test_upgrade_baseline_schema(baseline_app):
+    with baseline_app.app_context():
+        done = migrations.upgrade(log=lambda message: None)
+        assert done == [version for version, _, _ in migrations.MIGRATIONS]
+        assert done[-1] == '0011'
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('versions')}
+        assert {'sha256', 'version_key', 'storage_tier', 'stored_size'} <= columns
+        v = db.session.get(Version, 7)
+        assert (v.version_key, v.storage_tier, v.downloaded_count) == (versioning.sort_key('1.0.0-alpha'), 'hot', 3)
+        assert {role.name for role in Role.query} == {'admin', 'user'}
+
+        # 已有版本补写了新增记录，变更ID序列接在其后
+        assert [(c.id, c.action, c.version_id) for c in VersionChange.query] == [(1, 'create', 7)]
+        assert db.session.get(VersionChangeHead, 1).seq == 1
+        assert db.session.get(ReplicationHeartbeat, 1) is not None
+
+        v.update_notes = 'changed'
+        db.session.commit()
+        assert db.session.get(VersionChangeHead, 1).seq == 2
+
+        # 再次执行时没有待执行的迁移
+        assert migrations.upgrade(log=lambda message: None) == []
+        db.session.remove()
+
+
+def test_create_app_is_idempotent(app):
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    assert app_module.create_app() is app
+    assert app_module.create_app(Config) is app
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == uri
+    assert app.config['QUOTA_POLICY_FILE'].startswith(TMP_DIR)
+
+
+def test_create_app_rejects_late_configuration(app):
+    class OtherConfig(Config):
+        pass
+
+    with pytest.raises(RuntimeError):
+        app_module.create_app(HEALTH_MIN_FREE_DISK_MB=1)
+    with pytest.raises(RuntimeError):
+        app_module.create_app(OtherConfig)
+    assert app.config['HEALTH_MIN_FREE_DISK_MB'] == 0
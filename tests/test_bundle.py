@@ -0,0 +1,50 @@
+"""打包下载"""
+import io
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+from models import Log, Version, db
+
+
+def test_bundle_by_ids(app, client, make_version):
+    foo = make_version('foo', '1.0.0', data=b'MZ foo')
+    bar = make_version('bar', '2.0.0', data=b'MZ bar' * 1000)
+
+    response = client.get(f'/download/bundle?ids={bar},{foo}')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['bar_v2.0.0.dll', 'foo_v1.0.0.dll']
+        assert archive.read('bar_v2.0.0.dll') == b'MZ bar' * 1000
+    response.close()
+
+    with app.app_context():
+        assert [db.session.get(Version, i).downloaded_count for i in (foo, bar)] == [1, 1]
+        assert Log.query.filter_by(action='download').count() == 2
+
+
+def test_bundle_by_software_range(app, client, make_version):
+    # 上传顺序与版本顺序不同：范围按版本号而不是上传时间计算
+    start = datetime.utcnow() - timedelta(days=5)
+    for offset, version in enumerate(['1.10.0', '1.2.0', '2.0.0-rc.1', '1.0.0', '1.1.0']):
+        make_version('foo', version, uploaded_at=start + timedelta(days=offset))
+
+    response = client.get('/download/bundle?software=foo&from=1.1&to=1.10.0')
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['foo_v1.1.0.dll', 'foo_v1.2.0.dll', 'foo_v1.10.0.dll']
+    response.close()
+
+
+def test_bundle_errors(app, client, make_version):
+    assert client.get('/download/bundle').status_code == 400
+    assert client.get('/download/bundle?ids=1,x').status_code == 400
+    assert client.get('/download/bundle?ids=999').status_code == 400
+
+    version_id = make_version('foo', '1.0.0')
+    with app.app_context():
+        os.remove(db.session.get(Version, version_id).file_path)
+    response = client.get(f'/download/bundle?ids={version_id}')
+    assert response.status_code == 404
+    usage = app.extensions['download_quota'].usage()
+    assert all(u['active_downloads'] == 0 for u in usage.values())
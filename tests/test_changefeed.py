@@ -0,0 +1,110 @@
+"""目录变更流：变更记录、游标分页、ID连续"""
+from datetime import datetime
+
+from sqlalchemy import insert
+
+import changefeed
+from models import Version, VersionChange, db
+
+
+def new_version(software_name='foo', version='1.0.0'):
+    return Version(software_name=software_name, version=version, file_path=f'/tmp/{software_name}_v{version}.dll',
+                   file_size=10, file_type='dll', update_notes='notes', test_description='desc', test_result='通过',
+                   test_completed_at=datetime.utcnow(), test_id='T-1', developer_dri='dev', uploaded_by='admin')
+
+
+def test_orm_changes_are_recorded_in_order(app):
+    with app.app_context():
+        v = new_version()
+        db.session.add(v)
+        db.session.commit()
+        v.update_notes = 'changed'
+        db.session.commit()
+        v.file_path = '/tmp/history/foo_v1.0.0.dll'
+        db.session.commit()
+        v.downloaded_count += 1  # 下载计数不属于目录数据
+        db.session.commit()
+        changefeed.record_deleted(db.session, [v])
+        db.session.commit()
+
+        changes, next_cursor, has_more = changefeed.read_changes(db.session, 0, 100)
+        assert [c.action for c in changes] == ['create', 'update', 'archive', 'delete']
+        assert [c.id for c in changes] == [1, 2, 3, 4]
+        assert next_cursor == 4
+        assert not has_more
+
+
+def test_rolled_back_transaction_leaves_no_gap(app):
+    with app.app_context():
+        db.session.add(new_version('foo', '1.0.0'))
+        db.session.commit()
+        db.session.add(new_version('foo', '1.0.1'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.add(new_version('foo', '1.0.2'))
+        db.session.commit()
+
+        changes, _, _ = changefeed.read_changes(db.session, 0, 100)
+        assert [(c.id, c.version) for c in changes] == [(1, '1.0.0'), (2, '1.0.2')]
+
+
+def test_cursor_paging(app):
+    with app.app_context():
+        db.session.add_all([new_version('foo', f'1.0.{i}') for i in range(5)])
+        db.session.commit()
+
+        cursor = 0
+        pages = []
+        has_more = True
+        while has_more:
+            changes, cursor, has_more = changefeed.read_changes(db.session, cursor, 2)
+            pages.append([c.version for c in changes])
+        assert pages == [['1.0.0', '1.0.1'], ['1.0.2', '1.0.3'], ['1.0.4']]
+        assert changefeed.read_changes(db.session, cursor, 2) == ([], cursor, False)
+
+
+def test_changes_api(app, client, make_version):
+    make_version('foo', '1.0.0')
+    make_version('bar', '2.0.0')
+
+    response = client.get('/api/changes?since=0&limit=1')
+    assert response.status_code == 200
+    assert response.json['has_more']
+    assert response.json['changes'][0]['software'] == 'foo'
+    assert response.json['changes'][0]['data']['version'] == '1.0.0'
+
+    response = client.get(f"/api/changes?since={response.json['next_cursor']}")
+    assert [c['software'] for c in response.json['changes']] == ['bar']
+    assert not response.json['has_more']
+
+
+def test_backfill_continues_after_existing_changes(app):
+    with app.app_context():
+        db.session.add(new_version('foo', '1.0.0'))
+        db.session.commit()
+        db.session.execute(Version.__table__.insert().values(
+            software_name='bar', version='1.0.0', file_path='/tmp/bar.dll', file_size=1, file_type='dll',
+            update_notes='n', test_description='d', test_result='通过', test_completed_at=datetime.utcnow(),
+            test_id='T', developer_dri='dev', uploaded_by='admin', uploaded_at=datetime.utcnow()))
+        db.session.commit()
+
+        assert changefeed.backfill(db.session) == 1
+        db.session.commit()
+        assert [c.id for c in VersionChange.query.order_by(VersionChange.id)] == [1, 2]
+
+
+def test_bulk_insert_is_recorded(app):
+    with app.app_context():
+        rows = [{'software_name': 'foo', 'version': f'1.0.{i}', 'file_path': f'/tmp/foo_v1.0.{i}.dll', 'file_size': 10,
+                 'file_type': 'dll', 'update_notes': 'notes', 'test_description': 'desc', 'test_result': '通过',
+                 'test_completed_at': datetime.utcnow(), 'test_id': 'T-1', 'developer_dri': 'dev', 'uploaded_by': 'admin',
+                 'id': 10 + i}
+                for i in range(3)]
+        db.session.execute(insert(Version), rows)
+        changefeed.record_inserted(db.session, [row['id'] for row in rows])
+        db.session.commit()
+
+        changes, _, _ = changefeed.read_changes(db.session, 0, 100)
+        assert [(c.id, c.action, c.version_id) for c in changes] == [(1, 'create', 10), (2, 'create', 11),
+                                                                    (3, 'create', 12)]
+        assert changefeed.serialize(changes[0])['data']['version'] == '1.0.0'
@@ -0,0 +1,107 @@
+"""读写分离路由与副本延迟检查（主库和副本用两个SQLite文件模拟）"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, g
+from sqlalchemy import text
+
+import db_routing
+from models import Version, db
+
+from conftest import TMP_DIR
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """配置了一个副本的独立应用；两个库各有一张 probe 表，内容标明所在的库"""
+    monkeypatch.setattr(db_routing, '_replica_state', {})
+    paths = {name: os.path.join(TMP_DIR, f'routing_{name}.db') for name in ('primary', 'replica')}
+    routing_app = Flask('routing-test')
+    routing_app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{paths['primary']}",
+        SQLALCHEMY_BINDS={'replica_0': f"sqlite:///{paths['replica']}"},
+        REPLICA_MAX_LAG_SECONDS=5,
+        REPLICA_LAG_CHECK_INTERVAL=60,
+    )
+    db.init_app(routing_app)
+    db_routing.init_app(routing_app)
+    with routing_app.app_context():
+        for key, name in ((None, 'primary'), ('replica_0', 'replica')):
+            with db.engines[key].begin() as conn:
+                conn.execute(text('CREATE TABLE probe (name VARCHAR(20))'))
+                conn.execute(text('INSERT INTO probe VALUES (:name)'), {'name': name})
+                conn.execute(text('CREATE TABLE replication_heartbeat (id INTEGER PRIMARY KEY, beat_at DATETIME)'))
+                conn.execute(text('INSERT INTO replication_heartbeat VALUES (1, :at)'),
+                             {'at': datetime(2024, 1, 1)})
+            Version.__table__.create(db.engines[key])
+    yield routing_app
+    for path in paths.values():
+        os.remove(path)
+
+
+def set_replica_beat(routing_app, beat_at):
+    with routing_app.app_context(), db.engines['replica_0'].begin() as conn:
+        conn.execute(text('UPDATE replication_heartbeat SET beat_at = :at'), {'at': beat_at})
+
+
+def probe():
+    return db.session.execute(text('SELECT name FROM probe')).scalar()
+
+
+def test_text_select_in_read_replica_view_uses_replica(routed):
+    with routed.test_request_context('/'):
+        g.db_read_replica = True
+        assert probe() == 'replica'
+        assert db.session.query(Version).count() == 0
+        db.session.remove()
+
+
+def test_queries_outside_read_replica_views_use_primary(routed):
+    with routed.test_request_context('/'):
+        assert probe() == 'primary'
+        db.session.remove()
+
+
+def test_text_write_switches_session_to_primary(routed):
+    with routed.test_request_context('/'):
+        g.db_read_replica = True
+        assert probe() == 'replica'
+        db.session.execute(text("UPDATE probe SET name = 'primary-written'"))
+        assert probe() == 'primary-written'
+        db.session.rollback()
+        db.session.remove()
+
+
+def test_sticky_cookie_uses_primary(routed):
+    cookie = f'{db_routing.STICKY_COOKIE}={datetime.utcnow().timestamp() + 60}'
+    with routed.test_request_context('/', headers={'Cookie': cookie}):
+        g.db_read_replica = True
+        assert probe() == 'primary'
+        db.session.remove()
+
+
+def test_lagging_replica_falls_back_to_primary(routed):
+    # 副本停在很久以前的心跳：主库之后的心跳还没有复制过来
+    with routed.test_request_context('/'):
+        g.db_read_replica = True
+        set_replica_beat(routed, datetime.utcnow() - timedelta(minutes=10))
+        with db.engines[None].begin() as conn:
+            conn.execute(text('UPDATE replication_heartbeat SET beat_at = :at'), {'at': datetime.utcnow()})
+        assert probe() == 'primary'
+        db.session.remove()
+
+
+def test_replica_lag_from_heartbeat(routed):
+    with routed.app_context():
+        replica = db.engines['replica_0']
+        # 副本已复制到主库的最新心跳：没有延迟，即使心跳本身很久以前写入（期间没有写入）
+        assert db_routing._replica_lag(db, replica) == 0
+        with db.engines[None].connect() as conn:
+            primary_beat = conn.execute(db_routing._READ_HEARTBEAT).scalar()
+        # 检查后向主库写入了新的心跳，副本没有复制到它时按副本心跳至今计算延迟
+        assert primary_beat > datetime.utcnow() - timedelta(minutes=1)
+        assert db_routing._replica_lag(db, replica) > 3600
+
+        set_replica_beat(routed, datetime.utcnow() + timedelta(seconds=1))
+        assert db_routing._replica_lag(db, replica) == 0
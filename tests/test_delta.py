@@ -0,0 +1,73 @@
+"""差分下载：请求中只返回已生成的补丁，未生成时发送完整文件并在后台排队"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+import delta
+
+pytestmark = pytest.mark.skipif(not delta.is_available(), reason='需要 bsdiff4')
+
+
+def make_series(make_version, count=3):
+    base = bytes(range(256)) * 2000
+    now = datetime.utcnow()
+    return [make_version('foo', f'1.{i}', data=base + f'v{i}'.encode() * 100,
+                         uploaded_at=now - timedelta(days=count - i))
+            for i in range(count)]
+
+
+def wait_for_patches():
+    for future in list(app_module._pending_background):
+        future.result(timeout=30)
+
+
+def test_missing_patch_serves_full_file_and_queues_generation(client, make_version):
+    ids = make_series(make_version)
+
+    response = client.get(f'/download/{ids[2]}?from={ids[0]}')
+    assert response.status_code == 200
+    assert 'X-Delta-From' not in response.headers
+    full_size = len(response.data)
+    response.close()
+
+    wait_for_patches()
+    response = client.get(f'/download/{ids[2]}?from={ids[0]}')
+    assert response.headers['X-Delta-From'] == str(ids[0])
+    assert len(response.data) < full_size
+    response.close()
+
+
+def test_patch_is_not_generated_inside_the_request(client, make_version, monkeypatch):
+    ids = make_series(make_version)
+    calls = []
+    monkeypatch.setattr(app_module, 'submit_background', lambda fn, *args: calls.append(args) or _done())
+
+    response = client.get(f'/download/{ids[1]}?from={ids[0]}')
+    assert 'X-Delta-From' not in response.headers
+    response.close()
+    assert len(calls) == 1
+
+
+def test_pending_queue_is_bounded(app, client, make_version, monkeypatch):
+    ids = make_series(make_version, count=4)
+    monkeypatch.setitem(app.config, 'DELTA_MAX_PENDING', 1)
+    never_done = []
+    monkeypatch.setattr(app_module, 'submit_background', lambda fn, *args: never_done.append(args) or _Pending())
+
+    for base_id in ids[:3]:
+        client.get(f'/download/{ids[3]}?from={base_id}').close()
+    assert len(never_done) == 1
+    app_module._pending_patches.clear()
+
+
+class _Pending:
+    def add_done_callback(self, fn):
+        pass
+
+
+def _done():
+    class Done:
+        def add_done_callback(self, fn):
+            fn(self)
+    return Done()
@@ -0,0 +1,37 @@
+"""存活与就绪检查"""
+import time
+
+
+def test_livez(app):
+    assert app.test_client().get('/livez').json == {'status': 'ok'}
+
+
+def test_readyz_reports_cached_checks(app):
+    client = app.test_client()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.json['ready']
+    assert set(response.json['checks']) == {'database', 'db_pool', 'storage', 'background_queue'}
+
+    health = client.get('/health').json
+    assert health['status'] == 'healthy'
+    assert health['database'] == 'ok'
+
+
+def test_stale_report_is_not_ready(app, monkeypatch):
+    prober = app.extensions['readiness']
+    prober.start()
+    stale = dict(prober.report, checked_at=time.time() - 3600)
+    monkeypatch.setattr(prober, 'report', stale)
+
+    response = app.test_client().get('/readyz')
+    assert response.status_code == 503
+    assert response.json['error'] == '探测结果已过期'
+
+
+def test_failed_check_is_not_ready(app, monkeypatch):
+    prober = app.extensions['readiness']
+    monkeypatch.setitem(app.config, 'HEALTH_MIN_FREE_DISK_MB', 10 ** 12)
+    report = prober.check()
+    assert not report['ready']
+    assert report['checks']['storage']['status'] == 'error: 磁盘剩余空间不足'
@@ -0,0 +1,40 @@
+"""首页：版本表格片段缓存与条件请求"""
+
+
+def test_index_answers_conditional_get(app, client, make_version):
+    make_version('foo', '1.0.0')
+    response = client.get('/')
+    assert response.status_code == 200
+    assert 'foo' in response.get_data(as_text=True)
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # 新版本改变ETag，旧的校验器不再命中
+    make_version('bar', '2.0.0')
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'bar' in response.get_data(as_text=True)
+
+
+def test_index_etag_depends_on_user(app, client, make_version):
+    make_version('foo', '1.0.0')
+    etag = client.get('/').headers['ETag']
+    anonymous = app.test_client().get('/', headers={'If-None-Match': etag})
+    assert anonymous.status_code == 200
+    assert anonymous.headers['ETag'] != etag
+
+
+def test_index_renders_pending_flash_messages(app, client, make_version):
+    make_version('foo', '1.0.0')
+    etag = client.get('/').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', '✅ 上传成功！')]
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert '✅ 上传成功！' in response.get_data(as_text=True)
@@ -0,0 +1,26 @@
+"""最新版本缓存：按共享的目录变更计数失效"""
+import app as app_module
+
+
+def test_latest_cache_sees_changes_from_other_nodes(app, client, make_version, monkeypatch):
+    make_version('foo', '1.0.0')
+    assert client.get('/api/software/foo/latest').json['version'] == '1.0.0'
+
+    # make_version 不调用 notify_catalog_changed，相当于其它节点上传的版本
+    make_version('foo', '2.0.0')
+    monkeypatch.setitem(app.config, 'CATALOG_STAMP_TTL', 3600)
+    assert client.get('/api/software/foo/latest').json['version'] == '1.0.0'
+
+    monkeypatch.setitem(app.config, 'CATALOG_STAMP_TTL', 0)
+    assert client.get('/api/software/foo/latest').json['version'] == '2.0.0'
+    assert client.get('/api/software').json['software'][0]['version'] == '2.0.0'
+
+
+def test_local_changes_invalidate_immediately(app, client, make_version, monkeypatch):
+    monkeypatch.setitem(app.config, 'CATALOG_STAMP_TTL', 3600)
+    make_version('foo', '1.0.0')
+    assert client.get('/api/software/foo/latest').json['version'] == '1.0.0'
+    make_version('foo', '2.0.0')
+    with app.app_context():
+        app_module.notify_catalog_changed()
+    assert client.get('/api/software/foo/latest').json['version'] == '2.0.0'
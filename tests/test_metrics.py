@@ -0,0 +1,24 @@
+"""Prometheus指标"""
+import pytest
+
+prometheus_client = pytest.importorskip('prometheus_client')
+
+DOWNLOAD_LABELS = {'endpoint': '/download/<int:version_id>'}
+
+
+def download_observations():
+    return prometheus_client.REGISTRY.get_sample_value(
+        'dll_download_throughput_bytes_per_second_count', DOWNLOAD_LABELS) or 0
+
+
+def test_download_throughput_observed_when_response_finishes(client, make_version):
+    version_id = make_version('foo', '1.0.0', data=b'MZ' + b'x' * 4096)
+    before = download_observations()
+
+    response = client.get(f'/download/{version_id}', buffered=False)
+    assert response.status_code == 200
+    # 响应体发送完毕之前不记录
+    assert download_observations() == before
+    assert len(b''.join(response.response)) == 4098
+    response.close()
+    assert download_observations() == before + 1
@@ -0,0 +1,52 @@
+"""预压缩变体与Accept-Encoding协商"""
+import gzip
+import os
+
+import precompress
+from models import Version, db
+
+DATA = b'MZ' + b'repetitive payload ' * 5000
+
+
+def version_path(app, version_id):
+    with app.app_context():
+        return db.session.get(Version, version_id).file_path
+
+
+def test_generate_variants_skips_incompressible_files(app, make_version):
+    path = version_path(app, make_version('foo', '1.0.0', data=DATA))
+    assert sorted(precompress.generate_variants(path)) == sorted(precompress.available_encodings())
+    with gzip.open(precompress.get_variant_path(path, 'gzip')) as f:
+        assert f.read() == DATA
+
+    random_path = version_path(app, make_version('bar', '1.0.0', data=os.urandom(10000)))
+    assert precompress.generate_variants(random_path) == []
+
+
+def test_download_negotiates_smallest_accepted_variant(app, client, make_version):
+    version_id = make_version('foo', '1.0.0', data=DATA)
+    precompress.generate_variants(version_path(app, version_id))
+
+    response = client.get(f'/download/{version_id}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == DATA
+    response.close()
+
+    response = client.get(f'/download/{version_id}', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == DATA
+    response.close()
+
+
+def test_variants_follow_the_source_file(app, make_version):
+    path = version_path(app, make_version('foo', '1.0.0', data=DATA))
+    precompress.generate_variants(path)
+    new_path = os.path.join(app.config['UPLOAD_FOLDER_HISTORY'], 'foo_v1.0.0.dll')
+    os.rename(path, new_path)
+    precompress.move_variants(path, new_path)
+    assert os.path.exists(precompress.get_variant_path(new_path, 'gzip'))
+
+    assert precompress.remove_variants(new_path) > 0
+    assert not any(os.path.exists(precompress.get_variant_path(new_path, encoding))
+                   for encoding in precompress.VARIANT_SUFFIXES)
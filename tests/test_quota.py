@@ -0,0 +1,95 @@
+"""下载配额：同时下载数、每日下载量，以及下载失败时释放租约"""
+import os
+
+import pytest
+
+import app as app_module
+from models import Log, Version, db
+
+
+@pytest.fixture
+def policy(app, monkeypatch):
+    """临时修改配额策略"""
+    limiter = app.extensions['download_quota']
+
+    def apply(rules):
+        monkeypatch.setattr(limiter, 'policy', {'default': rules})
+    return apply
+
+
+def active_downloads(app, user_id):
+    usage = app.extensions['download_quota'].usage([user_id]).get(user_id)
+    return usage['active_downloads'] if usage else 0
+
+
+def test_download_releases_lease_after_response_closed(app, client, admin, make_version):
+    version_id = make_version(data=b'x' * 1000)
+    response = client.get(f'/download/{version_id}')
+    assert response.status_code == 200
+    assert response.data == b'x' * 1000
+    response.close()
+    assert active_downloads(app, admin) == 0
+    with app.app_context():
+        assert db.session.get(Version, version_id).downloaded_count == 1
+
+
+def test_missing_file_returns_404_without_lease_count_or_log(app, client, admin, make_version):
+    version_id = make_version()
+    with app.app_context():
+        os.remove(db.session.get(Version, version_id).file_path)
+
+    response = client.get(f'/download/{version_id}')
+    assert response.status_code == 404
+    assert active_downloads(app, admin) == 0
+    with app.app_context():
+        assert db.session.get(Version, version_id).downloaded_count == 0
+        assert Log.query.filter_by(action='download').count() == 0
+
+
+def test_failed_download_releases_lease(app, client, admin, make_version, monkeypatch):
+    version_id = make_version()
+
+    def broken(version):
+        raise OSError('disk error')
+    monkeypatch.setattr(app_module, 'send_version_file', broken)
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', False)
+
+    for _ in range(3):
+        assert client.get(f'/download/{version_id}').status_code == 500
+    assert active_downloads(app, admin) == 0
+    with app.app_context():
+        assert db.session.get(Version, version_id).downloaded_count == 0
+
+
+def test_concurrent_download_limit(app, client, admin, make_version, policy):
+    policy({'max_concurrent': 1})
+    version_id = make_version()
+
+    first = client.get(f'/download/{version_id}', buffered=False)
+    assert first.status_code == 200
+    second = client.get(f'/download/{version_id}')
+    assert second.status_code == 429
+    assert second.json['reason'] == 'concurrency'
+    assert second.headers['Retry-After']
+
+    first.close()
+    third = client.get(f'/download/{version_id}')
+    assert third.status_code == 200
+    third.close()
+
+
+def test_daily_download_limit(app, client, admin, make_version, policy):
+    policy({'bytes_per_day': 1500})
+    version_id = make_version(data=b'x' * 1000)
+
+    for _ in range(2):
+        response = client.get(f'/download/{version_id}')
+        assert response.status_code == 200
+        response.close()
+    response = client.get(f'/download/{version_id}')
+    assert response.status_code == 429
+    assert response.json['reason'] == 'daily'
+
+    usage = app.extensions['download_quota'].usage([admin])[admin]
+    assert usage['day_bytes'] == 2000
+    assert usage['rejected'] == 1
@@ -0,0 +1,68 @@
+"""存储目录迁移到分桶布局（flask relayout-storage）"""
+import os
+
+import pytest
+
+import storage_layout
+from models import Version, VersionChange, db
+
+
+@pytest.fixture
+def old_layout(app, make_version):
+    """旧布局：current/<软件名>/<文件名> 与 history/<文件名>"""
+    current_id = make_version('foo', '1.0.0', data=b'MZ new',
+                              folder=os.path.join(app.config['UPLOAD_FOLDER_CURRENT'], 'foo'))
+    history_id = make_version('foo', '0.9.0', data=b'MZ old', folder=app.config['UPLOAD_FOLDER_HISTORY'])
+    return current_id, history_id
+
+
+def file_path(app, version_id):
+    with app.app_context():
+        return db.session.get(Version, version_id).file_path
+
+
+def relayout(app, *args):
+    return app.test_cli_runner().invoke(args=['relayout-storage', *args])
+
+
+def test_dry_run_changes_nothing(app, old_layout):
+    before = [file_path(app, version_id) for version_id in old_layout]
+    result = relayout(app, '--dry-run')
+    assert '共 2 个版本需要迁移' in result.output
+    assert [file_path(app, version_id) for version_id in old_layout] == before
+    assert all(os.path.exists(path) for path in before)
+
+
+def test_relayout_moves_files_and_updates_paths(app, client, old_layout):
+    current_id, history_id = old_layout
+    result = relayout(app, '--batch-size', '1')
+    assert '已迁移 2 个版本' in result.output
+
+    assert file_path(app, current_id) == storage_layout.current_path(app.config['UPLOAD_FOLDER_CURRENT'], 'foo',
+                                                                     '1.0.0', 'dll')
+    assert file_path(app, history_id) == storage_layout.history_path(app.config['UPLOAD_FOLDER_HISTORY'], history_id,
+                                                                     'foo_v0.9.0.dll')
+    # 旧布局的空目录已清理，移动文件不产生目录变更
+    assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER_CURRENT'], 'foo'))
+    with app.app_context():
+        assert VersionChange.query.filter_by(action='archive').count() == 0
+
+    response = client.get(f'/download/{history_id}')
+    assert response.data == b'MZ old'
+    response.close()
+
+    assert '已迁移 0 个版本' in relayout(app).output
+
+
+def test_relayout_resumes_after_interruption(app, old_layout):
+    current_id, history_id = old_layout
+    # 中断：文件已移动、路径还没有提交
+    source = file_path(app, current_id)
+    target = storage_layout.current_path(app.config['UPLOAD_FOLDER_CURRENT'], 'foo', '1.0.0', 'dll')
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.rename(source, target)
+    os.remove(file_path(app, history_id))
+
+    result = relayout(app)
+    assert '已迁移 1 个版本，1 个版本文件不存在，已跳过' in result.output
+    assert file_path(app, current_id) == target
@@ -0,0 +1,94 @@
+"""保留策略与垃圾回收"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import retention
+from models import Log, Version, VersionChange, db
+
+
+def folders(app):
+    return [app.config['UPLOAD_FOLDER_CURRENT'], app.config['UPLOAD_FOLDER_HISTORY']]
+
+
+def age(path, hours=48):
+    old = time.time() - hours * 3600
+    os.utime(path, (old, old))
+
+
+def test_plan_keeps_latest_passed_and_recently_downloaded(app, make_version):
+    now = datetime.utcnow()
+    ids = {}
+    for i, version in enumerate(['1.0.0', '1.1.0', '1.2.0', '1.10.0']):
+        ids[version] = make_version('foo', version, uploaded_at=now - timedelta(days=10 - i))
+    with app.app_context():
+        db.session.get(Version, ids['1.0.0']).test_result = '失败'
+        db.session.get(Version, ids['1.1.0']).test_result = '失败'
+        db.session.get(Version, ids['1.2.0']).test_result = '失败'
+        db.session.add(Log(username='admin', action='download', resource_type='version', resource_id=ids['1.1.0'],
+                           status='success', created_at=now - timedelta(days=1)))
+        db.session.commit()
+
+        policy = {'default': {'keep_last': 1, 'keep_downloaded_within_days': 7, 'keep_passed': True}}
+        result = retention.plan(db, policy, now=now)['foo']
+        # 1.10.0 是最新版本且测试通过，1.1.0 最近被下载过
+        assert [row.version for row in result['kept']] == ['1.10.0', '1.1.0']
+        assert sorted(row.version for row in result['deleted']) == ['1.0.0', '1.2.0']
+
+
+def test_delete_versions_removes_rows_files_and_records_changes(app, make_version):
+    keep_id = make_version('foo', '2.0.0')
+    drop_id = make_version('foo', '1.0.0')
+    with app.app_context():
+        rows = retention.plan(db, {'default': {'keep_last': 1, 'keep_passed': False}})['foo']['deleted']
+        path = rows[0].file_path
+        freed = retention.delete_versions(db, rows, app.extensions['storage'].delete, log=lambda message: None)
+
+        assert freed > 0
+        assert not os.path.exists(path)
+        assert db.session.get(Version, drop_id) is None
+        assert db.session.get(Version, keep_id) is not None
+        change = VersionChange.query.order_by(VersionChange.id.desc()).first()
+        assert (change.action, change.version_id) == ('delete', drop_id)
+        assert Log.query.filter_by(action='delete', resource_id=drop_id).count() == 1
+
+
+def test_find_orphan_files(app, make_version):
+    version_id = make_version('foo', '1.0.0')
+    with app.app_context():
+        referenced = db.session.get(Version, version_id).file_path
+    current = app.config['UPLOAD_FOLDER_CURRENT']
+    renamed = os.path.join(os.path.dirname(referenced), 'foo_v1.0.0_20240101000000.dll')
+    fresh = os.path.join(current, 'uploading.dll.part')
+    variant = referenced + '.zst'
+    gitkeep = os.path.join(current, '.gitkeep')
+    for path in (renamed, fresh, variant, gitkeep):
+        with open(path, 'wb') as f:
+            f.write(b'MZ')
+    for path in (referenced, renamed, variant, gitkeep):
+        age(path)
+
+    patch_folder = app.config['PATCH_FOLDER']
+    os.makedirs(patch_folder, exist_ok=True)
+    stale_patch = os.path.join(patch_folder, f'{version_id}_to_999.bsdiff')
+    with open(stale_patch, 'wb') as f:
+        f.write(b'patch')
+
+    with app.app_context():
+        orphans = retention.find_orphan_files(db, folders(app), patch_folder, grace_hours=24)
+    # 时间戳重命名的旧文件和引用已删除版本的补丁是无主文件；引用中的文件及其变体、宽限期内的文件、点文件保留
+    assert sorted(orphans) == sorted([renamed, stale_patch])
+
+
+def test_find_orphan_files_skips_dotfiles(app):
+    current = app.config['UPLOAD_FOLDER_CURRENT']
+    hidden_dir = os.path.join(current, '.trash')
+    os.makedirs(hidden_dir)
+    paths = [os.path.join(current, '.gitkeep'), os.path.join(hidden_dir, 'foo_v1.0.0.dll')]
+    for path in paths:
+        with open(path, 'wb') as f:
+            f.write(b'')
+        age(path)
+
+    with app.app_context():
+        assert retention.find_orphan_files(db, folders(app), app.config['PATCH_FOLDER'], grace_hours=0) == []
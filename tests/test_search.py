@@ -0,0 +1,29 @@
+"""全文检索"""
+from models import Version, db
+
+
+def test_search_ranks_and_filters(app, client, make_version):
+    make_version('foo', '1.0.0')
+    bar_id = make_version('bar', '2.0.0')
+    with app.app_context():
+        db.session.get(Version, bar_id).update_notes = 'fixes crash in renderer'
+        db.session.commit()
+
+    # 索引随版本更新同步
+    response = client.get('/api/search?q=renderer')
+    assert response.json['total'] == 1
+    assert response.json['results'][0]['software'] == 'bar'
+
+    response = client.get('/api/search?q=foo')
+    assert [r['software'] for r in response.json['results']] == ['foo']
+    assert client.get('/api/search?q=renderer&software=foo').json['total'] == 0
+
+
+def test_short_keyword_falls_back_to_like(client, make_version):
+    make_version('qt', '5.0.0')
+    response = client.get('/api/search?q=qt')
+    assert [r['software'] for r in response.json['results']] == ['qt']
+
+
+def test_search_requires_keyword(client):
+    assert client.get('/api/search?q=%20').status_code == 400
@@ -0,0 +1,59 @@
+"""按请求的SQL分析（独立应用开启 SQL_PROFILING）"""
+import os
+
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import text
+
+import db_routing
+import sql_profiler
+from models import db
+
+from conftest import TMP_DIR
+
+
+@pytest.fixture
+def profiled():
+    path = os.path.join(TMP_DIR, 'profiler.db')
+    profiled_app = Flask('profiler-test')
+    profiled_app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', SQL_PROFILING=True, SQL_REPEAT_THRESHOLD=3,
+                               SQL_SLOW_QUERY_MS=0)
+    db.init_app(profiled_app)
+    db_routing.init_app(profiled_app)
+    sql_profiler.init_app(profiled_app)
+
+    @profiled_app.route('/items')
+    def items():
+        # 同一语句执行4次（模拟N+1）加一条其它语句
+        values = [db.session.execute(text('SELECT :n'), {'n': n}).scalar() for n in range(4)]
+        values.append(db.session.execute(text('SELECT 10')).scalar())
+        return jsonify(values)
+
+    yield profiled_app
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def test_profile_headers(profiled, caplog):
+    response = profiled.test_client().get('/items')
+    assert response.json == [0, 1, 2, 3, 10]
+    assert response.headers['X-SQL-Query-Count'] == '5'
+    assert float(response.headers['X-SQL-Query-Time-Ms']) >= 0
+    assert response.headers['X-SQL-Repeated'] == '1'
+    assert any('疑似N+1' in record.getMessage() and '4 次' in record.getMessage() for record in caplog.records)
+
+
+def test_profile_json_replaces_body(profiled):
+    response = profiled.test_client().get('/items?_sql_profile=1')
+    data = response.json
+    assert (data['endpoint'], data['status'], data['query_count']) == ('items', 200, 5)
+    assert [q['statement'] for q in data['queries']] == ['SELECT ?'] * 4 + ['SELECT 10']
+    assert data['repeated'] == [{'statement': 'SELECT ?', 'count': 4}]
+    # SQL_SLOW_QUERY_MS=0：所有查询都算慢查询
+    assert len(data['slow']) == 5
+    assert 'X-SQL-Query-Count' not in response.headers
+
+
+def test_profiling_disabled_by_default(app, client):
+    response = client.get('/api/versions')
+    assert 'X-SQL-Query-Count' not in response.headers
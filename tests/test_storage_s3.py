@@ -0,0 +1,121 @@
+"""S3存储后端（moto模拟S3）及上传失败时撤销发布"""
+import io
+import os
+import sys
+
+import pytest
+
+import app as app_module
+import storage
+
+moto = pytest.importorskip('moto')
+
+BUCKET = 'dll-manager-test'
+
+
+@pytest.fixture
+def s3(app, monkeypatch):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    with moto.mock_aws():
+        backend = storage.S3Storage(BUCKET, app.config['STORAGE_ROOT'], prefix='dll', region='us-east-1',
+                                    multipart_threshold=1024 * 1024, multipart_chunksize=5 * 1024 * 1024)
+        backend.client.create_bucket(Bucket=BUCKET)
+        yield backend
+
+
+def object_keys(backend):
+    return sorted(obj['Key'] for obj in backend.client.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def local_file(app, name, data):
+    path = os.path.join(app.config['UPLOAD_FOLDER_CURRENT'], name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_publish_uses_prefixed_relative_key(app, s3):
+    path = local_file(app, 'foo_v1.0.0.dll', b'MZ' + b'x' * 100)
+    s3.publish(path)
+    assert object_keys(s3) == ['dll/current/foo_v1.0.0.dll']
+    assert s3.exists(path)
+
+    s3.evict_local(path)
+    assert not os.path.exists(path)
+    with s3.open(path) as f:
+        assert f.read() == b'MZ' + b'x' * 100
+
+
+def test_publish_large_file_in_parts(app, s3):
+    data = os.urandom(6 * 1024 * 1024)
+    path = local_file(app, 'big_v1.0.0.dll', data)
+    s3.publish(path)
+    with s3.materialize(path, app.config['UPLOAD_FOLDER_TESTING']) as tmp_path:
+        with open(tmp_path, 'rb') as f:
+            assert f.read() == data
+    assert not os.path.exists(tmp_path)
+
+
+def test_unpublish_removes_object_and_keeps_local_file(app, s3):
+    path = local_file(app, 'foo_v1.0.0.dll', b'MZ')
+    s3.publish(path)
+    s3.unpublish(path)
+    assert object_keys(s3) == []
+    assert os.path.exists(path)
+
+
+def test_move_and_delete(app, s3):
+    path = local_file(app, 'foo_v1.0.0.dll', b'MZ' * 50)
+    s3.publish(path)
+    new_path = os.path.join(app.config['UPLOAD_FOLDER_HISTORY'], 'foo_v1.0.0.dll')
+    s3.move(path, new_path)
+    assert object_keys(s3) == ['dll/history/foo_v1.0.0.dll']
+    assert not s3.exists(path)
+
+    assert s3.delete(new_path) == 100
+    assert s3.delete(new_path) == 0
+    assert object_keys(s3) == []
+
+
+def test_download_url_sets_filename(app, s3):
+    path = local_file(app, 'foo_v1.0.0.dll', b'MZ')
+    s3.publish(path)
+    url = s3.download_url(path, '软件_v1.0.0.dll')
+    assert 'dll/current/foo_v1.0.0.dll' in url
+    assert 'response-content-disposition=' in url
+    assert storage.content_disposition('foo.dll') == 'attachment; filename="foo.dll"'
+
+
+def test_failed_upload_unpublishes_and_restores_previous_file(app, client, s3, monkeypatch):
+    monkeypatch.setitem(app.extensions, 'storage', s3)
+    with app.app_context():
+        target = app_module.get_version_file_path('foo', '1.0.0', 'dll')
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+        f.write(b'MZ old')
+    s3.publish(target)
+    s3.evict_local(target)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(app_module, 'build_version', broken)
+
+    response = client.post('/upload', data={
+        'software_name': 'foo', 'version': '1.0.0', 'update_notes': 'n', 'test_description': 'd',
+        'test_result': '通过', 'test_completed_at': '2024-01-01T00:00:00', 'test_id': 'T-1', 'developer_dri': 'dev',
+        'file': (io.BytesIO(b'MZ' + b'x' * 100), 'foo.dll'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+
+    # 新文件已撤销，被重命名的旧版本文件恢复到原路径
+    assert object_keys(s3) == [s3.key(target)]
+    with s3.open(target) as f:
+        assert f.read() == b'MZ old'
+    assert not os.path.exists(target)
+
+
+def test_missing_boto3_fails_on_construction(app, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'boto3', None)
+    with pytest.raises(RuntimeError, match='boto3'):
+        storage.S3Storage(BUCKET, app.config['STORAGE_ROOT'])
@@ -0,0 +1,78 @@
+"""声明式RBAC同步：dry-run、应用、幂等"""
+import json
+
+import pytest
+
+import sync_rbac
+from models import Permission, Role, db, role_permissions
+
+SPEC = {
+    'permissions': {'test:read': '读取', 'test:write': '写入'},
+    'roles': {
+        'test_reader': {'description': '只读', 'permissions': ['test:read']},
+        'test_editor': {'description': '编辑', 'permissions': ['test:read', 'test:write']},
+    },
+}
+
+
+@pytest.fixture
+def spec_file(app, tmp_path):
+    """写规格文件；测试结束后删除规格中的角色和权限（角色权限表不在每个测试后清空）"""
+    def write(spec):
+        path = tmp_path / 'rbac.json'
+        path.write_text(json.dumps(spec, ensure_ascii=False), encoding='utf-8')
+        return str(path)
+    yield write
+    with app.app_context():
+        role_ids = db.session.scalars(db.select(Role.id).where(Role.name.like('test_%'))).all()
+        db.session.execute(role_permissions.delete().where(role_permissions.c.role_id.in_(role_ids)))
+        Role.query.filter(Role.id.in_(role_ids)).delete()
+        Permission.query.filter(Permission.name.like('test:%')).delete()
+        db.session.commit()
+
+
+def grants(app):
+    with app.app_context():
+        return {(role.name, perm.name) for role in Role.query.filter(Role.name.like('test_%'))
+                for perm in role.permissions}
+
+
+def test_dry_run_reports_without_writing(app, spec_file, capsys):
+    assert sync_rbac.main([spec_file(SPEC), '--dry-run']) == 0
+    output = capsys.readouterr().out
+    assert '[dry-run] ➕ 创建角色: test_editor' in output
+    assert '授权 +3 -0' in output
+    with app.app_context():
+        assert Role.query.filter(Role.name.like('test_%')).count() == 0
+        assert Permission.query.filter(Permission.name.like('test:%')).count() == 0
+
+
+def test_apply_is_idempotent(app, spec_file, capsys):
+    path = spec_file(SPEC)
+    assert sync_rbac.main([path]) == 0
+    assert grants(app) == {('test_reader', 'test:read'), ('test_editor', 'test:read'), ('test_editor', 'test:write')}
+
+    capsys.readouterr()
+    assert sync_rbac.main([path]) == 0
+    assert '无需变更' in capsys.readouterr().out
+    with app.app_context():
+        assert all(not changes for changes in sync_rbac.compute_diff(SPEC['permissions'], SPEC['roles']).values())
+
+
+def test_spec_roles_are_authoritative(app, spec_file):
+    sync_rbac.main([spec_file(SPEC)])
+    spec = {
+        'permissions': {'test:read': '读取（新）', 'test:write': '写入'},
+        'roles': {'test_editor': {'description': '编辑', 'permissions': ['test:write']}},
+    }
+    assert sync_rbac.main([spec_file(spec)]) == 0
+    # 规格中的角色多余的授权被撤销，规格外的角色保持不变
+    assert grants(app) == {('test_reader', 'test:read'), ('test_editor', 'test:write')}
+    with app.app_context():
+        assert Permission.query.filter_by(name='test:read').one().description == '读取（新）'
+
+
+def test_undeclared_permission_is_rejected(spec_file):
+    spec = {'permissions': {}, 'roles': {'test_reader': {'permissions': ['test:read']}}}
+    with pytest.raises(ValueError, match='test:read'):
+        sync_rbac.main([spec_file(spec)])
@@ -0,0 +1,49 @@
+"""历史版本冷存储"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import zstandard
+
+import app as app_module
+import storage
+import tiering
+from models import Version, db
+
+DATA = b'MZ' + b'archived build ' * 5000
+
+
+def test_freeze_history_versions_and_download(app, client, make_version):
+    old = datetime.utcnow() - timedelta(days=60)
+    version_id = make_version('foo', '1.0.0', data=DATA, uploaded_at=old, folder=app.config['UPLOAD_FOLDER_HISTORY'])
+    with app.app_context():
+        frozen, saved = app_module.freeze_history_versions(30, 3, log=lambda message: None)
+        assert frozen == 1 and saved > 0
+        v = db.session.get(Version, version_id)
+        assert v.storage_tier == tiering.COLD
+        assert tiering.is_cold(v.file_path)
+        assert storage.sha256(app.extensions['storage'], v.file_path) == hashlib.sha256(DATA).hexdigest()
+
+    # 不接受zstd的客户端得到边解压边发送的原始内容
+    response = client.get(f'/download/{version_id}', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == DATA
+    response.close()
+
+    response = client.get(f'/download/{version_id}', headers={'Accept-Encoding': 'zstd'})
+    assert response.headers['Content-Encoding'] == 'zstd'
+    assert zstandard.ZstdDecompressor().decompress(response.data, max_output_size=len(DATA)) == DATA
+    response.close()
+
+
+def test_freeze_skips_recent_and_incompressible_versions(app, make_version):
+    history = app.config['UPLOAD_FOLDER_HISTORY']
+    recent_id = make_version('foo', '1.0.0', data=DATA, folder=history)
+    noise = os.urandom(20000)
+    noise_id = make_version('bar', '1.0.0', data=noise, uploaded_at=datetime.utcnow() - timedelta(days=60),
+                            folder=history)
+    with app.app_context():
+        assert app_module.freeze_history_versions(30, 3, log=lambda message: None) == (0, 0)
+        assert db.session.get(Version, recent_id).storage_tier == tiering.HOT
+        noise_version = db.session.get(Version, noise_id)
+        assert (noise_version.storage_tier, noise_version.stored_size) == (tiering.HOT, len(noise))
@@ -0,0 +1,188 @@
+"""表单上传、批量上传、断点续传上传"""
+import io
+import json
+import os
+
+import pytest
+
+import app as app_module
+from models import UploadSession, Version, VersionChange, db
+
+FIELDS = {
+    'update_notes': 'notes', 'test_description': 'desc', 'test_result': '通过',
+    'test_completed_at': '2024-01-01T12:00', 'test_duration': '30', 'test_id': 'T-1', 'developer_dri': 'dev',
+}
+
+
+@pytest.fixture(autouse=True)
+def no_background_tasks(monkeypatch):
+    monkeypatch.setattr(app_module, 'schedule_background_tasks', lambda version: None)
+
+
+def dll(size=100):
+    return b'MZ' + b'x' * size
+
+
+def current_files(app):
+    return [name for _, _, files in os.walk(app.config['UPLOAD_FOLDER_CURRENT'])
+            for name in files if not name.startswith('.')]
+
+
+def current_dirs(app):
+    return [name for _, dirs, _ in os.walk(app.config['UPLOAD_FOLDER_CURRENT']) for name in dirs]
+
+
+def test_form_upload(app, client):
+    response = client.post('/upload', data=dict(FIELDS, software_name='foo', version='v1.0.0',
+                                                file=(io.BytesIO(dll()), 'foo.dll')),
+                           content_type='multipart/form-data')
+    assert response.status_code == 302
+    with app.app_context():
+        v = Version.query.one()
+        assert (v.software_name, v.version, v.file_size, v.test_duration) == ('foo', '1.0.0', 102, 30)
+        assert os.path.exists(v.file_path)
+
+
+def test_form_upload_rejects_bad_completed_at(app, client):
+    response = client.post('/upload', data=dict(FIELDS, software_name='foo', version='1.0.0',
+                                                test_completed_at='yesterday', file=(io.BytesIO(dll()), 'foo.dll')),
+                           content_type='multipart/form-data', follow_redirects=True)
+    assert 'test_completed_at' in response.get_data(as_text=True)
+    with app.app_context():
+        assert Version.query.count() == 0
+    assert current_dirs(app) == []
+
+
+def post_batch(client, manifest, files):
+    return client.post('/api/upload/batch', data={
+        'manifest': json.dumps(manifest),
+        'files': [(io.BytesIO(data), name) for name, data in files],
+    }, content_type='multipart/form-data')
+
+
+def test_batch_upload(app, client):
+    manifest = dict(FIELDS, version='2.0.0', files={'bar.dll': {'version': '2.0.1'}})
+    response = post_batch(client, manifest, [('foo.dll', dll(10)), ('bar.dll', dll(20))])
+    assert response.status_code == 201
+    assert [(v['software'], v['version'], v['file_size']) for v in response.json['versions']] == [
+        ('foo', '2.0.0', 12), ('bar', '2.0.1', 22)]
+    with app.app_context():
+        assert Version.query.count() == 2
+        assert VersionChange.query.filter_by(action='create').count() == 2
+    assert sorted(current_files(app)) == ['bar_v2.0.1.dll', 'foo_v2.0.0.dll']
+
+
+@pytest.mark.parametrize('override, message', [
+    ({'test_completed_at': '2024-13-45'}, 'test_completed_at'),
+    ({'test_duration': 'ten'}, 'test_duration'),
+    ({'test_duration': -1}, 'test_duration'),
+    ('2.0.1', 'manifest.files'),
+])
+def test_batch_upload_rejects_bad_metadata_per_file(app, client, override, message):
+    manifest = dict(FIELDS, version='2.0.0', files={'bar.dll': override})
+    response = post_batch(client, manifest, [('foo.dll', dll()), ('bar.dll', dll())])
+    assert response.status_code == 400
+    assert [detail['file'] for detail in response.json['details']] == ['bar.dll']
+    assert message in response.json['details'][0]['error']
+    with app.app_context():
+        assert Version.query.count() == 0
+    # 校验失败时不创建存储目录
+    assert current_dirs(app) == []
+
+
+def test_batch_upload_rejects_duplicates_in_batch(app, client):
+    response = post_batch(client, dict(FIELDS, version='1.0.0', software_name='foo'),
+                          [('a.dll', dll()), ('b.dll', dll())])
+    assert response.status_code == 400
+    assert '批次内重复' in response.json['details'][0]['error']
+
+
+def test_batch_upload_rolls_back_on_failure(app, client, monkeypatch):
+    def broken(path, source=None):
+        raise RuntimeError('storage unavailable')
+    monkeypatch.setattr(app.extensions['storage'], 'publish', broken)
+
+    response = post_batch(client, dict(FIELDS, version='1.0.0'), [('foo.dll', dll()), ('bar.dll', dll())])
+    assert response.status_code == 500
+    with app.app_context():
+        assert Version.query.count() == 0
+        assert VersionChange.query.count() == 0
+    assert current_files(app) == []
+
+
+def test_resumable_upload(app, client):
+    data = dll(3000)
+    response = client.post('/api/uploads', json={
+        'filename': 'foo.dll', 'total_size': len(data), 'metadata': dict(FIELDS, software_name='foo')})
+    assert response.status_code == 201
+    upload_id = response.json['upload_id']
+
+    assert client.patch(f'/api/uploads/{upload_id}', data=data[:1000],
+                        headers={'Upload-Offset': '0'}).status_code == 200
+    # 偏移量不匹配时返回实际已接收的字节数
+    response = client.patch(f'/api/uploads/{upload_id}', data=data[:1000], headers={'Upload-Offset': '0'})
+    assert response.status_code == 409
+    assert response.headers['Upload-Offset'] == '1000'
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', json={'metadata': {'version': '1.0.0'}})
+    assert response.status_code == 409
+    assert response.json['offset'] == 1000
+
+    assert client.patch(f'/api/uploads/{upload_id}', data=data[1000:],
+                        headers={'Upload-Offset': '1000'}).status_code == 200
+    assert client.get(f'/api/uploads/{upload_id}').json['offset'] == len(data)
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', json={'metadata': {'version': '1.0.0'}})
+    assert response.status_code == 201
+    with app.app_context():
+        v = db.session.get(Version, response.json['id'])
+        with open(v.file_path, 'rb') as f:
+            assert f.read() == data
+        assert UploadSession.query.count() == 0
+
+
+def test_resumable_upload_validates_metadata_before_moving_file(app, client):
+    data = dll()
+    upload_id = client.post('/api/uploads', json={
+        'filename': 'foo.dll', 'total_size': len(data), 'metadata': dict(FIELDS, software_name='foo')}).json['upload_id']
+    client.patch(f'/api/uploads/{upload_id}', data=data, headers={'Upload-Offset': '0'})
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', json={'metadata': ['1.0.0']})
+    assert response.status_code == 400
+    response = client.post(f'/api/uploads/{upload_id}/complete',
+                           json={'metadata': {'version': '1.0.0', 'test_duration': '1.5h'}})
+    assert response.status_code == 400
+    assert 'test_duration' in response.json['error']
+    assert current_dirs(app) == []
+    # 会话保留，修正元数据后可以重试
+    assert client.get(f'/api/uploads/{upload_id}').json['offset'] == len(data)
+
+
+def test_resumable_upload_rejects_non_object_metadata(client):
+    response = client.post('/api/uploads', json={'filename': 'foo.dll', 'total_size': 10, 'metadata': 'x'})
+    assert response.status_code == 400
+
+
+def test_failed_resumable_upload_restores_existing_version(app, client, make_version, monkeypatch):
+    with app.app_context():
+        target = app_module.get_version_file_path('foo', '1.0.0', 'dll')
+    existing_id = make_version('foo', '1.0.0', data=b'MZ old', folder=os.path.dirname(target))
+
+    data = dll()
+    upload_id = client.post('/api/uploads', json={
+        'filename': 'foo.dll', 'total_size': len(data), 'metadata': dict(FIELDS, software_name='foo')}).json['upload_id']
+    client.patch(f'/api/uploads/{upload_id}', data=data, headers={'Upload-Offset': '0'})
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(app_module, 'build_version', broken)
+    response = client.post(f'/api/uploads/{upload_id}/complete', json={'metadata': {'version': '1.0.0'}})
+    assert response.status_code == 500
+
+    # 旧版本文件回到原路径，新文件回到暂存区可以重试
+    response = client.get(f'/download/{existing_id}')
+    assert response.status_code == 200
+    assert response.data == b'MZ old'
+    response.close()
+    assert client.get(f'/api/uploads/{upload_id}').json['offset'] == len(data)
+    assert sorted(current_files(app)) == ['foo_v1.0.0.dll']
@@ -0,0 +1,51 @@
+"""语义化版本排序键与版本范围查询"""
+import migrations
+import versioning
+from models import Version, db
+
+
+def test_semver_precedence():
+    ordered = ['beta', '1.0.0-1', '1.0.0-alpha', '1.0.0-alpha-1', '1.0.0-alpha.1', '1.0.0-alpha.beta',
+               '1.0.0-alphabet', '1.0.0-beta', '1.0.0-beta.2', '1.0.0-beta.11', '1.0.0-rc.1', '1.0.0', '1.2.3',
+               '1.2.10', '1.10.0', '2.0.0']
+    # alpha-1 是单个标识，按ASCII排在 alpha 之后，因此 alpha.1、alpha.beta（第一个标识为 alpha）排在它前面
+    expected = ['beta', '1.0.0-1', '1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-alpha.beta', '1.0.0-alpha-1',
+                '1.0.0-alphabet', '1.0.0-beta', '1.0.0-beta.2', '1.0.0-beta.11', '1.0.0-rc.1', '1.0.0', '1.2.3',
+                '1.2.10', '1.10.0', '2.0.0']
+    assert sorted(ordered, key=versioning.sort_key) == expected
+
+
+def test_prefix_identifier_sorts_first():
+    assert versioning.sort_key('1.0.0-alpha') < versioning.sort_key('1.0.0-alpha-1')
+    assert versioning.sort_key('1.0.0-rc') < versioning.sort_key('1.0.0-rc-2')
+
+
+def test_equivalent_spellings():
+    assert versioning.sort_key('v1.2') == versioning.sort_key('1.2.0') == versioning.sort_key('1.2.0.0+build.5')
+    assert versioning.sort_key('1.0.0-RC.1') == versioning.sort_key('1.0.0-rc.1')
+    assert len(versioning.sort_key('1.0.0-' + 'x' * 500)) == versioning.KEY_LENGTH
+
+
+def test_upper_bound_excludes_prereleases():
+    bound = versioning.upper_bound_key('2.0')
+    assert versioning.sort_key('1.99.0') < bound
+    assert not versioning.sort_key('2.0.0-rc.1') < bound
+    assert not versioning.sort_key('2.0.0') < bound
+    assert versioning.upper_bound_key('2.0.0-rc.1') == versioning.sort_key('2.0.0-rc.1')
+
+
+def test_range_query(client, make_version):
+    for version in ['1.0.0', '1.2.0', '1.10.0', '2.0.0-rc.1', '2.0.0']:
+        make_version('foo', version)
+    response = client.get('/api/software/foo/versions?min=1.2&max=2.0')
+    assert [v['version'] for v in response.json['versions']] == ['1.10.0', '1.2.0']
+
+
+def test_recompute_migration_fixes_stale_keys(app, make_version):
+    version_id = make_version('foo', '1.0.0-alpha')
+    with app.app_context():
+        db.session.execute(Version.__table__.update().values(version_key='stale'))
+        db.session.commit()
+        {version: fn for version, _, fn in migrations.MIGRATIONS}['0010']()
+        db.session.commit()
+        assert db.session.get(Version, version_id).version_key == versioning.sort_key('1.0.0-alpha')
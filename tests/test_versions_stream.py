@@ -0,0 +1,50 @@
+"""SSE新版本推送"""
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from models import Version, VersionChange, db
+
+
+@pytest.fixture
+def short_stream(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'SSE_MAX_DURATION', 0.3)
+    monkeypatch.setitem(app.config, 'SSE_POLL_INTERVAL', 0.05)
+
+
+def add_versions(app, count, start=0):
+    with app.app_context():
+        db.session.add_all([
+            Version(software_name='foo', version=f'1.0.{i}', version_key=f'{i:05d}', file_path=f'/tmp/foo_{i}.dll',
+                    file_size=1, file_type='dll', update_notes='n', test_description='d', test_result='通过',
+                    test_completed_at=datetime.utcnow(), test_id='T', developer_dri='dev', uploaded_by='admin')
+            for i in range(start, start + count)
+        ])
+        db.session.commit()
+
+
+def event_ids(response):
+    return [int(line[4:]) for line in response.get_data(as_text=True).splitlines() if line.startswith('id: ')]
+
+
+def test_stream_sends_backlog_larger_than_one_page(app, client, short_stream):
+    total = app_module.SSE_PAGE_SIZE * 2 + 5
+    add_versions(app, total)
+
+    ids = event_ids(client.get('/api/versions/stream?since=0'))
+    with app.app_context():
+        assert ids == [c.id for c in VersionChange.query.order_by(VersionChange.id)]
+    assert len(ids) == total
+
+
+def test_stream_resumes_after_last_event_id(app, client, short_stream):
+    add_versions(app, 5)
+    with app.app_context():
+        db.session.delete(Version.query.filter_by(version='1.0.4').one())
+        db.session.commit()
+        creates = [c.id for c in VersionChange.query.filter_by(action='create').order_by(VersionChange.id)]
+
+    # 游标是变更ID：从第3个新增之后继续，已删除的版本不推送
+    ids = event_ids(client.get('/api/versions/stream', headers={'Last-Event-ID': str(creates[2])}))
+    assert ids == [creates[3]]
@@ -0,0 +1,110 @@
+"""历史版本冷存储：历史目录中的文件只保留高压缩级别的zstd副本，读取时流式解压
+
+冷存储文件就是预压缩的zstd变体（<原路径>.zst）：冷化时先生成并校验该副本，
+再删除原文件和其它变体。支持zstd的客户端直接下载压缩文件，其余客户端在下载时流式解压。
+是否为冷存储以文件系统为准（原文件不存在且存在.zst副本），数据库中的存储层字段用于统计。
+"""
+import hashlib
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import precompress
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时不进行冷化（已冷化的文件无法读取）
+    zstandard = None
+
+HOT = 'hot'
+COLD = 'cold'
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def is_available():
+    """是否可以冷化/读取冷存储文件"""
+    return zstandard is not None
+
+
+def get_cold_path(path):
+    """返回冷存储文件路径"""
+    return precompress.get_variant_path(path, 'zstd')
+
+
+def is_cold(path):
+    """文件是否只以冷存储形式存在"""
+    return not os.path.exists(path) and os.path.exists(get_cold_path(path))
+
+
+def exists(path):
+    """文件是否存在（原文件或冷存储）"""
+    return os.path.exists(path) or os.path.exists(get_cold_path(path))
+
+
+def open_content(path):
+    """以只读、顺序读取方式打开文件内容，冷存储时返回流式解压的读取器"""
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        if zstandard is None or not os.path.exists(get_cold_path(path)):
+            raise
+        return zstandard.ZstdDecompressor().stream_reader(open(get_cold_path(path), 'rb'), closefd=True)
+
+
+@contextmanager
+def materialize(path, tmp_dir):
+    """需要可随机访问的原文件时（如生成差分补丁）使用：冷存储文件临时解压到tmp_dir，退出时删除"""
+    if not is_cold(path):
+        yield path
+        return
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f'{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.thaw')
+    try:
+        with open_content(path) as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+        yield tmp_path
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def compress_cold(path, level=19):
+    """生成并校验冷存储副本（不删除原文件），返回副本大小；压缩收益不足时返回None
+
+    上传时已生成的zstd变体直接复用。
+    """
+    cold_path = get_cold_path(path)
+    original_size = os.path.getsize(path)
+    if not os.path.exists(cold_path):
+        tmp_path = f'{cold_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                zstandard.ZstdCompressor(level=level).copy_stream(src, dst, size=original_size)
+            if os.path.getsize(tmp_path) > original_size * (1 - precompress.MIN_SAVING_RATIO):
+                return None
+            os.replace(tmp_path, cold_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # 删除原文件前确认副本可以完整还原
+    digest = hashlib.sha256()
+    with zstandard.ZstdDecompressor().stream_reader(open(cold_path, 'rb'), closefd=True) as reader:
+        for chunk in iter(lambda: reader.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    with open(path, 'rb') as f:
+        if digest.hexdigest() != hashlib.file_digest(f, 'sha256').hexdigest():
+            os.remove(cold_path)
+            raise ValueError(f'冷存储副本校验失败: {cold_path}')
+    return os.path.getsize(cold_path)
+
+
+def drop_hot(path):
+    """冷化的最后一步：删除原文件和其它变体，只保留冷存储副本"""
+    for encoding in precompress.VARIANT_SUFFIXES:
+        if encoding != 'zstd' and os.path.exists(precompress.get_variant_path(path, encoding)):
+            os.remove(precompress.get_variant_path(path, encoding))
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,65 @@
+"""语义化版本排序键：把自由格式的版本号转换为可以直接在数据库中排序和比较的字符串
+
+版本号按 主.次.修订[.构建][-预发布][+元数据] 解析，数字部分最多4段，缺少的补0（1.2 与 1.2.0 相同）:
+    1.2.3 < 1.2.10 < 1.10.0 < 2.0.0-alpha < 2.0.0-alpha.1 < 2.0.0-beta < 2.0.0
+排序键由定长数字段和预发布标识组成，按字符串比较的顺序与语义化版本的优先级一致，
+因此可以建索引，最新版本和版本范围查询直接在数据库中完成。
+预发布标识按小写比较（兼容大小写不敏感的数据库排序规则）；超过4段的数字部分忽略。
+不能解析的版本号（如 "beta"、"2024_build"）排在所有可解析的版本之前，彼此按字符串排序。
+"""
+import re
+
+_VERSION_RE = re.compile(r'^(\d+(?:\.\d+)*)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]*)?$')
+
+NUMERIC_PARTS = 4
+NUMERIC_WIDTH = 10
+_NUMERIC_MAX = 10 ** NUMERIC_WIDTH - 1
+
+# 与 Version.version_key 列长度一致
+KEY_LENGTH = 120
+
+
+def _number(value):
+    return str(min(int(value), _NUMERIC_MAX)).zfill(NUMERIC_WIDTH)
+
+
+# 字母数字标识的结束符，小于标识中允许的所有字符（0-9、a-z、'-'），使较短的标识排在以它开头的较长标识之前:
+# alpha < alpha-1 < alphabet
+_IDENTIFIER_END = '!'
+
+
+def _identifier_key(identifier):
+    """预发布标识：数字标识排在字母数字标识之前，字母数字标识加结束符"""
+    if identifier.isdigit():
+        return '1' + _number(identifier)
+    return '2' + identifier.lower() + _IDENTIFIER_END
+
+
+def sort_key(version):
+    """返回版本号的排序键"""
+    text = str(version or '').strip()
+    if text[:1] in ('v', 'V'):
+        text = text[1:]
+    match = _VERSION_RE.match(text)
+    if not match:
+        return ('0' + text.lower())[:KEY_LENGTH]
+
+    numbers = match.group(1).split('.')[:NUMERIC_PARTS]
+    numbers += ['0'] * (NUMERIC_PARTS - len(numbers))
+    key = '1' + ''.join(_number(n) for n in numbers)
+    prerelease = match.group(2)
+    if prerelease is None:
+        # 正式版排在同一版本号的所有预发布版本之后
+        key += '1'
+    else:
+        key += '0' + ''.join(_identifier_key(identifier) for identifier in prerelease.split('.'))
+    return key[:KEY_LENGTH]
+
+
+def upper_bound_key(version):
+    """版本范围的上界（不含）：正式版号的上界同时排除其预发布版本，如 < 2.0 不包含 2.0.0-rc.1"""
+    key = sort_key(version)
+    release_length = 1 + NUMERIC_PARTS * NUMERIC_WIDTH + 1
+    if key.startswith('1') and len(key) == release_length and key.endswith('1'):
+        return key[:-1]
+    return key